@@ -1,18 +1,37 @@
-from fastapi import FastAPI, HTTPException
+import json
+import time
+import asyncio
+from collections import Counter
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Tuple
 
-from .models import AskRequest, AskResponse, VerifyRequest, VerifyResponse, Fact
+from .models import AskRequest, AskResponse, AskBatchRequest, AskBatchResponse, VerifyRequest, VerifyResponse, Fact
 from .settings import settings
-from .services.store import get_or_create_collection, load_facts_from_json
-from .services.retrieval import semantic_search, ensure_indexed
+from .services.store import get_or_create_collection, get_index_version
+from .services.registry import fact_registry
+from .services.lexical import get_lexical_index, lexical_index_current, build_lexical_index, reset_lexical_index
+from .services.indexer import is_current
+from .services.warmup import warmup
+from .services.retrieval import retrieve_scored, retrieve_batch_scored, resolve_mode, ensure_indexed, embed_query, embed_queries, lexical_search, indexed_facts
+from .services.cache import answer_cache, semantic_cache, cache_stats, clear_caches, normalize_query
 from .services.context_builder import build_minimal_context
-from .services.generator import generate_answer
+from .services.generator import generate_answer_stream, fallback_answer, aclose_http_client, compression_stats
+from .services.concurrency import run_blocking, shutdown_executor
 from .services.verifier import verify_answer
-from .services.safety import apply_safety
+from .services.safety import apply_safety, detect_emergency, match_red_flags, red_flags
+from .services.scheduler import Shed, admission, ask_flights
+from .services.precomputed import precomputed_answers
+from .services.tracing import trace_sink, start_trace
+from .services.metrics import span, start_request_timings, requests_total, verifier_total, shed_total, register_collector, render_prometheus
 
 app = FastAPI(title="Token-Efficient Medical FAQ System")
 
+# Cached answers were built against the old phrase set; a new red flag must not wait for the TTL
+red_flags.on_reload(clear_caches)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -24,40 +43,76 @@ app.add_middleware(
 @app.on_event("startup")
 def on_startup():
     collection = get_or_create_collection()
-    facts = load_facts_from_json()
-    ensure_indexed(collection, facts)
+    # Not forced: workers forked by backend/serve.py keep the registry their parent loaded
+    fact_registry.refresh()
+    if settings.startup_mode == "snapshot" and collection.count():
+        # Serve the prebuilt index without embedding anything; BM25 needs no model
+        app.state.index_current = is_current(collection, fact_registry.fingerprint)
+        if not lexical_index_current():
+            # BM25 must cover the facts the vectors do; a stale snapshot has its own copy of them
+            build_lexical_index(fact_registry.facts if app.state.index_current else indexed_facts(collection))
+            reset_lexical_index()
+        if settings.warmup_enabled:
+            warmup.start(collection)
+        return
+    ensure_indexed(collection, fact_registry.facts, source=fact_registry.fingerprint)
+    app.state.index_current = True
+    if settings.warmup_enabled:
+        warmup.run(collection)
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await aclose_http_client()
+    shutdown_executor()
+    trace_sink.close()
 
 
 @app.get("/facts", response_model=List[Fact])
-def get_facts():
-    return load_facts_from_json()
+def get_facts(request: Request):
+    fact_registry.refresh()
+    headers = {"ETag": fact_registry.etag}
+    if request.headers.get("if-none-match") == fact_registry.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=fact_registry.body, media_type="application/json", headers=headers)
 
 
-@app.post("/ask", response_model=AskResponse)
-def ask(req: AskRequest):
-    if not req.query or not req.query.strip():
-        raise HTTPException(status_code=400, detail="Query is required")
+def _clamp_top_k(top_k) -> int:
+    return top_k if top_k and 1 <= top_k <= 8 else 4
 
-    collection = get_or_create_collection()
-    # retrieve minimal set of facts
-    top_k = req.top_k if req.top_k and 1 <= req.top_k <= 8 else 4
-    retrieved = semantic_search(collection, req.query, top_k=top_k)
+
+_NO_FACTS_ANSWER = "I couldn’t find specific information. For general concerns, consider rest, hydration, and consult a medical professional if symptoms persist or worsen. This is informational, not medical advice."
+
+
+async def _answer_steps(query: str, retrieved: List[Fact], scores=None) -> AsyncIterator[Tuple[str, Any]]:
+    """Everything after retrieval as ("answer" | "verification" | "safety", payload) steps, then ("response", AskResponse)."""
     if not retrieved:
         # No facts found – return safe generic guidance
-        safe_ans = "I couldn’t find specific information. For general concerns, consider rest, hydration, and consult a medical professional if symptoms persist or worsen. This is informational, not medical advice."
-        return AskResponse(answer=safe_ans, facts_used=[], retrieved_facts=[], verified=False, tokens_used={"prompt": 0, "completion": 0})
+        yield "response", AskResponse(answer=_NO_FACTS_ANSWER, facts_used=[], retrieved_facts=[], verified=False, tokens_used={"prompt": 0, "completion": 0})
+        return
 
-    context = build_minimal_context(retrieved)
+    with span("context"):
+        context = build_minimal_context(retrieved, query, scores=scores)
     # Generate answer using provided facts only
-    gen = generate_answer(req.query, context, retrieved)
+    gen = None
+    async for kind, value in generate_answer_stream(query, context, retrieved):
+        if kind == "delta":
+            yield "answer", {"delta": value}
+        else:
+            gen = value
 
     # Self-verification and automatic rewrite if needed
-    verified, final_answer = verify_answer(gen["answer"], gen["facts_used"], retrieved)
+    with span("verify"):
+        verified, final_answer = verify_answer(gen["answer"], gen["facts_used"], retrieved)
+    verifier_total.inc(result="verified" if verified else "rewritten")
+    yield "verification", {"verified": verified, "answer": final_answer}
 
     # Safety layer: emergency detection + disclaimer
-    final_answer, flags = apply_safety(req.query, final_answer)
+    with span("safety"):
+        final_answer, flags = apply_safety(query, final_answer)
+    yield "safety", {"emergency": flags["emergency"], "categories": flags["categories"], "answer": final_answer}
 
-    return AskResponse(
+    yield "response", AskResponse(
         answer=final_answer,
         facts_used=gen["facts_used"],
         retrieved_facts=retrieved,
@@ -66,14 +121,447 @@ def ask(req: AskRequest):
     )
 
 
+async def _answer(query: str, retrieved: List[Fact], scores=None) -> AskResponse:
+    async for kind, value in _answer_steps(query, retrieved, scores):
+        if kind == "response":
+            return value
+
+
+def _request_shards(req: AskRequest):
+    """The request's shard subset as a sorted tuple; None when it covers every shard."""
+    if req.shards is None:
+        return None
+    unknown = sorted({s for s in req.shards if not 0 <= s < settings.index_shards})
+    if unknown or not req.shards:
+        raise HTTPException(status_code=400, detail=f"shards must be a non-empty subset of 0..{settings.index_shards - 1}")
+    subset = tuple(sorted(set(req.shards)))
+    return None if len(subset) == settings.index_shards else subset
+
+
+def _cache_scope(top_k: int, mode: str, shards=None):
+    return (top_k, mode, get_index_version(), shards)
+
+
+def _semantic_lookup(query: str, q_emb, scope):
+    # Emergency queries always get a fresh answer with their own safety banner
+    if not semantic_cache.enabled or detect_emergency(query):
+        return None
+    return semantic_cache.get(q_emb, scope)
+
+
+def _rechecked(query: str, resp):
+    """A stored answer with the safety layer run again, as the red-flag phrases may have changed since."""
+    if resp is None:
+        return None
+    answer, _ = apply_safety(query, resp.answer)
+    return resp if answer == resp.answer else resp.model_copy(update={"answer": answer})
+
+
+def _precomputed(req, top_k: int):
+    # The table was built against the red flags of its day: emergencies are always answered live
+    if detect_emergency(req.query):
+        return None
+    # Keyed by the requested mode, not the effective one, so the table also serves during warm-up
+    with span("precomputed"):
+        key = normalize_query(req.query)
+        return _rechecked(req.query, precomputed_answers.get(key, _cache_scope(top_k, resolve_mode(req.retrieval_mode), _request_shards(req))))
+
+
+def _nearest_answer(query: str, q_emb, scope):
+    """Semantic cache, then the closest precomputed question: (response, outcome) or (None, None)."""
+    resp = _semantic_lookup(query, q_emb, scope)
+    if resp is not None:
+        return resp, "semantic_hit"
+    # Like the semantic cache, emergencies never take a neighbour's answer
+    if not detect_emergency(query):
+        resp = precomputed_answers.nearest(q_emb, scope)
+        if resp is not None:
+            return resp, "precomputed_nearest"
+    return None, None
+
+
+def _remember(query: str, q_emb, scope, resp: AskResponse):
+    answer_cache.set((normalize_query(query),) + scope, resp)
+    # Lexical-mode requests never embed the query, so they skip the semantic cache
+    if q_emb is not None and semantic_cache.enabled and not detect_emergency(query):
+        semantic_cache.set(q_emb, scope, resp)
+
+
+def _effective_mode(requested) -> str:
+    mode = resolve_mode(requested)
+    # While the model warms up, vector and hybrid requests are answered lexically
+    if mode != "lexical" and warmup.warming and get_lexical_index() is not None:
+        return "lexical"
+    return mode
+
+
+def _with_timings(resp: AskResponse, timings) -> AskResponse:
+    # Cached responses are shared, so timings go on a copy
+    return resp if timings is None else resp.model_copy(update={"timings": timings})
+
+
+@app.post("/ask", response_model=AskResponse, response_model_exclude_none=True)
+async def ask(req: AskRequest):
+    if not req.query or not req.query.strip():
+        raise HTTPException(status_code=400, detail="Query is required")
+
+    started = time.time()
+    scores = start_trace(trace_sink.sampled())
+    # Traced requests always collect stage timings; the response only carries them on request
+    timings = start_request_timings(req.include_timings or scores is not None)
+    with span("total"):
+        resp, result = await _ask(req)
+    requests_total.inc(endpoint="ask", result=result)
+    _trace("ask", req, resp, result, started, timings, scores)
+    return _with_timings(resp, timings if req.include_timings else None)
+
+
+def _trace(endpoint: str, req: AskRequest, resp: AskResponse, outcome: str, started: float, timings, scores, mode=None):
+    """Queue the trace record of one answered query; a no-op unless the request was sampled."""
+    if scores is None:
+        return
+    ids = [f.id for f in resp.retrieved_facts]
+    # Only set when this request ran retrieval itself (not for cached, coalesced or precomputed answers)
+    found = scores.get(req.query)
+    trace_sink.submit({
+        "ts": round(started, 3),
+        "endpoint": endpoint,
+        "query": req.query,
+        "top_k": _clamp_top_k(req.top_k),
+        "retrieval_mode": req.retrieval_mode,
+        "shards": req.shards,
+        "mode": mode or _effective_mode(req.retrieval_mode),
+        "index_version": get_index_version(),
+        "outcome": outcome,
+        "fact_ids": ids,
+        "scores": [found.get(i) for i in ids] if found else None,
+        "facts_used": resp.facts_used,
+        "verified": resp.verified,
+        "timings": timings,
+    })
+
+
+def _cached_answer(query: str, scope):
+    with span("cache"):
+        return _rechecked(query, answer_cache.get((normalize_query(query),) + scope))
+
+
+@asynccontextmanager
+async def _admitted(queries: List[str]):
+    """Hold one admission slot for the pipeline run; raises Shed when over capacity."""
+    with span("queue"):
+        await admission.acquire(priority=any(detect_emergency(q) for q in queries))
+    try:
+        yield
+    finally:
+        admission.release()
+
+
+def _fallback(query: str, scope, reason: str) -> AskResponse:
+    """Fast answer for a shed request: an answer cached while it waited, else BM25 facts
+    answered without ScaleDown, else the generic safe answer. Fallbacks are not cached."""
+    resp = _rechecked(query, answer_cache.get((normalize_query(query),) + scope))
+    fallback = "cache"
+    if resp is None:
+        # Inline rather than on the executor, which is what is saturated; BM25 takes milliseconds
+        facts = lexical_search(get_or_create_collection(), query, scope[0], shards=scope[3])
+        if facts:
+            context = build_minimal_context(facts, query)
+            gen = fallback_answer(context, facts)
+            verified, answer = verify_answer(gen["answer"], gen["facts_used"], facts)
+            answer, flags = apply_safety(query, answer)
+            resp = AskResponse(
+                answer=answer,
+                facts_used=gen["facts_used"],
+                retrieved_facts=facts,
+                verified=verified and not flags.get("override", False),
+                tokens_used=gen["tokens_used"],
+            )
+            fallback = "lexical"
+        else:
+            resp = AskResponse(answer=_NO_FACTS_ANSWER, facts_used=[], retrieved_facts=[], verified=False, tokens_used={"prompt": 0, "completion": 0})
+            fallback = "generic"
+    shed_total.inc(reason=reason, fallback=fallback)
+    return resp
+
+
+async def _lookup(req: AskRequest, mode: str, scope):
+    """Semantic cache and nearest precomputed answer, then retrieval:
+    (cached response or None, outcome, query embedding, facts, retrieval scores)."""
+    q_emb = None
+    if mode != "lexical":
+        with span("embed"):
+            q_emb = await run_blocking(embed_query, req.query)
+        cached, outcome = _nearest_answer(req.query, q_emb, scope)
+        if cached is not None:
+            return cached, outcome, q_emb, [], []
+
+    collection = get_or_create_collection()
+    # retrieve minimal set of facts
+    with span("search"):
+        retrieved, scores = await run_blocking(
+            retrieve_scored, collection, req.query, top_k=scope[0], mode=mode, query_embedding=q_emb, shards=scope[3]
+        )
+    return None, "computed", q_emb, retrieved, scores
+
+
+async def _ask(req: AskRequest):
+    mode = _effective_mode(req.retrieval_mode)
+    scope = _cache_scope(_clamp_top_k(req.top_k), mode, _request_shards(req))
+    cached = _cached_answer(req.query, scope)
+    if cached is not None:
+        return cached, "cache_hit"
+    cached = _precomputed(req, scope[0])
+    if cached is not None:
+        return cached, "precomputed"
+    if not settings.ask_coalesce:
+        return await _compute(req, mode, scope)
+    # Identical queries in flight share one computation (and one admission slot)
+    (resp, result), shared = await ask_flights.run((normalize_query(req.query),) + scope, lambda: _compute(req, mode, scope))
+    return resp, "coalesced" if shared else result
+
+
+async def _compute(req: AskRequest, mode: str, scope):
+    try:
+        async with _admitted([req.query]):
+            cached, result, q_emb, retrieved, scores = await _lookup(req, mode, scope)
+            if cached is not None:
+                return cached, result
+            resp = await _answer(req.query, retrieved, scores)
+    except Shed as exc:
+        return _fallback(req.query, scope, exc.reason), "shed"
+    _remember(req.query, q_emb, scope, resp)
+    return resp, "computed"
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _finished_steps(query: str, resp: AskResponse):
+    # Cached (or fact-less) answers are complete already: replay them as the same steps
+    categories = match_red_flags(query)
+    yield "answer", {"delta": resp.answer}
+    yield "verification", {"verified": resp.verified, "answer": resp.answer}
+    yield "safety", {"emergency": bool(categories), "categories": categories, "answer": resp.answer}
+
+
+@app.post("/ask/stream")
+async def ask_stream(req: AskRequest):
+    """/ask as Server-Sent Events: facts, answer deltas, verification, safety, then done."""
+    if not req.query or not req.query.strip():
+        raise HTTPException(status_code=400, detail="Query is required")
+    # Checked before the stream starts, while an error can still be a 400
+    _request_shards(req)
+    # Proxies must not buffer the stream, or the early events lose their point
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(_ask_events(req), media_type="text/event-stream", headers=headers)
+
+
+async def _ask_events(req: AskRequest):
+    started = time.time()
+    scores = start_trace(trace_sink.sampled())
+    timings = start_request_timings(req.include_timings or scores is not None)
+    result = "error"
+    try:
+        with span("total"):
+            mode = _effective_mode(req.retrieval_mode)
+            scope = _cache_scope(_clamp_top_k(req.top_k), mode, _request_shards(req))
+
+            def facts_event(facts: List[Fact]) -> str:
+                return _sse("facts", {"retrieved_facts": [f.model_dump() for f in facts], "retrieval_mode": mode})
+
+            resp, outcome = _cached_answer(req.query, scope), "cache_hit"
+            if resp is None:
+                resp, outcome = _precomputed(req, scope[0]), "precomputed"
+            sent_facts = streamed = False
+            if resp is None:
+                # Streams are not coalesced (each client gets its own deltas) but are admitted like /ask
+                try:
+                    async with _admitted([req.query]):
+                        resp, outcome, q_emb, retrieved, retrieval_scores = await _lookup(req, mode, scope)
+                        if resp is None:
+                            yield facts_event(retrieved)
+                            sent_facts = True
+                            async for kind, value in _answer_steps(req.query, retrieved, retrieval_scores):
+                                if kind == "response":
+                                    resp = value
+                                else:
+                                    streamed = True
+                                    yield _sse(kind, value)
+                            _remember(req.query, q_emb, scope, resp)
+                except Shed as exc:
+                    resp, outcome = _fallback(req.query, scope, exc.reason), "shed"
+            if not sent_facts:
+                yield facts_event(resp.retrieved_facts)
+            if not streamed:
+                for kind, value in _finished_steps(req.query, resp):
+                    yield _sse(kind, value)
+        result = outcome
+        _trace("ask_stream", req, resp, outcome, started, timings, scores, mode)
+        yield _sse("done", _with_timings(resp, timings if req.include_timings else None).model_dump(exclude_none=True))
+    except Exception:
+        # Headers are sent already, so the failure has to travel as an event
+        yield _sse("error", {"detail": "Internal Server Error"})
+        raise
+    finally:
+        requests_total.inc(endpoint="ask_stream", result=result)
+
+
+async def _timed_answer(query: str, retrieved: List[Fact], scores, include_timings: bool):
+    # Runs as its own task under gather, so the timings context is per item
+    timings = start_request_timings(include_timings)
+    return await _answer(query, retrieved, scores), timings
+
+
+@app.post("/ask_batch", response_model=AskBatchResponse, response_model_exclude_none=True)
+async def ask_batch(req: AskBatchRequest):
+    if not req.requests:
+        raise HTTPException(status_code=400, detail="At least one request is required")
+    if len(req.requests) > settings.max_batch_size:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds {settings.max_batch_size}")
+    for i, item in enumerate(req.requests):
+        if not item.query or not item.query.strip():
+            raise HTTPException(status_code=400, detail=f"Query is required (item {i})")
+
+    started = time.time()
+    scores = start_trace(trace_sink.sampled())
+    # Batch-wide stages (cache, queue, embed_batch, search_batch); answer stages are timed per item
+    batch_timings = start_request_timings(scores is not None)
+    item_timings: List[Any] = [None] * len(req.requests)
+    queries = [item.query for item in req.requests]
+    modes = [_effective_mode(item.retrieval_mode) for item in req.requests]
+    scopes = [_cache_scope(_clamp_top_k(item.top_k), mode, _request_shards(item)) for item, mode in zip(req.requests, modes)]
+    responses: List[AskResponse] = [_cached_answer(q, sc) for q, sc in zip(queries, scopes)]
+    outcomes = ["cache_hit" if r is not None else None for r in responses]
+    for i, item in enumerate(req.requests):
+        if responses[i] is None:
+            responses[i] = _precomputed(item, scopes[i][0])
+            if responses[i] is not None:
+                outcomes[i] = "precomputed"
+    pending = [i for i, r in enumerate(responses) if r is None]
+    try:
+        if pending:
+            # The whole batch runs in one admission slot
+            async with _admitted([queries[i] for i in pending]):
+                await _batch_misses(req, queries, modes, scopes, responses, outcomes, pending, item_timings, scores is not None)
+    except Shed as exc:
+        for i in pending:
+            responses[i] = _fallback(queries[i], scopes[i], exc.reason)
+            outcomes[i] = "shed"
+    for result, n in Counter(outcomes).items():
+        requests_total.inc(n, endpoint="ask_batch", result=result)
+    if scores is not None:
+        for i, item in enumerate(req.requests):
+            _trace("ask_batch", item, responses[i], outcomes[i], started, {**batch_timings, **(item_timings[i] or {})}, scores, modes[i])
+    return AskBatchResponse(responses=responses)
+
+
+async def _batch_misses(req: AskBatchRequest, queries, modes, scopes, responses, outcomes, pending, item_timings, traced: bool):
+    """Fill ``responses``, ``outcomes`` and (when timed) ``item_timings`` for the ``pending`` items."""
+    misses = []
+    # One embedding call and one collection query for all cache misses (lexical items need neither)
+    to_embed = [i for i in pending if modes[i] != "lexical"]
+    q_embs = {}
+    if to_embed:
+        with span("embed_batch"):
+            q_embs = dict(zip(to_embed, await run_blocking(embed_queries, [queries[i] for i in to_embed])))
+    for i in pending:
+        q_emb = q_embs.get(i)
+        if q_emb is not None:
+            responses[i], outcomes[i] = _nearest_answer(queries[i], q_emb, scopes[i])
+        if responses[i] is None:
+            misses.append((i, q_emb))
+    if misses:
+        collection = get_or_create_collection()
+        with span("search_batch"):
+            retrieved = await run_blocking(
+                retrieve_batch_scored,
+                collection,
+                [queries[i] for i, _ in misses],
+                [scopes[i][0] for i, _ in misses],
+                [modes[i] for i, _ in misses],
+                [q_emb for _, q_emb in misses],
+                [scopes[i][3] for i, _ in misses],
+            )
+        answers = await asyncio.gather(*[
+            _timed_answer(queries[i], facts, scores, req.requests[i].include_timings or traced)
+            for (i, _), (facts, scores) in zip(misses, retrieved)
+        ])
+        for (i, q_emb), (resp, timings) in zip(misses, answers):
+            item_timings[i] = timings
+            responses[i] = _with_timings(resp, timings if req.requests[i].include_timings else None)
+            outcomes[i] = "computed"
+            _remember(queries[i], q_emb, scopes[i], resp)
+
+
+def _collect_pipeline_metrics():
+    caches = cache_stats()
+    breaker = compression_stats()
+    scheduler = admission.stats()
+    traces = trace_sink.stats()
+    samples = [
+        ("faq_index_version", "gauge", "Current index version (part of every cache key).", [({}, get_index_version())]),
+        ("faq_index_rows", "gauge", "Rows in the vector collection.", [({}, get_or_create_collection().count())]),
+        ("faq_lexical_index_docs", "gauge", "Facts in the BM25 index.", [({}, len(get_lexical_index() or ()))]),
+        ("faq_facts_loaded", "gauge", "Facts held by the in-memory registry.", [({}, len(fact_registry.facts))]),
+        ("faq_compression_total", "counter", "ScaleDown compression calls by outcome.", [
+            ({"result": "success"}, breaker["successes"]),
+            ({"result": "failure"}, breaker["failures"]),
+            ({"result": "skipped"}, breaker["skipped"]),
+        ]),
+        ("faq_compression_breaker_open", "gauge", "1 while the compression circuit breaker is open.",
+         [({}, 1 if breaker["state"] == "open" else 0)]),
+        ("faq_ask_inflight", "gauge", "Pipeline executions holding an admission slot.", [({}, scheduler["inflight"])]),
+        ("faq_ask_queue_depth", "gauge", "Requests waiting for an admission slot.", [({}, scheduler["queued"])]),
+        ("faq_trace_records_total", "counter", "Trace records by outcome (written, dropped on a full queue, lost to write errors).", [
+            ({"result": "written"}, traces["written"]),
+            ({"result": "dropped"}, traces["dropped"]),
+            ({"result": "error"}, traces["errors"]),
+        ]),
+        ("faq_precomputed_answers", "gauge", "Answers in the precomputed table for the current index version.",
+         [({}, len(precomputed_answers) if precomputed_answers.meta.get("index_version") == get_index_version() else 0)]),
+    ]
+    for field, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("entries", "gauge")):
+        samples.append((f"faq_cache_{field}" + ("_total" if kind == "counter" else ""), kind, f"Cache {field} by cache.",
+                        [({"cache": name}, stats[field]) for name, stats in caches.items()]))
+    return samples
+
+
+register_collector(_collect_pipeline_metrics)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready")
+def ready():
+    # 200 only once the vector path is hot; lexical and cached answers are served before that
+    body = {
+        "ready": warmup.ready,
+        "startup_mode": settings.startup_mode,
+        "index_version": get_index_version(),
+        # False when a snapshot was served that predates the facts file
+        "index_current": getattr(app.state, "index_current", False),
+        "lexical_ready": get_lexical_index() is not None,
+        "admission": admission.stats(),
+        **warmup.stats(),
+    }
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    return {"index_version": get_index_version(), **cache_stats(), "precomputed": precomputed_answers.stats()}
+
+
 @app.post("/verify", response_model=VerifyResponse)
 def verify(req: VerifyRequest):
     if not req.answer:
         raise HTTPException(status_code=400, detail="Answer is required")
-    collection = get_or_create_collection()
-    # Load facts map from JSON for deterministic content
-    facts = load_facts_from_json()
-    id_to_fact: Dict[str, Fact] = {f.id: f for f in facts}
-    subset = [id_to_fact[i] for i in req.facts_used if i in id_to_fact]
+    # Facts come from the in-memory registry for deterministic content
+    subset = fact_registry.subset(req.facts_used)
     verified, rewritten = verify_answer(req.answer, req.facts_used, subset)
     return VerifyResponse(verified=verified, answer=rewritten)
\ No newline at end of file
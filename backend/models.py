@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from typing import List, Dict, Literal, Optional
 
 
 class Fact(BaseModel):
@@ -13,6 +13,11 @@ class Fact(BaseModel):
 class AskRequest(BaseModel):
     query: str
     top_k: Optional[int] = Field(default=4, ge=1, le=8)
+    # Overrides settings.retrieval_mode for this request
+    retrieval_mode: Optional[Literal["vector", "hybrid", "lexical"]] = None
+    include_timings: bool = False
+    # Restrict retrieval to these shard numbers (0 .. INDEX_SHARDS - 1); None searches every shard
+    shards: Optional[List[int]] = None
 
 
 class AskResponse(BaseModel):
@@ -21,6 +26,16 @@ class AskResponse(BaseModel):
     retrieved_facts: List[Fact]
     verified: bool
     tokens_used: Dict[str, int]
+    # Per-stage latency in milliseconds, only when the request set include_timings
+    timings: Optional[Dict[str, float]] = None
+
+
+class AskBatchRequest(BaseModel):
+    requests: List[AskRequest]
+
+
+class AskBatchResponse(BaseModel):
+    responses: List[AskResponse]
 
 
 class VerifyRequest(BaseModel):
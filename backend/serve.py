@@ -0,0 +1,129 @@
+"""Pre-fork server: index once, then fork workers that share the index and model.
+
+    python -m backend.serve --workers 4 --port 8000
+"""
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+import multiprocessing
+from typing import Dict
+
+from .settings import settings
+
+
+def _sync_index():
+    from .services.store import get_or_create_collection
+    from .services.registry import fact_registry
+    from .services.retrieval import ensure_indexed
+
+    fact_registry.refresh()
+    stats = ensure_indexed(get_or_create_collection(), fact_registry.facts, source=fact_registry.fingerprint)
+    print(f"Index version {stats['version']}: added {stats['added']}, updated {stats['updated']}, removed {stats['removed']}")
+
+
+def _preload():
+    # Everything loaded here is inherited by the workers. The model is loaded but not
+    # run: torch thread pools started before fork() are not safe to use in the children
+    from .app import app
+    from .services.store import get_or_create_collection
+    from .services.registry import fact_registry
+    from .services.lexical import get_lexical_index
+    from .services.embeddings import preload_model
+
+    get_or_create_collection().count()
+    fact_registry.refresh()
+    get_lexical_index()
+    preload_model()
+    return app
+
+
+def _run_worker(app, sock: socket.socket, args):
+    import uvicorn
+
+    settings.startup_mode = "snapshot"
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(app, sock: socket.socket, args) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            _run_worker(app, sock, args)
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.workers)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--keep-alive", type=int, default=5, help="seconds an idle keep-alive connection stays open")
+    parser.add_argument("--skip-index", action="store_true", help="serve the index already on disk without syncing it")
+    args = parser.parse_args()
+
+    if not args.skip_index:
+        proc = multiprocessing.get_context("spawn").Process(target=_sync_index, name="index-sync")
+        proc.start()
+        proc.join()
+        if proc.exitcode:
+            raise SystemExit(f"Index sync failed (exit code {proc.exitcode})")
+    app = _preload()
+
+    sock = socket.socket(socket.AF_INET6 if ":" in args.host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    workers: Dict[int, float] = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(max(1, args.workers)):
+        workers[_spawn(app, sock, args)] = time.monotonic()
+    print(f"Serving on {args.host}:{args.port} with {len(workers)} workers (parent pid {os.getpid()})", flush=True)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+        if time.monotonic() - started < 5.0:
+            # Dying right after the fork is a startup failure, not a crash worth retrying
+            print(f"Worker {pid} failed to start (status {status}); shutting down", file=sys.stderr, flush=True)
+            stop(signal.SIGTERM, None)
+            continue
+        print(f"Worker {pid} exited with status {status}; restarting", file=sys.stderr, flush=True)
+        workers[_spawn(app, sock, args)] = time.monotonic()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import os
+import copy
+import json
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+def kmeans(vecs: np.ndarray, k: int, iters: int = 20, seed: int = 0, sample_size: Optional[int] = None) -> np.ndarray:
+    """Spherical k-means on a sample of the L2-normalized rows; returns (k x D) unit centroids."""
+    rng = np.random.default_rng(seed)
+    n = vecs.shape[0]
+    k = max(1, min(k, n))
+    sample_size = sample_size or 256 * k
+    idx = rng.choice(n, size=min(n, sample_size), replace=False)
+    x = np.asarray(vecs[np.sort(idx)], dtype=np.float32)
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters with random points
+            sums[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)]
+        centroids = sums / (np.linalg.norm(sums, axis=1, keepdims=True) + 1e-9)
+    return centroids.astype(np.float32)
+
+
+def assign_rows(vecs: np.ndarray, centroids: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+    out = np.empty(vecs.shape[0], dtype=np.int32)
+    for start in range(0, vecs.shape[0], batch_size):
+        block = np.asarray(vecs[start:start + batch_size], dtype=np.float32)
+        out[start:start + batch_size] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+class IVFIndex:
+    """Inverted-file index over an external row-major embedding matrix."""
+
+    def __init__(self, centroids: np.ndarray, assign: np.ndarray, trained_rows: int):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.assign = np.asarray(assign, dtype=np.int32)
+        self.trained_rows = int(trained_rows)
+        self._build_lists()
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def rows(self) -> int:
+        return self.assign.shape[0]
+
+    @classmethod
+    def train(cls, vecs: np.ndarray, nlist: int = 0, iters: int = 20, seed: int = 0) -> "IVFIndex":
+        n = vecs.shape[0]
+        nlist = nlist or max(1, int(np.sqrt(n)))
+        centroids = kmeans(vecs, nlist, iters=iters, seed=seed)
+        return cls(centroids, assign_rows(vecs, centroids), trained_rows=n)
+
+    def _build_lists(self):
+        live = self.assign >= 0
+        # Removed rows (-1) sort first; drop them from the lists
+        self.list_rows = np.argsort(self.assign, kind="stable")[self.rows - int(live.sum()):].astype(np.int64)
+        counts = np.bincount(self.assign[live], minlength=self.nlist)
+        self.list_offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.list_offsets[1:])
+
+    def copy(self) -> "IVFIndex":
+        """An index that can be updated without touching this one (centroids and lists are never modified in place)."""
+        clone = copy.copy(self)
+        clone.assign = np.array(self.assign)
+        return clone
+
+    def _writable_assign(self):
+        # Loaded indexes map ``assign`` read-only; copy before the first change
+        if not self.assign.flags.writeable:
+            self.assign = np.array(self.assign)
+
+    def update(self, vecs: np.ndarray, rows: np.ndarray):
+        """(Re)assign ``rows`` (which may extend past the current end) from their new vectors."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return
+        needed = int(rows.max()) + 1
+        if needed > self.rows:
+            grown = np.full(needed, -1, dtype=np.int32)
+            grown[: self.rows] = self.assign
+            self.assign = grown
+        self._writable_assign()
+        self.assign[rows] = assign_rows(vecs, self.centroids)
+        self._build_lists()
+
+    def remove(self, rows: np.ndarray):
+        """Drop ``rows`` from every list; they stay in ``assign`` as -1."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return
+        self._writable_assign()
+        self.assign[rows] = -1
+        self._build_lists()
+
+    def search(self, emb: np.ndarray, queries: np.ndarray, k: int, nprobe: int = 8) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Return (rows, similarities) per query, best first."""
+        nprobe = max(1, min(nprobe, self.nlist))
+        coarse = queries @ self.centroids.T
+        out = []
+        for qi, q in enumerate(queries):
+            if nprobe < self.nlist:
+                probe = np.argpartition(-coarse[qi], nprobe - 1)[:nprobe]
+            else:
+                probe = np.arange(self.nlist)
+            cands = np.concatenate([self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probe])
+            if not len(cands):
+                out.append((cands, np.zeros(0, dtype=np.float32)))
+                continue
+            cands.sort()  # sequential access into the mapped matrix
+            sims = np.asarray(emb[cands] @ q, dtype=np.float32)
+            kk = min(k, len(cands))
+            top = np.argpartition(-sims, kk - 1)[:kk] if kk < len(cands) else np.arange(len(cands))
+            top = top[np.argsort(-sims[top], kind="stable")]
+            out.append((cands[top], sims[top]))
+        return out
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "centroids.npy"), self.centroids)
+        np.save(os.path.join(path, "assign.npy"), self.assign)
+        np.save(os.path.join(path, "list_rows.npy"), self.list_rows)
+        np.save(os.path.join(path, "list_offsets.npy"), self.list_offsets)
+        tmp = os.path.join(path, "ivf.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"nlist": self.nlist, "rows": self.rows, "trained_rows": self.trained_rows}, fh)
+        os.replace(tmp, os.path.join(path, "ivf.json"))
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IVFIndex"]:
+        """Load a saved index; per-row arrays are memory-mapped so processes share their pages."""
+        try:
+            with open(os.path.join(path, "ivf.json"), "r", encoding="utf-8") as fh:
+                header = json.load(fh)
+            centroids = np.load(os.path.join(path, "centroids.npy"))
+            assign = np.load(os.path.join(path, "assign.npy"), mmap_mode="r")
+        except Exception:
+            return None
+        if assign.shape[0] != header.get("rows"):
+            return None
+        index = cls.__new__(cls)
+        index.centroids = np.asarray(centroids, dtype=np.float32)
+        index.assign = assign
+        index.trained_rows = int(header.get("trained_rows", assign.shape[0]))
+        try:
+            index.list_rows = np.load(os.path.join(path, "list_rows.npy"), mmap_mode="r")
+            index.list_offsets = np.load(os.path.join(path, "list_offsets.npy"))
+        except Exception:
+            index.list_rows = None
+        if index.list_rows is None or index.list_offsets.shape[0] != index.nlist + 1 \
+                or int(index.list_offsets[-1]) != index.list_rows.shape[0]:
+            index._build_lists()  # saved before the lists were persisted
+        return index
@@ -0,0 +1,180 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+from ..settings import settings
+
+
+_MISSING = object()
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.lower().split()).rstrip("?!. ")
+
+
+def _dense_row(embedding) -> np.ndarray:
+    if hasattr(embedding, "toarray"):
+        embedding = embedding.toarray()
+    return np.asarray(embedding, dtype=np.float32).ravel()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with a per-entry TTL and hit/miss/eviction counters."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires, value = entry
+            if expires < now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+class SemanticCache:
+    """Reuses the value of a cached query whose embedding has cosine >= threshold (same scope)."""
+
+    def __init__(self, max_entries: int, threshold: float, ttl_seconds: float):
+        self.max_entries = max(0, int(max_entries))
+        self.threshold = float(threshold)
+        self.ttl_seconds = float(ttl_seconds)
+        self._matrix: Optional[np.ndarray] = None
+        self._entries: List[Optional[tuple]] = [None] * self.max_entries
+        self._next = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and 0.0 < self.threshold <= 1.0
+
+    def get(self, embedding, scope: Hashable, default: Any = None) -> Any:
+        if not self.enabled:
+            return default
+        q = _dense_row(embedding)
+        now = time.monotonic()
+        with self._lock:
+            if self._matrix is None:
+                self.misses += 1
+                return default
+            sims = self._matrix @ (q / (np.linalg.norm(q) + 1e-9))
+            for slot in np.argsort(-sims)[:4]:
+                if sims[slot] < self.threshold:
+                    break
+                entry = self._entries[slot]
+                if entry is not None and entry[0] == scope and entry[1] >= now:
+                    self.hits += 1
+                    return entry[2]
+            self.misses += 1
+            return default
+
+    def set(self, embedding, scope: Hashable, value: Any):
+        if not self.enabled:
+            return
+        q = _dense_row(embedding)
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != q.shape[0]:
+                self._matrix = np.zeros((self.max_entries, q.shape[0]), dtype=np.float32)
+                self._entries = [None] * self.max_entries
+                self._next = 0
+            slot = self._next
+            if self._entries[slot] is not None:
+                self.evictions += 1
+            self._matrix[slot] = q / (np.linalg.norm(q) + 1e-9)
+            self._entries[slot] = (scope, time.monotonic() + self.ttl_seconds, value)
+            self._next = (slot + 1) % self.max_entries
+
+    def clear(self):
+        with self._lock:
+            self._matrix = None
+            self._entries = [None] * self.max_entries
+            self._next = 0
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "entries": sum(1 for e in self._entries if e is not None),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+_enabled = settings.cache_enabled
+answer_cache = TTLCache(settings.cache_max_entries if _enabled else 0, settings.cache_ttl_seconds)
+embedding_cache = TTLCache(settings.embedding_cache_max_entries if _enabled else 0, settings.cache_ttl_seconds)
+semantic_cache = SemanticCache(
+    settings.semantic_cache_max_entries if _enabled else 0,
+    settings.semantic_cache_threshold,
+    settings.cache_ttl_seconds,
+)
+
+
+def clear_caches():
+    answer_cache.clear()
+    embedding_cache.clear()
+    semantic_cache.clear()
+
+
+def cache_stats() -> Dict[str, Dict[str, float]]:
+    return {
+        "answers": answer_cache.stats(),
+        "embeddings": embedding_cache.stats(),
+        "semantic": semantic_cache.stats(),
+    }
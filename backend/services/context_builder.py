@@ -1,26 +1,80 @@
-from typing import List, Dict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
 from ..models import Fact
+from ..settings import settings
+from .tokenizer import TokenCounter, count_tokens as _count_tokens, fragment_tokens
+
+
+# Fact attribute -> context field, in the order a fact's fragments are packed
+_FIELDS = (
+    ("symptom", "symptoms"),
+    ("cause", "possible_causes"),
+    ("treatment", "general_treatments"),
+    ("precaution", "precautions"),
+)
+
+
+@dataclass
+class MinimalContext:
+    """Fact fragments packed into the token budget, with the prompt and ScaleDown payload built from them."""
+
+    fields: Dict[str, List[str]]
+    prompt: str
+    # Context sent to ScaleDown alongside the user question
+    text: str
+    prompt_tokens: int
+
+
+def _compose_prompt(user_query: str, joined: Dict[str, str]) -> str:
+    return (
+        "You are a medical information assistant. Answer the user's question using ONLY the provided facts. "
+        "Do not diagnose or prescribe. Keep a calm, informational tone. "
+        "If facts are insufficient, say so briefly.\n\n"
+        f"User question: {user_query}\n\n"
+        "Structured facts (minimal):\n"
+        f"Symptoms: {joined['symptoms']}\n"
+        f"Possible causes: {joined['possible_causes']}\n"
+        f"General treatments: {joined['general_treatments']}\n"
+        f"Precautions: {joined['precautions']}\n\n"
+        "Constraints:\n- Use only the facts above.\n- Avoid personalization.\n- Avoid diagnosis.\n- Keep it concise.\n"
+        "Respond in JSON with keys 'answer' and 'facts_used' (list of Fact IDs if available)."
+    )
+
 
+def build_minimal_context(
+    facts: List[Fact],
+    query: str = "",
+    scores: Optional[Sequence[float]] = None,
+    budget: Optional[int] = None,
+    count_tokens: Optional[TokenCounter] = None,
+) -> MinimalContext:
+    """Greedily pack the best facts' fragments into ``budget`` tokens (CONTEXT_TOKEN_BUDGET)."""
+    cost_of = count_tokens or fragment_tokens
+    budget = settings.context_token_budget if budget is None else budget
+    order = range(len(facts)) if scores is None else sorted(range(len(facts)), key=lambda i: -scores[i])
+    fields: Dict[str, List[str]] = {key: [] for _, key in _FIELDS}
+    seen = set()
+    used = 0
+    for i in order:
+        for attr, key in _FIELDS:
+            value = getattr(facts[i], attr).strip()
+            if not value or (key, value.casefold()) in seen:
+                continue
+            # +1 for the ", " separator
+            cost = cost_of(value) + 1
+            if used + cost > budget:
+                continue
+            seen.add((key, value.casefold()))
+            fields[key].append(value)
+            used += cost
 
-def build_minimal_context(facts: List[Fact]) -> Dict[str, List[str]]:
-    # Deduplicate and limit lengths for token efficiency
-    symptoms = []
-    causes = []
-    treatments = []
-    precautions = []
-    for f in facts:
-        if f.symptom and f.symptom not in symptoms:
-            symptoms.append(f.symptom)
-        if f.cause and f.cause not in causes:
-            causes.append(f.cause)
-        if f.treatment and f.treatment not in treatments:
-            treatments.append(f.treatment)
-        if f.precaution and f.precaution not in precautions:
-            precautions.append(f.precaution)
-    # Keep minimal necessary elements
-    return {
-        "symptoms": symptoms[:5],
-        "possible_causes": causes[:5],
-        "general_treatments": treatments[:5],
-        "precautions": precautions[:5],
-    }
\ No newline at end of file
+    joined = {key: ", ".join(values) for key, values in fields.items()}
+    prompt = _compose_prompt(query, joined)
+    text = (
+        f"Symptoms: {joined['symptoms']}. "
+        f"Causes: {joined['possible_causes']}. "
+        f"Treatments: {joined['general_treatments']}. "
+        f"Precautions: {joined['precautions']}."
+    )
+    return MinimalContext(fields=fields, prompt=prompt, text=text, prompt_tokens=(count_tokens or _count_tokens)(prompt))
@@ -1,51 +1,107 @@
+import importlib.util
 from functools import lru_cache
-from typing import List
+from typing import List, Optional, Sequence
 
 import numpy as np
 
-try:
-    from sentence_transformers import SentenceTransformer  # type: ignore
-    _ST_AVAILABLE = True
-except Exception:
-    SentenceTransformer = None
-    _ST_AVAILABLE = False
+from ..settings import settings
 
-try:
-    from sklearn.feature_extraction.text import HashingVectorizer
-    _SKLEARN_AVAILABLE = True
-except Exception:
-    HashingVectorizer = None
-    _SKLEARN_AVAILABLE = False
 
-from ..settings import settings
+# Heavy backends (torch via sentence-transformers, scikit-learn) are imported on
+# first use, so importing the app stays cheap and the model loads off the hot path
+_ST_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+_SKLEARN_AVAILABLE = importlib.util.find_spec("sklearn") is not None
+
+
+def resolve_backend() -> Optional[str]:
+    """The backend _load_model will use ("sentence-transformers" or "hashing"), without loading it."""
+    backend = settings.embedding_backend
+    if _ST_AVAILABLE and backend in ("auto", "sentence-transformers"):
+        return "sentence-transformers"
+    if _SKLEARN_AVAILABLE and backend in ("auto", "hashing"):
+        return "hashing"
+    return None
+
+
+def sparse_embeddings() -> bool:
+    # The hashing backend produces sparse CSR rows
+    return resolve_backend() == "hashing"
+
+
+def embedding_signature() -> str:
+    """Identifies the vector space: vectors from different signatures are not comparable."""
+    backend = resolve_backend()
+    if backend == "hashing":
+        return f"hashing:{settings.hashing_n_features}"
+    return f"{backend}:{settings.embedding_model}"
 
 
 @lru_cache(maxsize=1)
 def _load_model():
-    if _ST_AVAILABLE:
+    backend = resolve_backend()
+    if backend == "sentence-transformers":
+        from sentence_transformers import SentenceTransformer  # type: ignore
         model_name = settings.embedding_model
         return SentenceTransformer(model_name)
-    if _SKLEARN_AVAILABLE:
-        return HashingVectorizer(n_features=512, alternate_sign=False, norm='l2')
-    raise RuntimeError("No embedding backend available. Install sentence-transformers or scikit-learn.")
+    if backend == "hashing":
+        from sklearn.feature_extraction.text import HashingVectorizer  # type: ignore
+        return HashingVectorizer(n_features=settings.hashing_n_features, alternate_sign=False, norm='l2')
+    raise RuntimeError(f"Embedding backend '{settings.embedding_backend}' is not available. Install sentence-transformers or scikit-learn.")
 
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
+def model_loaded() -> bool:
+    return _load_model.cache_info().currsize > 0
+
+
+def preload_model():
+    """Load the embedding model without encoding anything, e.g. before forking workers."""
+    _load_model()
+
+
+def warm_up():
+    """Load the embedding model and run one encode so the first query pays neither."""
+    embed_array(["warm-up"])
+
+
+def embed_array(texts: List[str], dense: bool = False):
+    """Embed ``texts`` as L2-normalized float32 rows (CSR for the hashing backend unless ``dense``)."""
     model = _load_model()
-    if _ST_AVAILABLE and isinstance(model, SentenceTransformer):
-        embs = model.encode(texts, show_progress_bar=False, normalize_embeddings=True)
-        return embs.tolist() if isinstance(embs, np.ndarray) else [e.tolist() for e in embs]
-    # Fallback: HashingVectorizer
+    # SentenceTransformer exposes encode(); HashingVectorizer only transform()
+    if hasattr(model, "encode"):
+        embs = model.encode(texts, show_progress_bar=False, normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(embs, dtype=np.float32)
+    # Fallback: HashingVectorizer (already l2-normalized, sparse CSR)
     mat = model.transform(texts)
-    # Convert sparse to dense and l2 normalize
-    if hasattr(mat, 'toarray'):
-        arr = mat.toarray()
-    else:
-        arr = np.asarray(mat)
-    norms = np.linalg.norm(arr, axis=1, keepdims=True) + 1e-9
-    arr = arr / norms
-    return arr.tolist()
+    if not hasattr(mat, "tocsr"):
+        arr = np.asarray(mat, dtype=np.float32)
+        return arr / (np.linalg.norm(arr, axis=1, keepdims=True) + 1e-9)
+    mat = mat.tocsr().astype(np.float32)
+    return mat.toarray() if dense else mat
+
+
+def embed_query_array(text: str):
+    """Single query as a (1 x D) row, ndarray or CSR."""
+    return embed_array([text])
+
+
+def stack_embeddings(rows: Sequence):
+    """Stack (1 x D) query rows from embed_query_array into one matrix."""
+    if rows and hasattr(rows[0], "tocsr"):
+        import scipy.sparse as sp  # type: ignore
+        return sp.vstack(rows, format="csr")
+    return np.vstack([np.asarray(r, dtype=np.float32) for r in rows])
+
+
+def to_dense(embs) -> np.ndarray:
+    if hasattr(embs, "toarray"):
+        return embs.toarray()
+    return np.asarray(embs, dtype=np.float32)
+
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    # List-of-lists API kept for callers that need plain Python values (e.g. Chroma)
+    return to_dense(embed_array(texts)).tolist()
 
 
 def embed_text(text: str) -> List[float]:
-    return embed_texts([text])[0]
\ No newline at end of file
+    return embed_texts([text])[0]
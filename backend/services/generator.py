@@ -1,29 +1,23 @@
-from typing import Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 import os
+import asyncio
 import requests
+import httpx
 import json
 
 from ..settings import settings
 from ..models import Fact
+from .concurrency import CircuitBreaker
+from .context_builder import MinimalContext
+from .metrics import span
+from .tokenizer import count_tokens
 
 
-def _compose_prompt(user_query: str, context: Dict[str, List[str]]) -> str:
-    return (
-        "You are a medical information assistant. Answer the user's question using ONLY the provided facts. "
-        "Do not diagnose or prescribe. Keep a calm, informational tone. "
-        "If facts are insufficient, say so briefly.\n\n"
-        f"User question: {user_query}\n\n"
-        "Structured facts (minimal):\n"
-        f"Symptoms: {', '.join(context.get('symptoms', []))}\n"
-        f"Possible causes: {', '.join(context.get('possible_causes', []))}\n"
-        f"General treatments: {', '.join(context.get('general_treatments', []))}\n"
-        f"Precautions: {', '.join(context.get('precautions', []))}\n\n"
-        "Constraints:\n- Use only the facts above.\n- Avoid personalization.\n- Avoid diagnosis.\n- Keep it concise.\n"
-        "Respond in JSON with keys 'answer' and 'facts_used' (list of Fact IDs if available)."
-    )
+_breaker = CircuitBreaker(settings.breaker_failure_threshold, settings.breaker_reset_seconds)
+_async_state: Dict[str, Any] = {"loop": None, "client": None, "semaphore": None}
 
 
-def _compress_prompt_scaledown(context_text: str, prompt_text: str):
+def _scaledown_request(context_text: str, prompt_text: str):
     url = settings.scaledown_compress_url.strip()
     key = settings.scaledown_api_key.strip()
     if not url or not key:
@@ -37,12 +31,91 @@ def _compress_prompt_scaledown(context_text: str, prompt_text: str):
         "prompt": prompt_text,
         "scaledown": {"rate": "auto"},
     }
-    r = requests.post(url, headers=headers, data=json.dumps(payload), timeout=30)
-    r.raise_for_status()
-    return r.json()
+    return url, headers, payload
+
+
+def _compress_prompt_scaledown(context_text: str, prompt_text: str):
+    req = _scaledown_request(context_text, prompt_text)
+    if req is None or not _breaker.allow():
+        return None
+    url, headers, payload = req
+    try:
+        r = requests.post(url, headers=headers, data=json.dumps(payload), timeout=settings.scaledown_timeout_seconds)
+        r.raise_for_status()
+        comp = r.json()
+    except Exception:
+        _breaker.record_failure()
+        raise
+    except BaseException:
+        # Cancelled (client gone): not a verdict on ScaleDown, but a half-open trial must not stay pending
+        _breaker.abandon()
+        raise
+    _breaker.record_success()
+    return comp
+
+
+def _get_async_client():
+    # httpx clients and asyncio semaphores are bound to the loop that first uses them
+    loop = asyncio.get_running_loop()
+    if _async_state["loop"] is not loop:
+        _async_state["loop"] = loop
+        _async_state["client"] = httpx.AsyncClient(
+            timeout=settings.scaledown_timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=settings.scaledown_pool_size,
+                max_keepalive_connections=settings.scaledown_pool_size,
+            ),
+        )
+        _async_state["semaphore"] = asyncio.Semaphore(settings.scaledown_max_concurrency)
+    return _async_state["client"], _async_state["semaphore"]
+
+
+async def aclose_http_client():
+    client = _async_state.get("client")
+    _async_state.update(loop=None, client=None, semaphore=None)
+    if client is not None:
+        await client.aclose()
+
+
+async def _compress_prompt_scaledown_async(context_text: str, prompt_text: str):
+    req = _scaledown_request(context_text, prompt_text)
+    if req is None or not _breaker.allow():
+        return None
+    url, headers, payload = req
+    client, semaphore = _get_async_client()
+
+    async def _call():
+        async with semaphore:
+            r = await client.post(url, headers=headers, content=json.dumps(payload))
+            r.raise_for_status()
+            return r.json()
+
+    try:
+        # The deadline covers both waiting for a concurrency slot and the call itself
+        comp = await asyncio.wait_for(_call(), timeout=settings.scaledown_timeout_seconds)
+    except Exception:
+        _breaker.record_failure()
+        raise
+    except BaseException:
+        # Cancelled (client gone): not a verdict on ScaleDown, but a half-open trial must not stay pending
+        _breaker.abandon()
+        raise
+    _breaker.record_success()
+    return comp
 
 
-def _deterministic_answer(context: Dict[str, List[str]], facts: List[Fact], token_hint: Dict[str, int] | None = None) -> Dict:
+def compression_stats() -> Dict[str, Any]:
+    return _breaker.stats()
+
+
+def _token_hint(comp) -> Optional[int]:
+    # Prompt tokens after ScaleDown compression, when it succeeded
+    if comp and isinstance(comp, dict) and comp.get("successful"):
+        return int(comp.get("compressed_prompt_tokens", 0))
+    return None
+
+
+def _answer_parts(context: Dict[str, List[str]]) -> List[str]:
     # Compose a conservative, purely fact-based answer without LLM
     parts = []
     if context.get("possible_causes"):
@@ -61,30 +134,52 @@ def _deterministic_answer(context: Dict[str, List[str]], facts: List[Fact], toke
         )
     if not parts:
         parts.append("I do not have sufficient information from the facts to answer specifically.")
-    answer = " ".join(parts) + " This is informational only and not medical advice."
-    tokens_used = token_hint or {"prompt": 0, "completion": len(answer)}
+    return parts + ["This is informational only and not medical advice."]
+
+
+def _result(answer: str, context: MinimalContext, facts: List[Fact], token_hint: Optional[int] = None) -> Dict:
+    tokens_used = {
+        "prompt": context.prompt_tokens if token_hint is None else token_hint,
+        "completion": count_tokens(answer),
+    }
     return {"answer": answer, "facts_used": [f.id for f in facts], "tokens_used": tokens_used}
 
 
-def generate_answer(user_query: str, context: Dict[str, List[str]], facts: List[Fact]) -> Dict:
-    prompt = _compose_prompt(user_query, context)
+def _deterministic_answer(context: MinimalContext, facts: List[Fact], token_hint: Optional[int] = None) -> Dict:
+    return _result(" ".join(_answer_parts(context.fields)), context, facts, token_hint)
+
+
+def fallback_answer(context: MinimalContext, facts: List[Fact]) -> Dict:
+    """The fact-grounded answer without a ScaleDown round trip, for requests shed under load."""
+    return _deterministic_answer(context, facts)
+
+
+def generate_answer(user_query: str, context: MinimalContext, facts: List[Fact]) -> Dict:
     # Compress prompt via ScaleDown (token-efficient) if configured
     tokens_hint = None
     try:
-        context_text = (
-            f"Symptoms: {', '.join(context.get('symptoms', []))}. "
-            f"Causes: {', '.join(context.get('possible_causes', []))}. "
-            f"Treatments: {', '.join(context.get('general_treatments', []))}. "
-            f"Precautions: {', '.join(context.get('precautions', []))}."
-        )
-        comp = _compress_prompt_scaledown(context_text, user_query)
-        if comp and isinstance(comp, dict) and comp.get("successful"):
-            tokens_hint = {
-                "prompt": int(comp.get("compressed_prompt_tokens", 0)),
-                "completion": 0,
-            }
+        with span("compress"):
+            tokens_hint = _token_hint(_compress_prompt_scaledown(context.text, user_query))
     except Exception:
         pass
 
     # Generation: keep deterministic (fact-grounded) to avoid diagnosing without a model
-    return _deterministic_answer(context, facts, token_hint=tokens_hint)
\ No newline at end of file
+    with span("generate"):
+        return _deterministic_answer(context, facts, token_hint=tokens_hint)
+
+
+async def generate_answer_stream(user_query: str, context: MinimalContext, facts: List[Fact]) -> AsyncIterator[Tuple[str, Any]]:
+    """Yields ("delta", text) chunks of the answer, then ("done", result) with the generate_answer dict."""
+    # Non-blocking ScaleDown compression; skipped while the circuit breaker is open
+    tokens_hint = None
+    try:
+        with span("compress"):
+            tokens_hint = _token_hint(await _compress_prompt_scaledown_async(context.text, user_query))
+    except Exception:
+        pass
+
+    with span("generate"):
+        parts = _answer_parts(context.fields)
+    for i, part in enumerate(parts):
+        yield "delta", part if i == 0 else " " + part
+    yield "done", _result(" ".join(parts), context, facts, tokens_hint)
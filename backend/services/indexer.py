@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import hashlib
+from typing import Any, Dict, List, Optional
+
+from ..models import Fact
+from ..settings import settings
+from .embeddings import embed_array, embedding_signature, to_dense
+from .store import bump_index_version, get_index_version
+from .lexical import build_lexical_index, lexical_index_current, reset_lexical_index
+
+
+def fact_document(f: Fact) -> str:
+    return f"Symptom: {f.symptom}\nCause: {f.cause}\nTreatment: {f.treatment}\nPrecaution: {f.precaution}"
+
+
+def fact_metadata(f: Fact) -> Dict[str, str]:
+    return {
+        "symptom": f.symptom,
+        "cause": f.cause,
+        "treatment": f.treatment,
+        "precaution": f.precaution,
+    }
+
+
+def fact_hash(f: Fact) -> str:
+    # Whitespace-insensitive at the edges so normalized and raw copies of a fact agree
+    doc = "\x1f".join(x.strip() for x in (f.symptom, f.cause, f.treatment, f.precaution))
+    return hashlib.sha1(doc.encode("utf-8")).hexdigest()
+
+
+def source_fingerprint(path: str) -> Optional[Dict[str, Any]]:
+    """Identify a facts file by mtime/size plus a content hash."""
+    try:
+        st = os.stat(path)
+        digest = hashlib.sha256()
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest.hexdigest()}
+
+
+def embed_documents(documents: List[str]):
+    """Embed one ingestion batch; module-level so process-pool workers can run it."""
+    return embed_array(documents)
+
+
+def init_embedding_worker():
+    # One BLAS/torch thread per worker process; parallelism comes from the pool
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(1)
+
+
+def load_manifest(path: Optional[str] = None) -> Dict[str, Any]:
+    path = path or settings.index_manifest_path
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        manifest = {}
+    manifest.setdefault("version", 0)
+    manifest.setdefault("source", None)
+    manifest.setdefault("hashes", {})
+    manifest.setdefault("embedding", None)
+    return manifest
+
+
+def _same_embedding(manifest: Dict[str, Any]) -> bool:
+    # Manifests from before the signature was recorded are trusted as-is
+    return manifest.get("embedding") in (None, embedding_signature())
+
+
+def _same_layout(manifest: Dict[str, Any]) -> bool:
+    # Switching INDEX_SHARDS and back must not trust rows left in the old layout's collections
+    return manifest.get("shards") in (None, settings.index_shards)
+
+
+def save_manifest(manifest: Dict[str, Any], path: Optional[str] = None):
+    path = path or settings.index_manifest_path
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(json.dumps(manifest, separators=(",", ":")))
+    os.replace(tmp, path)
+
+
+def is_current(collection, source: Optional[Dict[str, Any]], manifest: Optional[Dict[str, Any]] = None) -> bool:
+    """Fast startup check: same source file as last sync and an index of the expected size."""
+    manifest = manifest if manifest is not None else load_manifest()
+    recorded = manifest.get("source")
+    if (
+        not source or not recorded or recorded.get("sha256") != source.get("sha256")
+        or not _same_embedding(manifest) or not _same_layout(manifest)
+    ):
+        return False
+    try:
+        return collection.count() == len(manifest["hashes"])
+    except Exception:
+        return False
+
+
+def publish_collection(collection):
+    # SimpleCollection stages writes until published; Chroma applies them immediately
+    publish = getattr(collection, "publish", None)
+    if publish is not None:
+        publish()
+
+
+def _existing_ids(collection) -> List[str]:
+    try:
+        return list(collection.get(include=[])["ids"])
+    except Exception:
+        return []
+
+
+class IncrementalIndexer:
+    """Applies fact batches to a collection, embedding only new or changed facts."""
+
+    def __init__(self, collection, manifest: Optional[Dict[str, Any]] = None):
+        self.collection = collection
+        self.manifest = manifest if manifest is not None else load_manifest()
+        previous: Dict[str, str] = self.manifest["hashes"]
+        if not _same_embedding(self.manifest):
+            # Vectors from another embedding space cannot be mixed with new ones
+            stale = _existing_ids(collection)
+            if stale:
+                collection.delete(ids=stale)
+            previous = {}
+        elif not _same_layout(self.manifest):
+            # The recorded hashes describe another shard layout's collections, not these
+            previous = {}
+        try:
+            in_sync = collection.count() == len(previous)
+        except Exception:
+            in_sync = False
+        if not in_sync:
+            # Index and manifest disagree (first run, lost or legacy index, run
+            # interrupted between checkpoints): trust recorded hashes only for rows
+            # actually present, re-embed the rest and drop rows nobody knows about
+            previous = {i: previous.get(i, "") for i in _existing_ids(collection)}
+        self.previous = previous
+        self.hashes: Dict[str, str] = {}
+        self.added = 0
+        self.changed = 0
+
+    def plan(self, facts: List[Fact]) -> List[Fact]:
+        changed: List[Fact] = []
+        for f in facts:
+            h = fact_hash(f)
+            self.hashes[f.id] = h
+            if self.previous.get(f.id) != h:
+                changed.append(f)
+        return changed
+
+    def write(self, facts: List[Fact], embeddings):
+        if not facts:
+            return
+        if not isinstance(embeddings, list) and not getattr(self.collection, "accepts_arrays", False):
+            embeddings = to_dense(embeddings).tolist()
+        self.collection.upsert(
+            ids=[f.id for f in facts],
+            embeddings=embeddings,
+            metadatas=[fact_metadata(f) for f in facts],
+            documents=[fact_document(f) for f in facts],
+        )
+        self.added += sum(1 for f in facts if f.id not in self.previous)
+        self.changed += len(facts)
+        # Written facts are durable: a resumed run must not embed them again
+        for f in facts:
+            self.previous[f.id] = self.hashes[f.id]
+
+    def checkpoint(self, progress: Dict[str, Any]):
+        publish_collection(self.collection)
+        save_manifest({
+            "version": self.manifest["version"],
+            "source": None,
+            "hashes": self.previous,
+            "embedding": embedding_signature(),
+            "shards": settings.index_shards,
+            "checkpoint": progress,
+        })
+
+    def finish(self, source: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+        removed = [i for i in self.previous if i not in self.hashes]
+        if removed:
+            self.collection.delete(ids=removed)
+        # Serving processes pick the new generation up before caches move to the new version
+        publish_collection(self.collection)
+        version = self.manifest["version"]
+        if self.changed or removed:
+            version = bump_index_version()
+        save_manifest({
+            "version": version,
+            "source": source,
+            "hashes": self.hashes,
+            "embedding": embedding_signature(),
+            "shards": settings.index_shards,
+        })
+        return {
+            "added": self.added,
+            "updated": self.changed - self.added,
+            "removed": len(removed),
+            "unchanged": len(self.hashes) - self.changed,
+            "version": version,
+        }
+
+
+def sync_index(collection, facts: List[Fact], source: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """Bring the collection in line with ``facts``, embedding only new or changed facts."""
+    manifest = load_manifest()
+    if is_current(collection, source, manifest):
+        # Nothing to embed; still rebuilds derived structures (quantized codes) for a changed mode
+        publish_collection(collection)
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": len(manifest["hashes"]), "version": get_index_version()}
+    else:
+        indexer = IncrementalIndexer(collection, manifest)
+        changed = indexer.plan(facts)
+        if changed:
+            indexer.write(changed, embed_documents([fact_document(f) for f in changed]))
+        stats = indexer.finish(source)
+    if not lexical_index_current(stats["version"]):
+        build_lexical_index(facts, stats["version"])
+        reset_lexical_index()
+    return stats
@@ -0,0 +1,256 @@
+import os
+import re
+import json
+import time
+import shutil
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..models import Fact
+from ..settings import settings
+from .store import get_index_version
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "can", "could", "do", "does", "for", "from", "had", "has",
+    "have", "how", "i", "if", "in", "is", "it", "me", "my", "of", "on", "or", "should", "so", "the", "to",
+    "what", "when", "which", "who", "why", "with", "you", "your",
+})
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def fact_terms(f: Fact) -> List[str]:
+    return tokenize(f"{f.symptom} {f.cause} {f.treatment} {f.precaution}")
+
+
+class BM25Builder:
+    """Accumulates facts (in any number of batches) into a BM25Index."""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.vocab: Dict[str, int] = {}
+        self._terms = array("i")
+        self._tfs = array("H")
+        self._doc_len = array("i")
+        self._doc_ptr = array("q", [0])
+
+    def add(self, facts: Iterable[Fact]):
+        vocab = self.vocab
+        for f in facts:
+            counts: Dict[int, int] = {}
+            terms = fact_terms(f)
+            for t in terms:
+                tid = vocab.get(t)
+                if tid is None:
+                    tid = vocab[t] = len(vocab)
+                counts[tid] = counts.get(tid, 0) + 1
+            self.ids.append(f.id)
+            self._terms.extend(counts.keys())
+            self._tfs.extend(min(c, 65535) for c in counts.values())
+            self._doc_len.append(len(terms))
+            self._doc_ptr.append(len(self._terms))
+        return self
+
+    def build(self, k1: Optional[float] = None, b: Optional[float] = None) -> "BM25Index":
+        k1 = settings.bm25_k1 if k1 is None else k1
+        b = settings.bm25_b if b is None else b
+        n_docs = len(self.ids)
+        terms = np.frombuffer(self._terms, dtype=np.int32) if len(self._terms) else np.zeros(0, dtype=np.int32)
+        tfs = np.frombuffer(self._tfs, dtype=np.uint16).astype(np.float32) if len(self._tfs) else np.zeros(0, dtype=np.float32)
+        doc_len = np.frombuffer(self._doc_len, dtype=np.int32).astype(np.float32) if n_docs else np.zeros(0, dtype=np.float32)
+        docs = np.repeat(np.arange(n_docs, dtype=np.int32), np.diff(np.frombuffer(self._doc_ptr, dtype=np.int64)))
+
+        # Group postings by term (CSR): offsets[t]:offsets[t+1] are the docs containing term t
+        order = np.argsort(terms, kind="stable")
+        df = np.bincount(terms, minlength=len(self.vocab))
+        offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+
+        # Store the final BM25 contribution of each posting, so a query only sums weights
+        avgdl = float(doc_len.mean()) if n_docs else 0.0
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1.0 - b + b * doc_len[docs] / max(avgdl, 1e-9))
+        weights = idf[terms] * tfs * (k1 + 1.0) / (tfs + norm)
+
+        terms_by_id = [""] * len(self.vocab)
+        for t, i in self.vocab.items():
+            terms_by_id[i] = t
+        return BM25Index(
+            ids=self.ids,
+            terms=terms_by_id,
+            offsets=offsets,
+            postings=docs[order],
+            weights=weights[order].astype(np.float32),
+            k1=k1,
+            b=b,
+            avgdl=avgdl,
+        )
+
+
+class BM25Index:
+    """Okapi BM25 over fact fields with CSR postings."""
+
+    HEADER_FILE = "bm25.json"
+
+    def __init__(self, ids, terms, offsets, postings, weights, k1, b, avgdl, index_version=None):
+        self.ids: List[str] = list(ids)
+        self.terms: List[str] = list(terms)
+        self.vocab: Dict[str, int] = {t: i for i, t in enumerate(self.terms)}
+        self.offsets = offsets
+        self.postings = postings
+        self.weights = weights
+        self.k1 = float(k1)
+        self.b = float(b)
+        self.avgdl = float(avgdl)
+        self.index_version = index_version
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: str, k: int) -> Tuple[List[str], np.ndarray]:
+        """Top ``k`` fact IDs and BM25 scores for ``query`` (empty when no term matches)."""
+        tids = sorted({self.vocab[t] for t in tokenize(query) if t in self.vocab})
+        if not tids or not self.ids:
+            return [], np.zeros(0, dtype=np.float32)
+        slices = [(int(self.offsets[t]), int(self.offsets[t + 1])) for t in tids]
+        total = sum(hi - lo for lo, hi in slices)
+        if len(slices) == 1:
+            lo, hi = slices[0]
+            docs, scores = np.asarray(self.postings[lo:hi]), np.asarray(self.weights[lo:hi])
+        else:
+            docs = np.concatenate([self.postings[lo:hi] for lo, hi in slices])
+            weights = np.concatenate([self.weights[lo:hi] for lo, hi in slices])
+            if total * 16 > len(self.ids):
+                # Dense accumulator is cheaper once postings cover a good share of the corpus
+                scores = np.bincount(docs, weights=weights, minlength=len(self.ids))
+                docs = np.flatnonzero(scores)
+                scores = scores[docs]
+            else:
+                docs, inverse = np.unique(docs, return_inverse=True)
+                scores = np.bincount(inverse, weights=weights)
+        k = min(int(k), len(docs))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(docs) else np.arange(len(docs))
+        # Best first; ties broken by document order for stable results
+        top = top[np.lexsort((docs[top], -scores[top]))]
+        return [self.ids[int(d)] for d in docs[top]], scores[top].astype(np.float32)
+
+    def save(self, path: str, index_version: int):
+        os.makedirs(path, exist_ok=True)
+        # Every array goes into a fresh gen-NNNNNN/ directory; the header names it and is replaced last,
+        # so readers see the old index or the new one, never a mix
+        numbers = _generation_numbers(path)
+        name = f"gen-{max(numbers, default=0) + 1:06d}"
+        gen = os.path.join(path, name)
+        shutil.rmtree(gen, ignore_errors=True)
+        os.makedirs(gen)
+        for fname, arr in (("offsets.npy", self.offsets), ("postings.npy", self.postings), ("weights.npy", self.weights)):
+            with open(os.path.join(gen, fname), "wb") as fh:
+                np.save(fh, np.asarray(arr))
+        for fname, values in (("terms.json", self.terms), ("ids.json", self.ids)):
+            with open(os.path.join(gen, fname), "w", encoding="utf-8") as fh:
+                fh.write(json.dumps(values, ensure_ascii=False, separators=(",", ":")))
+        previous = _header_generation(path)
+        tmp = os.path.join(path, self.HEADER_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({
+                "docs": len(self.ids), "terms": len(self.terms), "postings": int(self.postings.shape[0]),
+                "k1": self.k1, "b": self.b, "avgdl": self.avgdl, "index_version": int(index_version),
+                "generation": name,
+            }, fh)
+        os.replace(tmp, os.path.join(path, self.HEADER_FILE))
+        self.index_version = int(index_version)
+        # Keep the previous generation for readers that read the old header a moment ago
+        for number in numbers:
+            old = f"gen-{number:06d}"
+            if old != previous:
+                shutil.rmtree(os.path.join(path, old), ignore_errors=True)
+        for fname in ("offsets.npy", "postings.npy", "weights.npy", "terms.json", "ids.json"):
+            if os.path.exists(os.path.join(path, fname)):
+                os.unlink(os.path.join(path, fname))
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BM25Index"]:
+        try:
+            with open(os.path.join(path, cls.HEADER_FILE), "r", encoding="utf-8") as fh:
+                header = json.load(fh)
+            # Indexes saved before generations keep their files next to the header
+            gen = os.path.join(path, header["generation"]) if header.get("generation") else path
+            with open(os.path.join(gen, "terms.json"), "r", encoding="utf-8") as fh:
+                terms = json.load(fh)
+            with open(os.path.join(gen, "ids.json"), "r", encoding="utf-8") as fh:
+                ids = json.load(fh)
+            offsets = np.load(os.path.join(gen, "offsets.npy"))
+            postings = np.load(os.path.join(gen, "postings.npy"), mmap_mode="r")
+            weights = np.load(os.path.join(gen, "weights.npy"), mmap_mode="r")
+        except Exception:
+            return None
+        if len(ids) != header.get("docs") or len(terms) + 1 != offsets.shape[0] or postings.shape != weights.shape:
+            return None
+        return cls(ids, terms, offsets, postings, weights, header["k1"], header["b"], header["avgdl"], header.get("index_version"))
+
+
+def _generation_numbers(path: str) -> List[int]:
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return []
+    return [int(n[4:]) for n in names if n.startswith("gen-") and n[4:].isdigit()]
+
+
+def _header_generation(path: str) -> Optional[str]:
+    try:
+        with open(os.path.join(path, BM25Index.HEADER_FILE), "r", encoding="utf-8") as fh:
+            return json.load(fh).get("generation")
+    except (OSError, ValueError):
+        return None
+
+
+def build_lexical_index(facts: Iterable[Fact], index_version: Optional[int] = None, path: Optional[str] = None) -> BM25Index:
+    index = BM25Builder().add(facts).build()
+    index.save(path or settings.lexical_index_dir, get_index_version() if index_version is None else index_version)
+    return index
+
+
+def lexical_index_current(index_version: Optional[int] = None, path: Optional[str] = None) -> bool:
+    """True when the persisted BM25 index was built for the current index version."""
+    try:
+        with open(os.path.join(path or settings.lexical_index_dir, BM25Index.HEADER_FILE), "r", encoding="utf-8") as fh:
+            built_for = json.load(fh).get("index_version")
+    except (OSError, ValueError):
+        return False
+    return built_for == (get_index_version() if index_version is None else index_version)
+
+
+_loaded: Dict[str, object] = {"index": None, "mtime": None, "checked_at": float("-inf")}
+
+
+def get_lexical_index() -> Optional[BM25Index]:
+    """Process-wide BM25 index, reloaded after it is rebuilt on disk (None until built)."""
+    index = _loaded["index"]
+    if index is not None and index.index_version == get_index_version():
+        return index
+    now = time.monotonic()
+    # A rebuild may still be running after a version bump; check the header at most once a second
+    if now - _loaded["checked_at"] < 1.0:
+        return index
+    _loaded["checked_at"] = now
+    try:
+        mtime = os.stat(os.path.join(settings.lexical_index_dir, BM25Index.HEADER_FILE)).st_mtime_ns
+    except OSError:
+        return index
+    if mtime != _loaded["mtime"]:
+        fresh = BM25Index.load(settings.lexical_index_dir)
+        if fresh is not None:
+            _loaded.update(index=fresh, mtime=mtime)
+            index = fresh
+    return index
+
+
+def reset_lexical_index():
+    _loaded.update(index=None, mtime=None, checked_at=float("-inf"))
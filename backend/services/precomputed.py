@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..models import AskResponse
+from ..settings import settings
+from .embeddings import embedding_signature
+
+
+class PrecomputedAnswers:
+    """Read-only view of the precomputed answer table written by compression/precompute.py."""
+
+    def __init__(self, path: str, threshold: float, check_interval: float = 1.0):
+        self.path = path
+        self.threshold = float(threshold)
+        self.check_interval = float(check_interval)
+        self.meta: Dict[str, Any] = {}
+        self.rows: Dict[str, int] = {}
+        self.hits = 0
+        self.nearest_hits = 0
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._blob = b""
+        self._emergency = np.zeros(0, dtype=bool)
+        self._vectors = None
+        self._parsed: Dict[int, AskResponse] = {}
+        self._stat_key = None
+        self._checked_at = -float("inf")
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                self._clear()
+                return
+            stat_key = (st.st_mtime_ns, st.st_size, st.st_ino)
+            if stat_key == self._stat_key:
+                return
+            try:
+                self._load()
+            except Exception:
+                # Half-written or foreign file: serve without the table and retry on the next change
+                self._clear()
+            self._stat_key = stat_key
+
+    def _clear(self):
+        self.meta, self.rows, self._parsed = {}, {}, {}
+        self._vectors = None
+        self._stat_key = None
+
+    def _load(self):
+        with np.load(self.path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            keys = [str(k) for k in data["keys"]]
+            offsets = np.asarray(data["offsets"], dtype=np.int64)
+            blob = data["answers"].tobytes()
+            emergency = np.asarray(data["emergency"], dtype=bool)
+            vectors = None
+            if "vectors" in data:
+                vectors = np.asarray(data["vectors"], dtype=np.float32)
+            elif "vec_indptr" in data:
+                import scipy.sparse as sp  # type: ignore
+
+                vectors = sp.csr_matrix(
+                    (data["vec_data"], data["vec_indices"], data["vec_indptr"]),
+                    shape=tuple(int(x) for x in data["vec_shape"]),
+                )
+        self.meta = meta
+        self.rows = {k: i for i, k in enumerate(keys)}
+        self._offsets, self._blob, self._emergency, self._vectors = offsets, blob, emergency, vectors
+        self._parsed = {}
+
+    def _matches(self, scope: Tuple) -> bool:
+        top_k, mode, version, shards = scope
+        meta = self.meta
+        # Answers are computed over every shard, so shard-restricted requests never match
+        return (
+            bool(meta) and shards is None and meta.get("index_version") == version
+            and meta.get("top_k") == top_k and meta.get("mode") == mode
+        )
+
+    def _response(self, row: int) -> AskResponse:
+        resp = self._parsed.get(row)
+        if resp is None:
+            resp = AskResponse.model_validate_json(self._blob[self._offsets[row]:self._offsets[row + 1]])
+            self._parsed[row] = resp
+        return resp
+
+    def get(self, key: str, scope: Tuple) -> Optional[AskResponse]:
+        """Answer for the normalized query ``key`` computed under ``scope`` (top_k, mode, index version, shards)."""
+        self.refresh()
+        row = self.rows.get(key)
+        if row is None or not self._matches(scope):
+            return None
+        self.hits += 1
+        return self._response(row)
+
+    def nearest(self, embedding, scope: Tuple) -> Optional[AskResponse]:
+        """Answer of the closest non-emergency canonical question, if its cosine reaches ``threshold``."""
+        self.refresh()
+        vectors = self._vectors
+        if (
+            vectors is None or not 0.0 < self.threshold <= 1.0 or not self._matches(scope)
+            or self.meta.get("embedding") != embedding_signature()
+        ):
+            return None
+        if np.shape(embedding)[-1] != vectors.shape[1]:
+            return None
+        if hasattr(embedding, "tocsr") and hasattr(vectors, "tocsr"):
+            sims = (vectors @ embedding.T).toarray().ravel()
+        else:
+            q = embedding.toarray() if hasattr(embedding, "toarray") else embedding
+            sims = np.asarray(vectors @ np.asarray(q, dtype=np.float32).ravel()).ravel()
+        sims = np.where(self._emergency, -np.inf, sims)
+        row = int(np.argmax(sims)) if len(sims) else -1
+        if row < 0 or sims[row] < self.threshold:
+            return None
+        self.nearest_hits += 1
+        return self._response(row)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.rows),
+            "index_version": self.meta.get("index_version"),
+            "hits": self.hits,
+            "nearest_hits": self.nearest_hits,
+        }
+
+
+def write_table(
+    path: str,
+    keys: Sequence[str],
+    responses: Sequence[AskResponse],
+    emergency: Sequence[bool],
+    vectors,
+    meta: Dict[str, Any],
+):
+    """Write the table atomically; ``vectors`` are the L2-normalized query embeddings (ndarray, CSR or None)."""
+    blobs: List[bytes] = [r.model_dump_json(exclude_none=True).encode("utf-8") for r in responses]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in blobs])
+    arrays: Dict[str, np.ndarray] = {
+        "meta": np.array(json.dumps({**meta, "embedding": embedding_signature()})),
+        "keys": np.array(list(keys), dtype=str),
+        "offsets": offsets,
+        "answers": np.frombuffer(b"".join(blobs), dtype=np.uint8),
+        "emergency": np.asarray(emergency, dtype=bool),
+    }
+    if hasattr(vectors, "tocsr"):
+        vectors = vectors.tocsr()
+        arrays.update(
+            vec_indptr=vectors.indptr.astype(np.int64),
+            vec_indices=vectors.indices.astype(np.int32),
+            vec_data=vectors.data.astype(np.float32),
+            vec_shape=np.asarray(vectors.shape, dtype=np.int64),
+        )
+    elif vectors is not None:
+        arrays["vectors"] = np.asarray(vectors, dtype=np.float16)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        np.savez_compressed(fh, **arrays)
+    os.replace(tmp, path)
+
+
+precomputed_answers = PrecomputedAnswers(
+    settings.precomputed_answers_path,
+    settings.precomputed_match_threshold,
+    settings.index_reload_interval,
+)
@@ -0,0 +1,135 @@
+from typing import Optional
+
+import numpy as np
+
+
+# Rows scored per block: bounds the float32 scratch space whatever the index size
+_BLOCK_ROWS = 8192
+
+
+def _kmeans_l2(x: np.ndarray, k: int, iters: int, rng: np.random.Generator) -> np.ndarray:
+    """Euclidean k-means (PQ sub-codebooks are not unit vectors, unlike ann.kmeans)."""
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        # argmin ||x - c||^2 == argmax (x.c - ||c||^2 / 2)
+        assign = np.argmax(x @ centroids.T - 0.5 * np.einsum("ij,ij->i", centroids, centroids), axis=1)
+        # Sub-vectors are short: per-dimension bincounts beat np.add.at by far
+        sums = np.stack([np.bincount(assign, weights=x[:, d], minlength=k) for d in range(x.shape[1])], axis=1)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters with random points
+            sums[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)]
+            counts[empty] = 1
+        centroids = sums / counts[:, None]
+    return centroids.astype(np.float32)
+
+
+class ScalarQuantizer:
+    """int8 codes with one float32 scale per vector: x ~= codes * scale."""
+
+    kind = "int8"
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray):
+        self.codes = codes
+        self.scales = scales
+
+    @property
+    def rows(self) -> int:
+        return self.codes.shape[0]
+
+    @staticmethod
+    def encode(vecs: np.ndarray):
+        vecs = np.asarray(vecs, dtype=np.float32)
+        scales = (np.abs(vecs).max(axis=1) / 127.0).astype(np.float32) if len(vecs) else np.zeros(0, dtype=np.float32)
+        safe = np.where(scales > 0, scales, 1.0)[:, None]
+        codes = np.clip(np.rint(vecs / safe), -127, 127).astype(np.int8)
+        return codes, scales
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """(N x rows) inner products of float queries with the quantized rows."""
+        queries = np.asarray(queries, dtype=np.float32)
+        out = np.empty((queries.shape[0], self.rows), dtype=np.float32)
+        buf = np.empty((min(_BLOCK_ROWS, self.rows), self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, self.rows, _BLOCK_ROWS):
+            stop = min(start + _BLOCK_ROWS, self.rows)
+            block = buf[: stop - start]
+            np.copyto(block, self.codes[start:stop], casting="unsafe")
+            np.matmul(queries, block.T, out=out[:, start:stop])
+            out[:, start:stop] *= self.scales[start:stop]
+        return out
+
+    def __getitem__(self, rows) -> np.ndarray:
+        # Dequantized rows, so IVFIndex.search can score candidates on the codes
+        return np.asarray(self.codes[rows], dtype=np.float32) * np.asarray(self.scales[rows], dtype=np.float32)[:, None]
+
+
+class ProductQuantizer:
+    """Product quantization: ``m`` sub-vectors, each coded as one of 256 centroids (1 byte)."""
+
+    kind = "pq"
+    KSUB = 256
+
+    def __init__(self, codebooks: np.ndarray, codes: Optional[np.ndarray] = None):
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)  # (m x 256 x dsub)
+        self.codes = codes if codes is not None else np.zeros((0, self.m), dtype=np.uint8)
+
+    @property
+    def m(self) -> int:
+        return self.codebooks.shape[0]
+
+    @property
+    def rows(self) -> int:
+        return self.codes.shape[0]
+
+    @staticmethod
+    def subspaces(dim: int, m: int) -> int:
+        # Largest sub-vector count <= m that divides the dimension
+        m = max(1, min(m, dim))
+        while dim % m:
+            m -= 1
+        return m
+
+    @classmethod
+    def train(cls, vecs: np.ndarray, m: int, iters: int = 12, seed: int = 0, sample_size: int = 32 * KSUB) -> "ProductQuantizer":
+        rng = np.random.default_rng(seed)
+        n, dim = vecs.shape
+        m = cls.subspaces(dim, m)
+        idx = np.sort(rng.choice(n, size=min(n, sample_size), replace=False))
+        x = np.asarray(vecs[idx], dtype=np.float32)
+        ksub = min(cls.KSUB, len(x))
+        dsub = dim // m
+        books = np.zeros((m, cls.KSUB, dsub), dtype=np.float32)
+        for j in range(m):
+            books[j, :ksub] = _kmeans_l2(np.ascontiguousarray(x[:, j * dsub:(j + 1) * dsub]), ksub, iters, rng)
+        return cls(books)
+
+    def encode(self, vecs: np.ndarray) -> np.ndarray:
+        dsub = self.codebooks.shape[2]
+        norms = 0.5 * np.einsum("jkd,jkd->jk", self.codebooks, self.codebooks)
+        codes = np.empty((vecs.shape[0], self.m), dtype=np.uint8)
+        for start in range(0, vecs.shape[0], _BLOCK_ROWS):
+            block = np.asarray(vecs[start:start + _BLOCK_ROWS], dtype=np.float32)
+            for j in range(self.m):
+                sub = block[:, j * dsub:(j + 1) * dsub]
+                codes[start:start + len(block), j] = np.argmax(sub @ self.codebooks[j].T - norms[j], axis=1)
+        return codes
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        queries = np.asarray(queries, dtype=np.float32)
+        n, dsub = queries.shape[0], self.codebooks.shape[2]
+        # tables[q, j, c] = <query q's j-th sub-vector, centroid c of sub-codebook j>
+        tables = np.einsum("qjd,jkd->jqk", queries.reshape(n, self.m, dsub), self.codebooks)
+        out = np.zeros((n, self.rows), dtype=np.float32)
+        for start in range(0, self.rows, _BLOCK_ROWS):
+            stop = min(start + _BLOCK_ROWS, self.rows)
+            codes = np.asarray(self.codes[start:stop])
+            acc = out[:, start:stop]
+            for j in range(self.m):
+                # One gather per sub-space covers every query in the batch
+                acc += tables[j][:, codes[:, j]]
+        return out
+
+    def __getitem__(self, rows) -> np.ndarray:
+        codes = np.asarray(self.codes[rows])
+        return np.concatenate([self.codebooks[j][codes[:, j]] for j in range(self.m)], axis=1)
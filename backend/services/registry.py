@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+from pydantic import TypeAdapter
+
+from ..models import Fact
+from ..settings import settings
+
+
+_FACT_LIST = TypeAdapter(List[Fact])
+
+
+class FactRegistry:
+    """Process-wide, in-memory view of the facts file (JSON array or JSONL)."""
+
+    def __init__(self, path: str, check_interval: float = 1.0, aliases_path: Optional[str] = None):
+        self.path = path
+        self.aliases_path = aliases_path
+        self.check_interval = float(check_interval)
+        self.facts: List[Fact] = []
+        self.by_id: Dict[str, Fact] = {}
+        self.aliases: Dict[str, str] = {}
+        self.body: bytes = b"[]"
+        self.digest = ""
+        self.etag = '"empty"'
+        self.reloads = 0
+        self._stat_key = None
+        self._aliases_key = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload if the file changed; returns True when the facts were replaced."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        with self._lock:
+            self._checked_at = now
+            self._refresh_aliases()
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                changed = bool(self.facts)
+                self._load(b"[]", None)
+                return changed
+            stat_key = (st.st_mtime_ns, st.st_size)
+            if not force and stat_key == self._stat_key:
+                return False
+            with open(self.path, "rb") as fh:
+                raw = fh.read()
+            self._stat_key = stat_key
+            if hashlib.sha256(raw).hexdigest() == self.digest:
+                return False
+            self._load(raw, stat_key)
+            return True
+
+    def _refresh_aliases(self):
+        if not self.aliases_path:
+            return
+        try:
+            st = os.stat(self.aliases_path)
+        except OSError:
+            self.aliases, self._aliases_key = {}, None
+            return
+        key = (st.st_mtime_ns, st.st_size)
+        if key == self._aliases_key:
+            return
+        try:
+            with open(self.aliases_path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            # Keep the previous map in service; retried on the next check
+            return
+        self.aliases = {str(k): str(v) for k, v in data.items()} if isinstance(data, dict) else {}
+        self._aliases_key = key
+
+    def _load(self, raw: bytes, stat_key):
+        if self.path.endswith(".jsonl"):
+            raw_array = b"[" + b",".join(line for line in raw.splitlines() if line.strip()) + b"]"
+        else:
+            raw_array = raw if raw.strip() else b"[]"
+        # Parse, validate and serialize in pydantic-core: no intermediate dicts
+        facts = _FACT_LIST.validate_json(raw_array)
+        body = _FACT_LIST.dump_json(facts)
+        self.facts = facts
+        self.by_id = {f.id: f for f in facts}
+        self.body = body
+        self.digest = hashlib.sha256(raw).hexdigest() if stat_key else ""
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self._stat_key = stat_key
+        self.reloads += 1
+
+    @property
+    def fingerprint(self) -> Optional[Dict[str, object]]:
+        if not self._stat_key or not self.digest:
+            return None
+        return {"mtime_ns": self._stat_key[0], "size": self._stat_key[1], "sha256": self.digest}
+
+    def all(self) -> List[Fact]:
+        self.refresh()
+        return self.facts
+
+    def resolve(self, fact_id: str) -> str:
+        """Canonical ID for ``fact_id`` (itself unless it was merged into another fact)."""
+        return fact_id if fact_id in self.by_id else self.aliases.get(fact_id, fact_id)
+
+    def get(self, fact_id: str) -> Optional[Fact]:
+        self.refresh()
+        return self.by_id.get(self.resolve(fact_id))
+
+    def subset(self, fact_ids: List[str]) -> List[Fact]:
+        self.refresh()
+        by_id = self.by_id
+        # Several old IDs may resolve to one canonical fact: keep it once
+        resolved = dict.fromkeys(self.resolve(i) for i in fact_ids)
+        return [by_id[i] for i in resolved if i in by_id]
+
+
+fact_registry = FactRegistry(
+    settings.facts_path,
+    check_interval=settings.facts_reload_interval,
+    aliases_path=settings.fact_aliases_path,
+)
@@ -1,50 +1,295 @@
-from typing import List, Dict
+from typing import List, Dict, Optional, Sequence, Tuple
+
+import numpy as np
 
 from ..models import Fact
-from .embeddings import embed_text, embed_texts
-
-
-def ensure_indexed(collection, facts: List[Fact]):
-    # Check existing IDs to avoid duplicate upserts
-    existing_count = 0
-    try:
-        existing_count = collection.count()
-    except Exception:
-        existing_count = 0
-    if existing_count and existing_count >= len(facts):
-        return
-
-    ids = [f.id for f in facts]
-    metadatas = [
-        {
-            "symptom": f.symptom,
-            "cause": f.cause,
-            "treatment": f.treatment,
-            "precaution": f.precaution,
-        }
-        for f in facts
-    ]
-    documents = [
-        f"Symptom: {f.symptom}\nCause: {f.cause}\nTreatment: {f.treatment}\nPrecaution: {f.precaution}"
-        for f in facts
-    ]
-    embeddings = embed_texts(documents)
-    collection.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
-
-
-def semantic_search(collection, query: str, top_k: int = 4) -> List[Fact]:
-    q_emb = embed_text(query)
-    results = collection.query(query_embeddings=[q_emb], n_results=top_k)
+from ..settings import settings
+from .embeddings import embed_array, embed_query_array, stack_embeddings, to_dense
+from .cache import embedding_cache, normalize_query
+from .indexer import sync_index
+from .lexical import get_lexical_index
+from .verifier import index_facts
+from .tracing import note_scores
+from .store import shard_of
+
+
+RETRIEVAL_MODES = ("vector", "hybrid", "lexical")
+
+
+def ensure_indexed(collection, facts: List[Fact], source: Optional[Dict] = None) -> Dict[str, int]:
+    """Incrementally index ``facts``; a no-op when ``source`` matches the last run."""
+    index_facts(facts)
+    return sync_index(collection, facts, source=source)
+
+
+def _metadata_to_fact(_id: str, md: Dict) -> Fact:
+    return Fact(
+        id=_id,
+        symptom=md.get("symptom", ""),
+        cause=md.get("cause", ""),
+        treatment=md.get("treatment", ""),
+        precaution=md.get("precaution", ""),
+    )
+
+
+def _results_to_facts(results: Dict, row: int = 0) -> List[Fact]:
     out: List[Fact] = []
-    for i, _id in enumerate(results.get("ids", [[]])[0]):
-        md = results["metadatas"][0][i]
-        out.append(
-            Fact(
-                id=_id,
-                symptom=md.get("symptom", ""),
-                cause=md.get("cause", ""),
-                treatment=md.get("treatment", ""),
-                precaution=md.get("precaution", ""),
-            )
+    ids = results.get("ids") or [[]]
+    if row >= len(ids):
+        return out
+    for i, _id in enumerate(ids[row]):
+        out.append(_metadata_to_fact(_id, results["metadatas"][row][i]))
+    return out
+
+
+def _fetch_facts(collection, ids: List[str], known: Optional[Dict[str, Fact]] = None) -> List[Fact]:
+    """Facts for ``ids`` in that order; metadata not already in ``known`` comes from the collection."""
+    known = dict(known or {})
+    missing = [i for i in ids if i not in known]
+    if missing:
+        got = collection.get(ids=missing, include=["metadatas"])
+        for _id, md in zip(got["ids"], got["metadatas"]):
+            known[_id] = _metadata_to_fact(_id, md or {})
+    return [known[i] for i in ids if i in known]
+
+
+def indexed_facts(collection) -> List[Fact]:
+    """Every fact in ``collection``, rebuilt from its stored metadata."""
+    got = collection.get(include=["metadatas"])
+    return [_metadata_to_fact(_id, md or {}) for _id, md in zip(got["ids"], got["metadatas"])]
+
+
+def _collection_input(collection, embs):
+    # SimpleCollection consumes arrays (dense or CSR) directly; Chroma wants lists
+    if getattr(collection, "accepts_arrays", False):
+        return embs
+    return to_dense(embs).tolist()
+
+
+def embed_query(query: str):
+    """Query embedding as a (1 x D) float32 row (CSR for the hashing backend), cached."""
+    key = normalize_query(query)
+    q_emb = embedding_cache.get(key)
+    if q_emb is None:
+        q_emb = embed_query_array(query)
+        embedding_cache.set(key, q_emb)
+    return q_emb
+
+
+def _shard_kwargs(shards: Optional[Sequence[int]]) -> Dict:
+    # Only a ShardedCollection takes ``shards``; None searches every shard
+    return {} if shards is None else {"shards": list(shards)}
+
+
+Scored = Tuple[List[Fact], List[float]]
+
+
+def _scored(facts: List[Fact], ids: Sequence[str], scores: Sequence[float]) -> Scored:
+    # Facts the collection no longer holds are dropped by the fetch; keep the scores aligned
+    by_id = {i: float(s) for i, s in zip(ids, scores)}
+    return facts, [by_id.get(f.id, 0.0) for f in facts]
+
+
+def _similarities(results: Dict, row: int, query: str, k: Optional[int] = None) -> Scored:
+    facts = _results_to_facts(results, row)[:k]
+    if not results.get("distances") or row >= len(results["distances"]):
+        return facts, [0.0] * len(facts)
+    ids, distances = results["ids"][row][:k], results["distances"][row][:k]
+    note_scores(query, ids, distances, distances=True)
+    return _scored(facts, ids, [1.0 - float(d) for d in distances])
+
+
+def _semantic_scored(collection, query: str, top_k: int, query_embedding=None, shards: Optional[Sequence[int]] = None) -> Scored:
+    q_emb = query_embedding if query_embedding is not None else embed_query(query)
+    results = collection.query(query_embeddings=_collection_input(collection, q_emb), n_results=top_k, **_shard_kwargs(shards))
+    return _similarities(results, 0, query)
+
+
+def semantic_search(collection, query: str, top_k: int = 4, query_embedding=None, shards: Optional[Sequence[int]] = None) -> List[Fact]:
+    return _semantic_scored(collection, query, top_k, query_embedding, shards)[0]
+
+
+def embed_queries(queries: List[str]) -> List:
+    """Embed queries in one call, reusing cached query embeddings; one (1 x D) row per query."""
+    keys = [normalize_query(q) for q in queries]
+    q_embs = [embedding_cache.get(k) for k in keys]
+    missing = [i for i, e in enumerate(q_embs) if e is None]
+    if missing:
+        fresh = embed_array([queries[i] for i in missing])
+        for n, i in enumerate(missing):
+            q_embs[i] = fresh[n:n + 1]
+            embedding_cache.set(keys[i], q_embs[i])
+    return q_embs
+
+
+def semantic_search_batch(
+    collection,
+    queries: List[str],
+    top_k: List[int],
+    query_embeddings=None,
+    shards: Optional[List[Optional[Sequence[int]]]] = None,
+) -> List[List[Fact]]:
+    """Embed all queries at once and run a single multi-embedding collection query
+    (one per distinct shard subset when ``shards`` restricts some queries)."""
+    return [facts for facts, _ in _semantic_batch_scored(collection, queries, top_k, query_embeddings, shards)]
+
+
+def _semantic_batch_scored(collection, queries, top_k, query_embeddings=None, shards=None) -> List[Scored]:
+    if not queries:
+        return []
+    rows = query_embeddings if query_embeddings is not None else embed_queries(queries)
+    groups: Dict[Optional[Tuple[int, ...]], List[int]] = {}
+    for i in range(len(queries)):
+        groups.setdefault(tuple(shards[i]) if shards and shards[i] is not None else None, []).append(i)
+    out: List[Scored] = [([], []) for _ in queries]
+    for subset, members in groups.items():
+        q_embs = stack_embeddings([rows[i] for i in members])
+        results = collection.query(
+            query_embeddings=_collection_input(collection, q_embs),
+            n_results=max(top_k[i] for i in members),
+            **_shard_kwargs(subset),
+        )
+        for row, i in enumerate(members):
+            out[i] = _similarities(results, row, queries[i], top_k[i])
+    return out
+
+
+def resolve_mode(mode: Optional[str]) -> str:
+    mode = mode or settings.retrieval_mode
+    return mode if mode in RETRIEVAL_MODES else "vector"
+
+
+def _lexical_ranking(index, collection, query: str, k: int, shards: Optional[Sequence[int]]):
+    if shards is None:
+        return index.search(query, k)
+    # One BM25 index spans every shard: over-fetch by the share of shards left out, then filter
+    total = len(collection)
+    ids, scores = index.search(query, k * -(-total // len(shards)) * 2)
+    keep = np.isin(shard_of(ids, total), list(shards))
+    return [i for i, kept in zip(ids, keep) if kept][:k], np.asarray(scores)[keep][:k]
+
+
+def lexical_search(collection, query: str, top_k: int = 4, shards: Optional[Sequence[int]] = None) -> Optional[List[Fact]]:
+    """BM25-only retrieval; needs no embedding model. None when no BM25 index is built."""
+    scored = _lexical_scored(collection, query, top_k, shards)
+    return None if scored is None else scored[0]
+
+
+def _lexical_scored(collection, query: str, top_k: int, shards: Optional[Sequence[int]] = None) -> Optional[Scored]:
+    index = get_lexical_index()
+    if index is None:
+        return None
+    ids, scores = _lexical_ranking(index, collection, query, top_k, shards)
+    note_scores(query, ids, scores)
+    return _scored(_fetch_facts(collection, ids), ids, scores)
+
+
+def _rrf(rankings: Sequence[Sequence[str]], k: int) -> Tuple[List[str], List[float]]:
+    # Reciprocal-rank fusion: sum of 1 / (rrf_k + rank) over every ranking an ID appears in
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, _id in enumerate(ranking):
+            scores[_id] = scores.get(_id, 0.0) + 1.0 / (settings.rrf_k + rank + 1)
+    ids = sorted(scores, key=lambda i: -scores[i])[:k]
+    return ids, [scores[i] for i in ids]
+
+
+def hybrid_search(
+    collection,
+    query: str,
+    top_k: int = 4,
+    query_embedding=None,
+    vector_facts: Optional[List[Fact]] = None,
+    shards: Optional[Sequence[int]] = None,
+) -> List[Fact]:
+    """Fuse BM25 and vector rankings with RRF; pass ``vector_facts`` to reuse a vector query already run."""
+    vector = None if vector_facts is None else (vector_facts, [0.0] * len(vector_facts))
+    return _hybrid_scored(collection, query, top_k, query_embedding, vector, shards)[0]
+
+
+def _hybrid_scored(collection, query: str, top_k: int, query_embedding=None, vector: Optional[Scored] = None, shards=None) -> Scored:
+    n = max(top_k, settings.hybrid_candidates)
+    if vector is None:
+        vector = _semantic_scored(collection, query, n, query_embedding, shards)
+    vector_facts, vector_scores = vector
+    index = get_lexical_index()
+    if index is None:
+        return vector_facts[:top_k], vector_scores[:top_k]
+    lexical_ids, _ = _lexical_ranking(index, collection, query, n, shards)
+    fused, fused_scores = _rrf([[f.id for f in vector_facts], lexical_ids], top_k)
+    note_scores(query, fused, fused_scores)
+    return _scored(_fetch_facts(collection, fused, {f.id: f for f in vector_facts}), fused, fused_scores)
+
+
+def retrieve(
+    collection,
+    query: str,
+    top_k: int = 4,
+    mode: Optional[str] = None,
+    query_embedding=None,
+    shards: Optional[Sequence[int]] = None,
+) -> List[Fact]:
+    """``shards`` restricts a sharded collection to those shard numbers (None: all)."""
+    return retrieve_scored(collection, query, top_k, mode, query_embedding, shards)[0]
+
+
+def retrieve_scored(
+    collection,
+    query: str,
+    top_k: int = 4,
+    mode: Optional[str] = None,
+    query_embedding=None,
+    shards: Optional[Sequence[int]] = None,
+) -> Scored:
+    """``retrieve`` plus each fact's retrieval score (cosine, BM25 or RRF by mode; higher is better)."""
+    mode = resolve_mode(mode)
+    if mode == "lexical":
+        scored = _lexical_scored(collection, query, top_k, shards)
+        if scored is not None:
+            return scored
+    elif mode == "hybrid":
+        return _hybrid_scored(collection, query, top_k, query_embedding, shards=shards)
+    return _semantic_scored(collection, query, top_k, query_embedding, shards)
+
+
+def retrieve_batch(
+    collection,
+    queries: List[str],
+    top_k: List[int],
+    modes: List[str],
+    query_embeddings: List,
+    shards: Optional[List[Optional[Sequence[int]]]] = None,
+) -> List[List[Fact]]:
+    """Batch retrieval with per-query modes: one collection query covers every vector and hybrid item."""
+    return [facts for facts, _ in retrieve_batch_scored(collection, queries, top_k, modes, query_embeddings, shards)]
+
+
+def retrieve_batch_scored(
+    collection,
+    queries: List[str],
+    top_k: List[int],
+    modes: List[str],
+    query_embeddings: List,
+    shards: Optional[List[Optional[Sequence[int]]]] = None,
+) -> List[Scored]:
+    """``retrieve_batch`` with each query's (facts, scores), as from ``retrieve_scored``."""
+    modes = [resolve_mode(m) for m in modes]
+    shards = shards or [None] * len(queries)
+    out: List[Optional[Scored]] = [None] * len(queries)
+    for i, mode in enumerate(modes):
+        if mode == "lexical":
+            out[i] = _lexical_scored(collection, queries[i], top_k[i], shards=shards[i])
+            if out[i] is None:
+                modes[i] = "vector"
+    dense = [i for i in range(len(queries)) if out[i] is None]
+    if dense:
+        sizes = [max(top_k[i], settings.hybrid_candidates) if modes[i] == "hybrid" else top_k[i] for i in dense]
+        rows = [query_embeddings[i] if query_embeddings[i] is not None else embed_query(queries[i]) for i in dense]
+        results = _semantic_batch_scored(
+            collection, [queries[i] for i in dense], sizes, query_embeddings=rows, shards=[shards[i] for i in dense]
         )
-    return out
\ No newline at end of file
+        for i, scored in zip(dense, results):
+            if modes[i] == "hybrid":
+                scored = _hybrid_scored(collection, queries[i], top_k[i], vector=scored, shards=shards[i])
+            out[i] = scored
+    return out
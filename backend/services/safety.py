@@ -1,39 +1,158 @@
-from typing import Tuple, Dict
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+import os
 import re
+import json
+import time
+import threading
 
+from ..settings import settings
 
-EMERGENCY_PATTERNS = [
-    r"chest pain",
-    r"shortness of breath",
-    r"severe bleeding",
-    r"stroke",
-    r"numbness on one side",
-    r"fainting",
-    r"unresponsive",
-    r"suicidal|self-harm",
-]
+
+# Built-in red flags, used when the phrase file is missing
+DEFAULT_RED_FLAGS: Dict[str, List[str]] = {
+    "cardiac": ["chest pain"],
+    "respiratory": ["shortness of breath"],
+    "bleeding": ["severe bleeding", "bleeding heavily"],
+    "neurological": ["stroke", "heatstroke", "sunstroke", "numbness on one side", "seizure"],
+    "consciousness": ["fainting", "fainted", "unresponsive"],
+    "self_harm": ["suicidal", "self-harm"],
+}
 
 
 DISCLAIMER = (
     "This information is educational and not a diagnosis, prescription, or a substitute for professional care."
 )
 
+URGENT = (
+    "If you or someone is experiencing potential emergency symptoms (e.g., chest pain, severe difficulty breathing, signs of stroke), "
+    "seek immediate medical care or call local emergency services. "
+)
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_END = ""  # trie key holding the categories of a phrase ending at that node; tokens are never empty
+_STEMS = "*"  # trie key holding the lengths of the phrase-final tokens below that node, longest first
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class PhraseMatcher:
+    """Word-level trie over every red-flag phrase; a phrase's last word also matches as a prefix."""
+
+    def __init__(self, phrases: Dict[str, Iterable[str]]):
+        self.root: Dict = {}
+        self.size = 0
+        self.max_len = 0
+        for category, items in phrases.items():
+            for phrase in items:
+                toks = _tokens(phrase)
+                if not toks:
+                    continue
+                node = self.root
+                for t in toks[:-1]:
+                    node = node.setdefault(t, {})
+                stems = node.setdefault(_STEMS, [])
+                if len(toks[-1]) not in stems:
+                    stems.append(len(toks[-1]))
+                    stems.sort(reverse=True)
+                node = node.setdefault(toks[-1], {})
+                node.setdefault(_END, set()).add(category)
+                self.size += 1
+                self.max_len = max(self.max_len, len(toks))
+
+    def match(self, text: str) -> Set[str]:
+        toks = _tokens(text)
+        root = self.root
+        found: Set[str] = set()
+        for start in range(len(toks)):
+            node = root
+            pos = start
+            while node is not None and pos < len(toks):
+                tok = toks[pos]
+                for n in node.get(_STEMS, ()):
+                    if n <= len(tok):
+                        cats = node.get(tok[:n], {}).get(_END)
+                        if cats:
+                            found.update(cats)
+                node = node.get(tok)
+                pos += 1
+        return found
+
+
+class RedFlagSet:
+    """Hot-reloadable red-flag phrases: a JSON object mapping category -> phrases."""
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = float(check_interval)
+        self.matcher = PhraseMatcher(DEFAULT_RED_FLAGS)
+        self.reloads = 0
+        self._listeners: List[Callable[[], None]] = []
+        self._stat_key = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> bool:
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        with self._lock:
+            self._checked_at = now
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                if self._stat_key is None:
+                    return False
+                self._swap(PhraseMatcher(DEFAULT_RED_FLAGS), None)
+                return True
+            stat_key = (st.st_mtime_ns, st.st_size)
+            if not force and stat_key == self._stat_key:
+                return False
+            try:
+                with open(self.path, "r", encoding="utf-8") as fh:
+                    phrases = json.load(fh)
+                matcher = PhraseMatcher({str(k): list(v) for k, v in phrases.items()})
+            except (OSError, ValueError, AttributeError, TypeError):
+                return False
+            self._swap(matcher, stat_key)
+            return True
+
+    def on_reload(self, fn: Callable[[], None]):
+        """Call ``fn`` whenever the phrase set changes, e.g. to drop answers cached without a banner."""
+        self._listeners.append(fn)
+
+    def _swap(self, matcher: PhraseMatcher, stat_key):
+        self.matcher, self._stat_key = matcher, stat_key
+        self.reloads += 1
+        for fn in self._listeners:
+            fn()
+
+    def match(self, text: str) -> List[str]:
+        self.refresh()
+        return sorted(self.matcher.match(text))
+
+
+red_flags = RedFlagSet(settings.red_flags_path, settings.red_flags_reload_interval)
+
+
+def match_red_flags(text: str) -> List[str]:
+    """Red-flag categories mentioned in ``text`` (empty when none)."""
+    return red_flags.match(text)
+
 
 def detect_emergency(text: str) -> bool:
-    t = text.lower()
-    return any(re.search(pat, t) for pat in EMERGENCY_PATTERNS)
-
-
-def apply_safety(query: str, answer: str) -> Tuple[str, Dict[str, bool]]:
-    flags = {"emergency": False, "override": False}
-    if detect_emergency(query):
-        flags["emergency"] = True
-        urgent = (
-            "If you or someone is experiencing potential emergency symptoms (e.g., chest pain, severe difficulty breathing, signs of stroke), "
-            "seek immediate medical care or call local emergency services. "
-        )
-        answer = urgent + " " + answer
+    return bool(match_red_flags(text))
+
+
+def apply_safety(query: str, answer: str) -> Tuple[str, Dict[str, object]]:
+    categories = match_red_flags(query)
+    flags = {"emergency": bool(categories), "override": False, "categories": categories}
+    # Idempotent, so cached answers can be passed through again
+    if categories and not answer.startswith(URGENT):
+        answer = URGENT + " " + answer
     # Always append disclaimer
     if not answer.strip().endswith(DISCLAIMER):
         answer = answer.strip() + " " + DISCLAIMER
-    return answer, flags
\ No newline at end of file
+    return answer, flags
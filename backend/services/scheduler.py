@@ -0,0 +1,116 @@
+import heapq
+import asyncio
+import itertools
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+from ..settings import settings
+
+
+class Shed(Exception):
+    """Raised instead of admitting a request: the queue was full or its deadline passed."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionController:
+    """Bounds concurrent /ask pipeline executions, queueing the rest."""
+
+    def __init__(self, max_inflight: int, max_queue: int, timeout: float):
+        self.max_inflight = int(max_inflight)
+        self.max_queue = max(0, int(max_queue))
+        self.timeout = float(timeout)
+        self.inflight = 0
+        self.queued = 0
+        self.admitted_total = 0
+        self.shed_total: Dict[str, int] = {"queue_full": 0, "deadline": 0}
+        # (0 for priority else 1, arrival order, future resolved when a slot is handed over)
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    async def acquire(self, priority: bool = False):
+        """Wait for a slot; every successful acquire must be paired with ``release``."""
+        if self.max_inflight <= 0 or (self.inflight < self.max_inflight and not self.queued):
+            self.inflight += 1
+            self.admitted_total += 1
+            return
+        if not priority and self.queued >= self.max_queue:
+            self._shed("queue_full")
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (0 if priority else 1, next(self._order), fut))
+        self.queued += 1
+        try:
+            if priority:
+                await fut
+            else:
+                await asyncio.wait_for(asyncio.shield(fut), self.timeout)
+        except asyncio.TimeoutError:
+            # A slot handed over at the deadline is still ours
+            if not fut.done():
+                fut.cancel()
+                self._shed("deadline")
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()
+            else:
+                fut.cancel()
+            raise
+        finally:
+            self.queued -= 1
+        self.admitted_total += 1
+
+    def release(self):
+        # Hand the slot straight to the next live waiter, so it cannot be taken by a newcomer
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.inflight -= 1
+
+    def _shed(self, reason: str):
+        self.shed_total[reason] += 1
+        raise Shed(reason)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inflight": self.inflight,
+            "queued": self.queued,
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            "timeout": self.timeout,
+            "admitted": self.admitted_total,
+            "shed": dict(self.shed_total),
+        }
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one computation."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """(result, shared): ``shared`` is True when another caller's computation was reused."""
+        task = self._calls.get(key)
+        if task is not None:
+            return await asyncio.shield(task), True
+        task = asyncio.ensure_future(fn())
+        self._calls[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task), False
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved: every caller may have gone away
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+admission = AdmissionController(settings.ask_max_inflight, settings.ask_max_queue, settings.ask_queue_timeout)
+ask_flights = SingleFlight()
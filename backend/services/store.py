@@ -1,76 +1,929 @@
 import os
 import json
-from typing import List, Dict, Any
+import mmap
+import time
+import heapq
+import shutil
+import hashlib
+import warnings
+import itertools
+import threading
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 import numpy as np
 
-try:
-    import chromadb  # type: ignore
-    from chromadb.config import Settings as ChromaSettings  # type: ignore
-    _CHROMA_AVAILABLE = True
-except Exception:
-    chromadb = None
-    ChromaSettings = None
-    _CHROMA_AVAILABLE = False
+# chromadb is imported when the client is first created
+_CHROMA_AVAILABLE = importlib.util.find_spec("chromadb") is not None
 
 from ..models import Fact
 from ..settings import settings
+from .ann import IVFIndex
+from .embeddings import sparse_embeddings
+from .quantization import ProductQuantizer, ScalarQuantizer
 
 
 _client = None
 _collection = None
+_index_version = (None, 0)  # (mtime_ns of the version file, version)
+
+
+def get_index_version() -> int:
+    """Current index version, re-read only when the version file changes on disk."""
+    global _index_version
+    try:
+        mtime = os.stat(settings.index_version_path).st_mtime_ns
+    except OSError:
+        return 0
+    if mtime != _index_version[0]:
+        try:
+            with open(settings.index_version_path, "r", encoding="utf-8") as fh:
+                _index_version = (mtime, int(fh.read().strip() or 0))
+        except (OSError, ValueError):
+            return _index_version[1]
+    return _index_version[1]
+
+
+def bump_index_version() -> int:
+    version = get_index_version() + 1
+    os.makedirs(os.path.dirname(settings.index_version_path) or ".", exist_ok=True)
+    tmp = settings.index_version_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(str(version))
+    os.replace(tmp, settings.index_version_path)
+    return version
+
+
+def _id_hashes(ids: Sequence[str]) -> np.ndarray:
+    # 64-bit ID hashes; lookups confirm the ID on the record, so collisions are harmless
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(i.encode("utf-8"), digest_size=8).digest(), "little") for i in ids),
+        dtype=np.uint64,
+        count=len(ids),
+    )
+
+
+def _write_at(path: str, data: bytes, offset: int):
+    # Overwrite from ``offset`` and cut the file there, dropping any tail an interrupted writer left
+    with open(path, "r+b" if os.path.exists(path) else "wb") as fh:
+        fh.seek(offset)
+        fh.write(data)
+        fh.truncate()
+
+
+def _to_csr(vecs):
+    """Row-normalized float32 CSR matrix from CSR, ndarray or list input."""
+    import scipy.sparse as sp  # type: ignore
+
+    if hasattr(vecs, "tocsr"):
+        mat = vecs.tocsr().astype(np.float32)
+    else:
+        arr = np.asarray(vecs, dtype=np.float32)
+        mat = sp.csr_matrix(arr.reshape(1, -1) if arr.ndim == 1 else arr)
+    mat.sort_indices()
+    norms = np.sqrt(np.asarray(mat.multiply(mat).sum(axis=1), dtype=np.float32).ravel()) + 1e-9
+    mat.data = mat.data / np.repeat(norms, np.diff(mat.indptr))
+    return mat
+
+
+def _gather(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    # Positions of the concatenated slices [starts[i], starts[i] + lengths[i])
+    ends = np.cumsum(lengths)
+    return np.arange(int(ends[-1]) if len(ends) else 0) + np.repeat(starts - ends + lengths, lengths)
+
+
+def _link_or_copy(src: str, dst: str):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class _Generation:
+    """One generation of a SimpleCollection, opened read-only."""
+
+    def __init__(self, path: str, number: int, dim: int, dtype: np.dtype, rows: int, storage: str = "dense"):
+        self.path = path
+        self.number = number
+        self.dim = dim
+        self.dtype = dtype
+        self.rows = rows
+        self.storage = storage
+        self.emb: Optional[np.ndarray] = None
+        # Sparse storage: CSR rows (row end offsets into the index/value files)...
+        self.row_ends = np.zeros(0, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.values = np.zeros(0, dtype=np.float32)
+        # ...and feature -> (row, weight) postings covering the first ``postings_rows`` rows
+        self.postings: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        self.postings_rows = 0
+        self.offsets = np.zeros(0, dtype=np.int64)
+        self.records: Optional[mmap.mmap] = None
+        self.live: Optional[np.ndarray] = None
+        self.dead = np.zeros(0, dtype=np.int64)
+        self.lookup: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self.ann: Optional[IVFIndex] = None
+        self.id_to_row: Optional[Dict[str, int]] = None
+        self.quant_kind: Optional[str] = None
+        self.codebooks: Optional[np.ndarray] = None
+        self.quant_trained = 0
+        self.quant = None
+
+    def file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def open(self, live: Optional[np.ndarray] = None) -> "_Generation":
+        if self.rows and self.storage == "sparse":
+            self.row_ends = np.memmap(self.file(SimpleCollection.ROW_ENDS_FILE), dtype=np.int64, mode="r", shape=(self.rows,))
+            if self.nnz:
+                self.indices = np.memmap(self.file(SimpleCollection.INDICES_FILE), dtype=np.int32, mode="r", shape=(self.nnz,))
+                self.values = np.memmap(self.file(SimpleCollection.VALUES_FILE), dtype=np.float32, mode="r", shape=(self.nnz,))
+        elif self.rows:
+            self.emb = np.memmap(self.file(SimpleCollection.EMBEDDINGS_FILE), dtype=self.dtype, mode="r", shape=(self.rows, self.dim))
+        if self.rows:
+            self.offsets = np.memmap(self.file(SimpleCollection.OFFSETS_FILE), dtype=np.int64, mode="r", shape=(self.rows,))
+            with open(self.file(SimpleCollection.ROWS_FILE), "rb") as fh:
+                self.records = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            if live is None and os.path.exists(self.file(SimpleCollection.LIVE_FILE)):
+                live = np.memmap(self.file(SimpleCollection.LIVE_FILE), dtype=np.uint8, mode="r", shape=(self.rows,))
+        self.live = live if live is not None else np.ones(self.rows, dtype=np.uint8)
+        self.dead = np.flatnonzero(self.live == 0)
+        return self
+
+    def open_quantizer(self, kind: Optional[str], codebooks: Optional[np.ndarray] = None, trained_rows: int = 0) -> "_Generation":
+        # Map the code files written for ``kind``; None leaves queries on the float matrix
+        self.quant_kind, self.codebooks, self.quant_trained = kind, codebooks, trained_rows
+        self.quant = None
+        if kind == "int8" and self.rows:
+            codes = np.memmap(self.file(SimpleCollection.CODES_FILE), dtype=np.int8, mode="r", shape=(self.rows, self.dim))
+            scales = np.memmap(self.file(SimpleCollection.SCALES_FILE), dtype=np.float32, mode="r", shape=(self.rows,))
+            self.quant = ScalarQuantizer(codes, scales)
+        elif kind == "pq" and self.rows:
+            codes = np.memmap(self.file(SimpleCollection.CODES_FILE), dtype=np.uint8, mode="r", shape=(self.rows, codebooks.shape[0]))
+            self.quant = ProductQuantizer(codebooks, codes)
+        return self
+
+    @property
+    def live_rows(self) -> int:
+        return self.rows - len(self.dead)
+
+    @property
+    def nnz(self) -> int:
+        return int(self.row_ends[-1]) if len(self.row_ends) else 0
+
+    def csr(self, start: int = 0, stop: Optional[int] = None):
+        """Rows ``start:stop`` of a sparse generation as a CSR matrix over the mapped files."""
+        import scipy.sparse as sp  # type: ignore
+
+        stop = self.rows if stop is None else stop
+        lo = int(self.row_ends[start - 1]) if start else 0
+        ends = np.asarray(self.row_ends[start:stop], dtype=np.int64)
+        hi = int(ends[-1]) if len(ends) else lo
+        indptr = np.concatenate([[0], ends - lo])
+        return sp.csr_matrix((self.values[lo:hi], self.indices[lo:hi], indptr), shape=(stop - start, self.dim))
+
+    def vectors(self, rows: np.ndarray):
+        """Float32 rows in the generation's storage: an ndarray, or CSR for sparse storage."""
+        if self.storage == "sparse":
+            return self.csr()[rows]
+        return np.asarray(self.emb[rows], dtype=np.float32) if len(rows) else np.zeros((0, self.dim), dtype=np.float32)
+
+    def record(self, row: int) -> Dict[str, Any]:
+        start = int(self.offsets[row])
+        end = self.records.find(b"\n", start)
+        return json.loads(self.records[start:end if end != -1 else len(self.records)])
+
+    def ids_index(self) -> Dict[str, int]:
+        # Built lazily: only writers (and indexes without lookup tables) need an ID -> row dict
+        if self.id_to_row is None:
+            self.id_to_row = {self.record(int(r))["id"]: int(r) for r in np.flatnonzero(self.live)}
+        return self.id_to_row
+
+    def find(self, ids: Sequence[str]) -> List[Dict[str, Any]]:
+        """Records of the live rows holding ``ids``, in that order; unknown IDs are skipped."""
+        if self.lookup is None or self.id_to_row is not None:
+            id_to_row = self.ids_index()
+            return [self.record(id_to_row[i]) for i in ids if i in id_to_row]
+        keys, rows = self.lookup
+        hashes = _id_hashes(ids)
+        out = []
+        for _id, h, pos in zip(ids, hashes, np.searchsorted(keys, hashes)):
+            while pos < len(keys) and keys[pos] == h:
+                rec = self.record(int(rows[pos]))
+                if rec["id"] == _id:
+                    out.append(rec)
+                    break
+                pos += 1
+        return out
 
 
 class SimpleCollection:
-    """Pure-Python fallback collection using cosine similarity on embeddings.
-    Persisted to data/simple_index.json for portability.
+    """NumPy fallback collection using cosine similarity on embeddings.
+    Persisted under data/simple_index/ as immutable, memory-mapped generations.
     """
 
-    def __init__(self, path: str):
+    POINTER_FILE = "CURRENT"
+    HEADER_FILE = "index.json"
+    EMBEDDINGS_FILE = "embeddings.bin"
+    ROWS_FILE = "rows.jsonl"
+    OFFSETS_FILE = "rows.idx"
+    HASHES_FILE = "ids.hash"
+    LIVE_FILE = "live.bin"
+    LOOKUP_KEYS_FILE = "lookup.keys.npy"
+    LOOKUP_ROWS_FILE = "lookup.rows.npy"
+    IVF_DIR = "ivf"
+    CODES_FILE = "codes.bin"
+    SCALES_FILE = "scales.bin"
+    CODEBOOKS_FILE = "pq.npy"
+    ROW_ENDS_FILE = "csr.ptr"
+    INDICES_FILE = "csr.idx"
+    VALUES_FILE = "csr.val"
+    POSTINGS_PTR_FILE = "postings.ptr.npy"
+    POSTINGS_ROWS_FILE = "postings.rows.npy"
+    POSTINGS_VALUES_FILE = "postings.val.npy"
+    APPEND_FILES = (EMBEDDINGS_FILE, ROWS_FILE, OFFSETS_FILE, HASHES_FILE, ROW_ENDS_FILE, INDICES_FILE, VALUES_FILE)
+    QUANT_FILES = (CODES_FILE, SCALES_FILE)
+    COMPACT_RATIO = 0.25
+    accepts_arrays = True
+    accepts_sparse = True
+
+    def __init__(
+        self,
+        path: str,
+        dtype: Optional[str] = None,
+        legacy_path: Optional[str] = None,
+        vector_index: Optional[str] = None,
+        quantization: Optional[str] = None,
+        storage: Optional[str] = None,
+    ):
         self.path = path
-        self.data: Dict[str, Dict[str, Any]] = {}
-        if os.path.exists(self.path):
+        self.dtype = np.dtype(dtype or settings.simple_index_dtype)
+        storage = storage or settings.simple_index_storage
+        if storage == "auto":
+            storage = "sparse" if sparse_embeddings() else "dense"
+        self.storage = storage
+        self.vector_index = vector_index or settings.vector_index
+        self.quantization = quantization or settings.vector_quantization
+        if storage == "sparse" and (self.vector_index == "ivf" or self.quantization != "none"):
+            # Both work on dense rows only; sparse search is already exact over postings
+            warnings.warn(
+                f"Sparse storage ignores vector_index={self.vector_index!r} and quantization={self.quantization!r}; "
+                "set SIMPLE_INDEX_STORAGE=dense to use them",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+        self._gen = _Generation(path, 0, 0, self.dtype, 0).open()
+        self._staging = False
+        self._pointer_key = None
+        self._checked_at = time.monotonic()
+        self._seen_version = get_index_version()
+        if os.path.exists(self._file(self.POINTER_FILE)) or os.path.exists(self._file(self.HEADER_FILE)):
             try:
-                with open(self.path, "r", encoding="utf-8") as fh:
-                    raw = json.load(fh)
-                    self.data = raw if isinstance(raw, dict) else {}
+                self._load()
             except Exception:
-                self.data = {}
+                pass
+        elif legacy_path and os.path.exists(legacy_path):
+            self._migrate_legacy(legacy_path)
+
+    # The current generation's shape, for callers that predate generations
+    @property
+    def generation(self) -> int:
+        return self._gen.number
+
+    @property
+    def rows(self) -> int:
+        return self._gen.rows
+
+    @property
+    def dim(self) -> int:
+        return self._gen.dim
+
+    @property
+    def ann(self) -> Optional[IVFIndex]:
+        return self._gen.ann
+
+    @property
+    def _emb(self) -> Optional[np.ndarray]:
+        return self._gen.emb
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        try:
+            st = os.stat(self._file(self.POINTER_FILE))
+        except OSError:
+            st, path = None, self.path  # single-directory layout from before generations
+        else:
+            with open(self._file(self.POINTER_FILE), "r", encoding="utf-8") as fh:
+                path = os.path.join(self.path, fh.read().strip())
+        with open(os.path.join(path, self.HEADER_FILE), "r", encoding="utf-8") as fh:
+            header = json.load(fh)
+        dtype = np.dtype(header.get("dtype", self.dtype.name))
+        storage = header.get("storage", "dense")
+        gen = _Generation(path, int(header.get("generation", 0)), int(header.get("dim", 0)), dtype, int(header.get("rows", 0)), storage).open()
+        if storage == "sparse" and header.get("postings_rows"):
+            gen.postings = tuple(np.load(gen.file(name), mmap_mode="r") for name in (
+                self.POSTINGS_PTR_FILE, self.POSTINGS_ROWS_FILE, self.POSTINGS_VALUES_FILE,
+            ))
+            gen.postings_rows = int(header["postings_rows"])
+        if gen.rows and os.path.exists(gen.file(self.LOOKUP_KEYS_FILE)):
+            gen.lookup = (
+                np.load(gen.file(self.LOOKUP_KEYS_FILE), mmap_mode="r"),
+                np.load(gen.file(self.LOOKUP_ROWS_FILE), mmap_mode="r"),
+            )
+        if self.vector_index == "ivf":
+            ann = IVFIndex.load(gen.file(self.IVF_DIR))
+            gen.ann = ann if ann is not None and ann.rows == gen.rows else None
+            if gen.ann is None:
+                self._fit_ann(gen)
+        quant = header.get("quantization") or {}
+        # Codes built for another mode are ignored until the writer rebuilds them
+        if quant.get("kind") and quant["kind"] == self.quantization:
+            codebooks = np.load(gen.file(self.CODEBOOKS_FILE)) if quant["kind"] == "pq" else None
+            gen.open_quantizer(quant["kind"], codebooks, int(quant.get("trained_rows", 0)))
+        self.dtype = dtype
+        self._gen = gen
+        self._pointer_key = (st.st_mtime_ns, st.st_ino) if st else None
+
+    def _refresh(self):
+        """Switch to a newly published generation; a no-op while this process has staged changes."""
+        if self._staging:
+            return
+        now = time.monotonic()
+        version = get_index_version()
+        # A version bump means a publish just happened: check right away so caches keyed
+        # on the new version never hold answers from the old generation
+        if now - self._checked_at < settings.index_reload_interval and version == self._seen_version:
+            return
+        self._checked_at, self._seen_version = now, version
+        try:
+            st = os.stat(self._file(self.POINTER_FILE))
+        except OSError:
+            return
+        if (st.st_mtime_ns, st.st_ino) == self._pointer_key:
+            return
+        try:
+            self._load()
+        except Exception:
+            # Pointer swapped mid-read or generation already collected: keep serving, retry later
+            pass
+
+    def _migrate_legacy(self, legacy_path: str):
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as fh:
+                raw = json.load(fh)
+        except Exception:
+            return
+        if not isinstance(raw, dict) or not raw:
+            return
+        ids = list(raw.keys())
+        self.upsert(
+            ids=ids,
+            embeddings=[raw[i]["embedding"] for i in ids],
+            metadatas=[raw[i].get("metadata", {}) for i in ids],
+            documents=[raw[i].get("document", "") for i in ids],
+        )
+        self.publish()
+
+    def _record(self, row: int) -> Dict[str, Any]:
+        return self._gen.record(row)
+
+    @staticmethod
+    def _normalize(vecs) -> np.ndarray:
+        if hasattr(vecs, "toarray"):
+            vecs = vecs.toarray()
+        arr = np.asarray(vecs, dtype=np.float32)
+        if arr.ndim == 1:
+            arr = arr.reshape(1, -1)
+        return arr / (np.linalg.norm(arr, axis=1, keepdims=True) + 1e-9)
+
+    def _generation_numbers(self) -> List[int]:
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return []
+        return [int(n[4:]) for n in names if n.startswith("gen-") and n[4:].isdigit()]
+
+    def _begin_write(self):
+        """Stage the next generation: hard-link the append-only files and copy the live mask."""
+        if self._staging:
+            return
+        base = self._gen
+        number = max(self._generation_numbers() + [base.number]) + 1
+        path = self._file(f"gen-{number:06d}")
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        for name in self.APPEND_FILES + (self.QUANT_FILES if base.quant_kind else ()):
+            if base.rows and os.path.exists(base.file(name)):
+                _link_or_copy(base.file(name), os.path.join(path, name))
+        staged = _Generation(path, number, base.dim, base.dtype, base.rows, base.storage).open(live=np.array(base.live, dtype=np.uint8))
+        staged.open_quantizer(base.quant_kind, base.codebooks, base.quant_trained)
+        staged.postings, staged.postings_rows = base.postings, base.postings_rows
+        # Readers may still be searching the published IVF lists, so the staged generation updates its own copy
+        staged.ann = base.ann.copy() if base.ann is not None else None
+        # The writer's ID dict moves to the staged generation; the published one falls back to its lookup tables
+        staged.id_to_row, base.id_to_row = (base.ids_index() if base.rows else {}), None
+        if base.rows and not os.path.exists(staged.file(self.HASHES_FILE)):
+            # Single-directory index: hash every row's ID once
+            _write_at(staged.file(self.HASHES_FILE), _id_hashes([staged.record(r)["id"] for r in range(base.rows)]).tobytes(), 0)
+        self._gen = staged
+        self._staging = True
+
+    def _reopen(self, rows: int, live: np.ndarray):
+        # Re-map the staged generation after appending rows or changing the live mask
+        old = self._gen
+        gen = _Generation(old.path, old.number, old.dim, old.dtype, rows, old.storage).open(live=live)
+        gen.ann, gen.id_to_row = old.ann, old.id_to_row
+        gen.postings, gen.postings_rows = old.postings, old.postings_rows
+        gen.open_quantizer(old.quant_kind, old.codebooks, old.quant_trained)
+        self._gen = gen
+
+    def _write_all(self, vecs, records: List[Dict[str, Any]]):
+        # Rewrite the staged generation from already-normalized vectors (ndarray or CSR)
+        # in ``self.storage``. Unlink first: the old files may be hard-linked into published generations
+        self._begin_write()
+        old = self._gen
+        for name in self.APPEND_FILES + self.QUANT_FILES:
+            if os.path.exists(old.file(name)):
+                os.unlink(old.file(name))
+        offsets = np.zeros(len(records), dtype=np.int64)
+        with open(old.file(self.ROWS_FILE), "wb") as fh:
+            for i, rec in enumerate(records):
+                offsets[i] = fh.tell()
+                fh.write(json.dumps(rec, ensure_ascii=False).encode("utf-8") + b"\n")
+        if self.storage == "sparse":
+            mat = _to_csr(vecs)
+            mat.indptr[1:].astype(np.int64).tofile(old.file(self.ROW_ENDS_FILE))
+            mat.indices.astype(np.int32).tofile(old.file(self.INDICES_FILE))
+            mat.data.astype(np.float32).tofile(old.file(self.VALUES_FILE))
+        else:
+            np.ascontiguousarray(self._normalize(vecs) if hasattr(vecs, "toarray") else vecs, dtype=self.dtype).tofile(old.file(self.EMBEDDINGS_FILE))
+        offsets.tofile(old.file(self.OFFSETS_FILE))
+        _id_hashes([rec["id"] for rec in records]).tofile(old.file(self.HASHES_FILE))
+        dim = int(vecs.shape[1]) if len(records) else old.dim
+        gen = _Generation(old.path, old.number, dim, self.dtype, len(records), self.storage).open()
+        gen.id_to_row = {rec["id"]: i for i, rec in enumerate(records)}
+        self._gen = gen
+        self._train_ann()
+        self._train_quant()
+
+    def _fit_ann(self, gen: _Generation):
+        gen.ann = None
+        if self.vector_index != "ivf" or gen.storage == "sparse" or gen.live_rows < settings.ivf_min_rows:
+            return
+        gen.ann = IVFIndex.train(gen.emb, nlist=settings.ivf_nlist)
+        gen.ann.remove(gen.dead)
+
+    def _train_ann(self):
+        self._fit_ann(self._gen)
+
+    def _update_ann(self, rows: np.ndarray, vecs: np.ndarray, removed: np.ndarray):
+        if self.vector_index != "ivf" or self._gen.storage == "sparse":
+            return
+        gen = self._gen
+        # Retrain once the corpus has grown well past what the centroids were fit on
+        if gen.ann is None or gen.live_rows > 4 * gen.ann.trained_rows:
+            self._train_ann()
+            return
+        gen.ann.update(vecs, rows)
+        gen.ann.remove(removed)
 
-    def _persist(self):
-        os.makedirs(os.path.dirname(self.path), exist_ok=True)
-        with open(self.path, "w", encoding="utf-8") as fh:
-            json.dump(self.data, fh)
+    def _quant_stale(self) -> bool:
+        gen = self._gen
+        if self.quantization not in ("int8", "pq") or gen.storage == "sparse":
+            return False
+        if gen.quant_kind == self.quantization:
+            return gen.quant_kind == "pq" and gen.codebooks.shape[0] != ProductQuantizer.subspaces(gen.dim, settings.pq_subvectors)
+        return gen.live_rows >= (ProductQuantizer.KSUB if self.quantization == "pq" else 1)
+
+    def _train_quant(self):
+        """Encode every row of the staged generation into fresh code files."""
+        gen = self._gen
+        for name in self.QUANT_FILES:
+            if os.path.exists(gen.file(name)):
+                os.unlink(gen.file(name))
+        gen.open_quantizer(None)
+        if not self._quant_stale():
+            return
+        block = 65536
+        if self.quantization == "int8":
+            with open(gen.file(self.CODES_FILE), "wb") as codes_fh, open(gen.file(self.SCALES_FILE), "wb") as scales_fh:
+                for start in range(0, gen.rows, block):
+                    codes, scales = ScalarQuantizer.encode(gen.emb[start:start + block])
+                    codes_fh.write(codes.tobytes())
+                    scales_fh.write(scales.tobytes())
+            gen.open_quantizer("int8", trained_rows=gen.rows)
+        else:
+            pq = ProductQuantizer.train(gen.emb, settings.pq_subvectors)
+            with open(gen.file(self.CODES_FILE), "wb") as fh:
+                for start in range(0, gen.rows, block):
+                    fh.write(pq.encode(gen.emb[start:start + block]).tobytes())
+            gen.open_quantizer("pq", pq.codebooks, trained_rows=gen.live_rows)
+
+    def _append_codes(self, start: int, vecs: np.ndarray) -> bool:
+        """Encode appended rows with the current quantizer; False when it needs (re)training."""
+        gen = self._gen
+        kind = gen.quant_kind
+        # Retrain PQ codebooks once the corpus has grown well past what they were fit on
+        if kind != self.quantization or (kind == "pq" and gen.live_rows > 4 * gen.quant_trained):
+            gen.quant_kind = None
+            return not self._quant_stale()
+        if kind == "int8":
+            codes, scales = ScalarQuantizer.encode(vecs)
+            _write_at(gen.file(self.CODES_FILE), codes.tobytes(), start * gen.dim)
+            _write_at(gen.file(self.SCALES_FILE), scales.tobytes(), start * 4)
+        else:
+            codes = ProductQuantizer(gen.codebooks).encode(vecs)
+            _write_at(gen.file(self.CODES_FILE), codes.tobytes(), start * gen.codebooks.shape[0])
+        return True
 
     def upsert(self, ids, embeddings, metadatas, documents):
+        if not len(ids):
+            return
+        if not self._gen.live_rows:
+            # Start from empty files in the configured storage so stale bytes never misalign
+            # appended rows; an emptied index may also change dimension (e.g. HASHING_N_FEATURES)
+            self._begin_write()
+            self._gen.dim = int(np.shape(embeddings)[1]) if hasattr(embeddings, "shape") else len(embeddings[0])
+            self._write_all(np.zeros((0, self._gen.dim), dtype=np.float32), [])
+        sparse = self._gen.storage == "sparse"
+        vecs = _to_csr(embeddings) if sparse else self._normalize(embeddings)
+        if vecs.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vecs.shape[1]} does not match index dimension {self.dim}")
+        self._begin_write()
+
+        # Last occurrence wins for IDs repeated within one batch
+        latest: Dict[str, int] = {}
         for i, _id in enumerate(ids):
-            self.data[_id] = {
-                "embedding": embeddings[i],
-                "metadata": metadatas[i],
-                "document": documents[i],
-            }
-        self._persist()
+            latest[_id] = i
+        gen = self._gen
+        id_to_row = gen.ids_index()
+        replaced = np.array([id_to_row[_id] for _id in latest if _id in id_to_row], dtype=np.int64)
+        order = list(latest.items())
+        start = gen.rows
+
+        # Every upserted ID gets a fresh row; rows they replace are only marked dead
+        offsets = np.empty(len(order), dtype=np.int64)
+        with open(gen.file(self.ROWS_FILE), "ab") as fh:
+            for n, (_id, i) in enumerate(order):
+                offsets[n] = fh.tell()
+                rec = {"id": _id, "metadata": metadatas[i], "document": documents[i]}
+                fh.write(json.dumps(rec, ensure_ascii=False).encode("utf-8") + b"\n")
+        new_vecs = vecs[[i for _, i in order]]
+        if sparse:
+            nnz = gen.nnz
+            _write_at(gen.file(self.ROW_ENDS_FILE), (new_vecs.indptr[1:].astype(np.int64) + nnz).tobytes(), start * 8)
+            _write_at(gen.file(self.INDICES_FILE), new_vecs.indices.astype(np.int32).tobytes(), nnz * 4)
+            _write_at(gen.file(self.VALUES_FILE), new_vecs.data.astype(np.float32).tobytes(), nnz * 4)
+        else:
+            row_bytes = gen.dim * gen.dtype.itemsize
+            _write_at(gen.file(self.EMBEDDINGS_FILE), np.ascontiguousarray(new_vecs, dtype=gen.dtype).tobytes(), start * row_bytes)
+        _write_at(gen.file(self.OFFSETS_FILE), offsets.tobytes(), start * 8)
+        _write_at(gen.file(self.HASHES_FILE), _id_hashes([_id for _id, _ in order]).tobytes(), start * 8)
+
+        encoded = sparse or self._append_codes(start, new_vecs)
+
+        live = np.concatenate([gen.live, np.ones(len(order), dtype=np.uint8)])
+        live[replaced] = 0
+        for n, (_id, _) in enumerate(order):
+            id_to_row[_id] = start + n
+        self._reopen(start + len(order), live)
+        self._update_ann(np.arange(start, start + len(order)), new_vecs, replaced)
+        if not encoded:
+            self._train_quant()
 
-    def delete(self, where=None):
-        self.data = {}
-        self._persist()
+    def delete(self, ids=None, where=None):
+        if ids is None:
+            self._write_all(np.zeros((0, self.dim), dtype=np.float32), [])
+            return
+        if not any(i in self._gen.ids_index() for i in ids):
+            return
+        self._begin_write()
+        gen = self._gen
+        rows = np.array([gen.id_to_row.pop(i) for i in set(ids) if i in gen.id_to_row], dtype=np.int64)
+        live = np.array(gen.live, dtype=np.uint8)
+        live[rows] = 0
+        self._reopen(gen.rows, live)
+        if self.ann is not None:
+            self.ann.remove(rows)
+
+    def publish(self) -> int:
+        """Make staged changes visible to every process; returns the published generation."""
+        converting = bool(self._gen.rows) and self._gen.storage != self.storage
+        if not self._staging and (converting or self._quant_stale()):
+            self._begin_write()
+            if not converting:
+                self._train_quant()
+        if not self._staging:
+            return self.generation
+        gen = self._gen
+        if converting or (len(gen.dead) and len(gen.dead) > self.COMPACT_RATIO * gen.rows):
+            keep = np.flatnonzero(gen.live)
+            self._write_all(gen.vectors(keep), [gen.record(int(r)) for r in keep])
+            gen = self._gen
+        np.asarray(gen.live, dtype=np.uint8).tofile(gen.file(self.LIVE_FILE))
+        hashes = np.fromfile(gen.file(self.HASHES_FILE), dtype=np.uint64, count=gen.rows) if gen.rows else np.zeros(0, dtype=np.uint64)
+        rows = np.flatnonzero(gen.live)
+        rows = rows[np.argsort(hashes[rows], kind="stable")]
+        np.save(gen.file(self.LOOKUP_KEYS_FILE), hashes[rows])
+        np.save(gen.file(self.LOOKUP_ROWS_FILE), rows.astype(np.int64))
+        if gen.ann is not None:
+            gen.ann.save(gen.file(self.IVF_DIR))
+        if gen.quant_kind == "pq":
+            np.save(gen.file(self.CODEBOOKS_FILE), gen.codebooks)
+        if gen.storage == "sparse":
+            self._save_postings(gen)
+        quant = {"kind": gen.quant_kind, "trained_rows": gen.quant_trained} if gen.quant_kind else None
+        with open(gen.file(self.HEADER_FILE), "w", encoding="utf-8") as fh:
+            json.dump({
+                "format": 2, "generation": gen.number, "dim": gen.dim, "dtype": gen.dtype.name,
+                "rows": gen.rows, "live": gen.live_rows, "quantization": quant,
+                "storage": gen.storage, "postings_rows": gen.rows if gen.storage == "sparse" else 0,
+            }, fh)
+        # The pointer swap is the commit point: readers see the old or the new generation, never a mix
+        tmp = self._file(self.POINTER_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(os.path.basename(gen.path) + "\n")
+        previous = os.path.basename(self._published_path) if self._published_path else None
+        os.replace(tmp, self._file(self.POINTER_FILE))
+        self._staging = False
+        self._load()
+        self._gen.id_to_row = gen.id_to_row
+        self._collect_garbage(keep={os.path.basename(gen.path), previous})
+        return self.generation
+
+    def _save_postings(self, gen: _Generation):
+        # Transpose the live rows into per-feature postings: CSC of the row matrix
+        mat = gen.csr()
+        if len(gen.dead):
+            mat = mat.copy()
+            mat.data = np.where(np.repeat(gen.live != 0, np.diff(mat.indptr)), mat.data, 0).astype(np.float32)
+            mat.eliminate_zeros()
+        csc = mat.tocsc()
+        np.save(gen.file(self.POSTINGS_PTR_FILE), csc.indptr.astype(np.int64))
+        np.save(gen.file(self.POSTINGS_ROWS_FILE), csc.indices.astype(np.int32))
+        np.save(gen.file(self.POSTINGS_VALUES_FILE), csc.data.astype(np.float32))
+
+    @property
+    def _published_path(self) -> Optional[str]:
+        try:
+            with open(self._file(self.POINTER_FILE), "r", encoding="utf-8") as fh:
+                return os.path.join(self.path, fh.read().strip())
+        except OSError:
+            return None
+
+    def _collect_garbage(self, keep):
+        # Keep the published generation and the one before it; processes still mapping
+        # older files keep them alive until they switch, as unlinked files stay mapped
+        for number in self._generation_numbers():
+            name = f"gen-{number:06d}"
+            if name not in keep:
+                shutil.rmtree(self._file(name), ignore_errors=True)
+        if os.path.exists(self._file(self.HEADER_FILE)):
+            for name in (self.HEADER_FILE, *self.APPEND_FILES):
+                if os.path.exists(self._file(name)):
+                    os.unlink(self._file(name))
+            shutil.rmtree(self._file(self.IVF_DIR), ignore_errors=True)
 
     def count(self):
-        return len(self.data)
-
-    def query(self, query_embeddings, n_results=4):
-        q = np.array(query_embeddings[0], dtype=float)
-        if not self.data:
-            return {"ids": [[]], "metadatas": [[]]}
-        ids = list(self.data.keys())
-        embs = np.array([self.data[i]["embedding"] for i in ids], dtype=float)
-        # cosine similarity
-        embs_norm = embs / (np.linalg.norm(embs, axis=1, keepdims=True) + 1e-9)
-        q_norm = q / (np.linalg.norm(q) + 1e-9)
-        sims = embs_norm @ q_norm
-        top_idx = sims.argsort()[::-1][:n_results]
-        top_ids = [ids[i] for i in top_idx]
-        top_mds = [self.data[i]["metadata"] for i in top_idx]
-        return {"ids": [top_ids], "metadatas": [top_mds]}
+        self._refresh()
+        return self._gen.live_rows
+
+    def get(self, ids=None, include=("metadatas", "documents"), **kwargs):
+        self._refresh()
+        gen = self._gen
+        if ids is None:
+            recs = [gen.record(int(r)) for r in np.flatnonzero(gen.live)]
+        else:
+            recs = gen.find(list(ids))
+        out: Dict[str, List[Any]] = {"ids": [rec["id"] for rec in recs]}
+        if "metadatas" in include:
+            out["metadatas"] = [rec["metadata"] for rec in recs]
+        if "documents" in include:
+            out["documents"] = [rec["document"] for rec in recs]
+        return out
+
+    def query(self, query_embeddings, n_results=4, nprobe: Optional[int] = None, rerank: Optional[int] = None, **kwargs):
+        """Accepts lists, a float32 (N x D) ndarray or a sparse CSR matrix of queries."""
+        self._refresh()
+        gen = self._gen
+        if not gen.live_rows:
+            n = self._num_queries(query_embeddings)
+            return {key: [[] for _ in range(n)] for key in ("ids", "metadatas", "documents", "distances")}
+        k = min(int(n_results), gen.live_rows)
+        if gen.quant is not None:
+            rerank = settings.rerank_candidates if rerank is None else rerank
+            hits = self._quantized_search(gen, self._normalize(query_embeddings), k, nprobe, rerank)
+        elif gen.storage == "sparse":
+            hits = self._postings_search(gen, _to_csr(query_embeddings), k)
+        elif gen.ann is not None and gen.ann.rows == gen.rows:
+            hits = gen.ann.search(gen.emb, self._normalize(query_embeddings), k, nprobe=nprobe or settings.ivf_nprobe)
+        elif hasattr(query_embeddings, "tocsr"):
+            hits = self._top_k(gen, self._sparse_scores(gen, query_embeddings.tocsr()), k)
+        else:
+            hits = self._top_k(gen, self._normalize(query_embeddings) @ gen.emb.T, k)
+        out: Dict[str, List[List[Any]]] = {"ids": [], "metadatas": [], "documents": [], "distances": []}
+        for top, sims in hits:
+            recs = [gen.record(int(r)) for r in top]
+            out["ids"].append([rec["id"] for rec in recs])
+            out["metadatas"].append([rec["metadata"] for rec in recs])
+            out["documents"].append([rec["document"] for rec in recs])
+            out["distances"].append([float(1.0 - s) for s in sims])
+        return out
+
+    def _quantized_search(self, gen: _Generation, queries: np.ndarray, k: int, nprobe: Optional[int], rerank: int):
+        # Candidates by asymmetric distance on the codes, then (optionally) exact float scores
+        n = min(max(k, rerank), gen.live_rows)
+        if gen.ann is not None and gen.ann.rows == gen.rows:
+            hits = gen.ann.search(gen.quant, queries, n, nprobe=nprobe or settings.ivf_nprobe)
+        else:
+            hits = self._top_k(gen, gen.quant.scores(queries), n)
+        if not rerank:
+            return hits
+        out = []
+        for (cands, _), q in zip(hits, queries):
+            cands = np.sort(cands)  # sequential reads from the mapped float matrix
+            sims = np.asarray(gen.emb[cands] @ q, dtype=np.float32)
+            best = np.argsort(-sims, kind="stable")[:k]
+            out.append((cands[best], sims[best]))
+        return out
+
+    @staticmethod
+    def _num_queries(q) -> int:
+        shape = getattr(q, "shape", None)
+        if shape is not None:
+            return shape[0] if len(shape) == 2 else 1
+        return len(q)
+
+    @staticmethod
+    def _postings_search(gen: _Generation, q, k: int):
+        """Top ``k`` rows per CSR query, touching only the postings of its non-zero features."""
+        tail = gen.csr(gen.postings_rows) if gen.rows > gen.postings_rows else None
+        hits = []
+        for n in range(q.shape[0]):
+            feats = q.indices[q.indptr[n]:q.indptr[n + 1]]
+            weights = q.data[q.indptr[n]:q.indptr[n + 1]]
+            if gen.postings is not None:
+                ptr, post_rows, post_values = gen.postings
+                starts = np.asarray(ptr[feats])
+                lengths = np.asarray(ptr[feats + 1]) - starts
+                pos = _gather(starts, lengths)
+                contrib = post_values[pos] * np.repeat(weights, lengths)
+                if len(pos) * 8 > gen.postings_rows:
+                    # Common features: accumulating into one slot per row beats sorting the postings
+                    sims = np.bincount(post_rows[pos], weights=contrib, minlength=gen.postings_rows)
+                    cands = np.flatnonzero(sims)
+                    sims = sims[cands]
+                else:
+                    cands, inverse = np.unique(post_rows[pos], return_inverse=True)
+                    sims = np.bincount(inverse, weights=contrib, minlength=len(cands))
+            else:
+                cands, sims = np.zeros(0, dtype=np.int64), np.zeros(0)
+            if tail is not None:
+                tail_sims = np.asarray(tail[:, feats] @ weights).ravel()
+                hit = np.flatnonzero(tail_sims)
+                cands = np.concatenate([cands, hit + gen.postings_rows])
+                sims = np.concatenate([sims, tail_sims[hit]])
+            live = gen.live[cands] != 0
+            cands, sims = cands[live].astype(np.int64), sims[live].astype(np.float32)
+            if len(cands) > k:
+                top = np.argpartition(-sims, k - 1)[:k]
+                cands, sims = cands[top], sims[top]
+            order = np.lexsort((cands, -sims))
+            cands, sims = cands[order], sims[order]
+            if len(cands) < k:
+                pad = np.flatnonzero(gen.live)
+                pad = pad[~np.isin(pad, cands)][:k - len(cands)]
+                cands = np.concatenate([cands, pad])
+                sims = np.concatenate([sims, np.zeros(len(pad), dtype=np.float32)])
+            hits.append((cands, sims))
+        return hits
+
+    @staticmethod
+    def _sparse_scores(gen: _Generation, q) -> np.ndarray:
+        # Only the columns where some query is non-zero contribute to the dot product
+        norms = np.sqrt(np.asarray(q.multiply(q).sum(axis=1), dtype=np.float32)) + 1e-9
+        cols = np.unique(q.indices)
+        sub = q[:, cols].toarray() / norms
+        return sub @ np.asarray(gen.emb[:, cols], dtype=np.float32).T
+
+    @staticmethod
+    def _top_k(gen: _Generation, sims: np.ndarray, k: int):
+        # sims is (N x M): one row of scores per query from a single matmul
+        if len(gen.dead):
+            sims[:, gen.dead] = -np.inf
+        hits = []
+        for row in sims:
+            if k < gen.rows:
+                top = np.argpartition(-row, k - 1)[:k]
+            else:
+                top = np.arange(gen.rows)
+            top = top[np.argsort(-row[top], kind="stable")]
+            hits.append((top, row[top]))
+        return hits
+
+
+def shard_of(ids: Sequence[str], shards: int) -> np.ndarray:
+    """Shard number of each fact ID: a stable hash, so a fact stays put across runs and processes."""
+    return (_id_hashes(ids) % np.uint64(max(1, shards))).astype(np.int64)
+
+
+class ShardedCollection:
+    """Collection facade over independent shard collections (SimpleCollection or Chroma)."""
+
+    def __init__(self, shards: Sequence[Any], workers: int = 0):
+        self.shards = list(shards)
+        self.accepts_arrays = all(getattr(c, "accepts_arrays", False) for c in self.shards)
+        self.accepts_sparse = all(getattr(c, "accepts_sparse", False) for c in self.shards)
+        self.workers = workers or len(self.shards)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def _map(self, fn, items):
+        items = list(items)
+        if len(items) < 2 or self.workers < 2:
+            return [fn(item) for item in items]
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="shard")
+        return list(self._pool.map(fn, items))
+
+    def _route(self, ids: Sequence[str]) -> Dict[int, List[int]]:
+        # Shard number -> positions in ``ids``
+        out: Dict[int, List[int]] = {}
+        for pos, shard in enumerate(shard_of(ids, len(self.shards))):
+            out.setdefault(int(shard), []).append(pos)
+        return out
+
+    def count(self):
+        return sum(c.count() for c in self.shards)
+
+    def get(self, ids=None, include=("metadatas", "documents"), **kwargs):
+        if ids is None:
+            parts = [c.get(include=include) for c in self.shards]
+        else:
+            ids = list(ids)
+            parts = [self.shards[shard].get(ids=[ids[p] for p in pos], include=include) for shard, pos in self._route(ids).items()]
+        out: Dict[str, List[Any]] = {"ids": []}
+        for key in ("metadatas", "documents"):
+            if key in include:
+                out[key] = []
+        for part in parts:
+            for key in out:
+                out[key].extend(part.get(key) or [])
+        return out
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        ids = list(ids)
+        for shard, pos in self._route(ids).items():
+            if isinstance(embeddings, list):
+                embs = [embeddings[p] for p in pos]
+            else:
+                embs = embeddings[np.asarray(pos)]
+            self.shards[shard].upsert(
+                ids=[ids[p] for p in pos],
+                embeddings=embs,
+                metadatas=[metadatas[p] for p in pos],
+                documents=[documents[p] for p in pos],
+            )
+
+    def delete(self, ids=None, where=None):
+        if ids is None:
+            for c in self.shards:
+                c.delete(ids=None, where=where)
+            return
+        ids = list(ids)
+        for shard, pos in self._route(ids).items():
+            self.shards[shard].delete(ids=[ids[p] for p in pos])
+
+    def publish(self) -> int:
+        for c in self.shards:
+            publish = getattr(c, "publish", None)
+            if publish is not None:
+                publish()
+        return 0
+
+    def query(self, query_embeddings, n_results=4, shards: Optional[Sequence[int]] = None, **kwargs):
+        selected = [self.shards[i] for i in (range(len(self.shards)) if shards is None else shards)]
+        parts = self._map(lambda c: c.query(query_embeddings=query_embeddings, n_results=n_results, **kwargs), selected)
+        keys = ("ids", "metadatas", "documents", "distances")
+        out: Dict[str, List[List[Any]]] = {key: [] for key in keys}
+        rows = max((len(p.get("ids") or []) for p in parts), default=0)
+        for row in range(rows):
+            # Each shard's list is sorted by distance already: a k-way heap merge keeps the global order
+            hits = [
+                zip(*(p[key][row] for key in keys))
+                for p in parts if row < len(p.get("ids") or []) and p.get("distances")
+            ]
+            best = list(itertools.islice(heapq.merge(*hits, key=lambda hit: hit[3]), int(n_results)))
+            for n, key in enumerate(keys):
+                out[key].append([hit[n] for hit in best])
+        return out
 
 
 def _get_client():
@@ -78,24 +931,47 @@ def _get_client():
     if not _CHROMA_AVAILABLE:
         return None
     if _client is None:
+        import chromadb  # type: ignore
+        from chromadb.config import Settings as ChromaSettings  # type: ignore
         os.makedirs(settings.persist_dir, exist_ok=True)
         _client = chromadb.Client(ChromaSettings(persist_directory=settings.persist_dir))
     return _client
 
 
-def get_or_create_collection():
-    global _collection
-    if _collection is not None:
-        return _collection
+def _open_collection(name: str, path: str, legacy_path: Optional[str] = None):
     if _CHROMA_AVAILABLE:
         client = _get_client()
         try:
-            _collection = client.get_collection("medical_facts")
+            return client.get_collection(name)
         except Exception:
-            _collection = client.create_collection(name="medical_facts")
+            return client.create_collection(
+                name=name,
+                metadata={"hnsw:space": "cosine", "hnsw:search_ef": settings.hnsw_ef_search},
+            )
+    # Fallback to the memory-mapped simple index
+    return SimpleCollection(path=path, legacy_path=legacy_path)
+
+
+def get_or_create_collection():
+    global _collection
+    if _collection is not None:
+        return _collection
+    shards = settings.index_shards
+    if shards > 1:
+        # The shard count is part of each name, so a different count starts from empty shards
+        # (and the indexer re-embeds into them) instead of mixing two partitionings
+        _collection = ShardedCollection(
+            [
+                _open_collection(
+                    f"medical_facts_{i:02d}_of_{shards:02d}",
+                    os.path.join(settings.simple_index_dir, f"shard-{i:02d}-of-{shards:02d}"),
+                )
+                for i in range(shards)
+            ],
+            workers=settings.shard_search_workers,
+        )
     else:
-        # Fallback to simple index file
-        _collection = SimpleCollection(path=os.path.join("data", "simple_index.json"))
+        _collection = _open_collection("medical_facts", settings.simple_index_dir, settings.simple_index_legacy_path)
     return _collection
 
 
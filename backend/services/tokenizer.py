@@ -0,0 +1,65 @@
+import re
+import importlib.util
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+from ..settings import settings
+
+
+# tiktoken is optional; without it token counts come from the regex approximation
+_TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
+
+# Words and single punctuation marks: within ~10% of BPE counts for short English fact text
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+TokenCounter = Callable[[str], int]
+
+
+def _regex_counter() -> TokenCounter:
+    return lambda text: len(_PIECE_RE.findall(text))
+
+
+def _tiktoken_counter() -> TokenCounter:
+    import tiktoken
+
+    enc = tiktoken.get_encoding(settings.tiktoken_encoding)
+    return lambda text: len(enc.encode_ordinary(text))
+
+
+_FACTORIES: Dict[str, Callable[[], TokenCounter]] = {
+    "regex": _regex_counter,
+    "tiktoken": _tiktoken_counter,
+}
+
+
+def register_tokenizer(name: str, factory: Callable[[], TokenCounter]):
+    """Make ``CONTEXT_TOKENIZER=<name>`` count tokens with ``factory()`` (e.g. the generator model's tokenizer)."""
+    _FACTORIES[name] = factory
+    get_token_counter.cache_clear()
+    fragment_tokens.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(name: Optional[str] = None) -> TokenCounter:
+    name = name or settings.context_tokenizer
+    if name == "auto":
+        if _TIKTOKEN_AVAILABLE:
+            try:
+                return _tiktoken_counter()
+            except Exception:
+                # Encoding files unavailable (e.g. offline): fall back rather than fail requests
+                pass
+        name = "regex"
+    if name not in _FACTORIES:
+        raise ValueError(f"Unknown tokenizer {name!r}; expected one of {['auto'] + sorted(_FACTORIES)}")
+    return _FACTORIES[name]()
+
+
+def count_tokens(text: str) -> int:
+    return get_token_counter()(text)
+
+
+@lru_cache(maxsize=65536)
+def fragment_tokens(text: str) -> int:
+    """count_tokens memoized for fact fragments, which repeat across requests."""
+    return count_tokens(text)
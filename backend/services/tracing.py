@@ -0,0 +1,183 @@
+import os
+import glob
+import gzip
+import json
+import time
+import queue
+import random
+import threading
+import contextvars
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from ..settings import settings
+
+
+# Retrieval scores of the current request, by query: {query: {fact ID: score}}; None when not tracing
+_trace_scores: contextvars.ContextVar[Optional[Dict[str, Dict[str, float]]]] = contextvars.ContextVar("trace_scores", default=None)
+
+_STOP = object()
+
+
+def start_trace(enabled: bool) -> Optional[Dict[str, Dict[str, float]]]:
+    """Start collecting retrieval scores for the current request (or stop, if not enabled)."""
+    scores: Optional[Dict[str, Dict[str, float]]] = {} if enabled else None
+    _trace_scores.set(scores)
+    return scores
+
+
+def note_scores(query: str, ids: Sequence[str], scores: Sequence[float], distances: bool = False):
+    """Record the scores behind a ranking of ``query``; cosine distances are stored as similarities."""
+    traced = _trace_scores.get()
+    if traced is None:
+        return
+    traced[query] = {i: round(1.0 - float(s) if distances else float(s), 6) for i, s in zip(ids, scores)}
+
+
+class TraceSink:
+    """Appends one JSON record per request to rotating gzip JSONL files."""
+
+    def __init__(self, directory: str, enabled: bool, sample_rate: float, max_bytes: int, max_files: int, queue_size: int):
+        self.directory = directory
+        self.enabled = bool(enabled) and sample_rate > 0
+        self.sample_rate = float(sample_rate)
+        self.max_bytes = max(1, int(max_bytes))
+        self.max_files = max(1, int(max_files))
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._path: Optional[str] = None
+
+    def sampled(self) -> bool:
+        """Whether the current request should be traced."""
+        return self.enabled and (self.sample_rate >= 1.0 or random.random() < self.sample_rate)
+
+    def submit(self, record: Dict[str, Any]):
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < 1024:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            stop = any(r is _STOP for r in batch)
+            records = [r for r in batch if r is not _STOP]
+            if records:
+                try:
+                    self._write(records)
+                    self.written += len(records)
+                except Exception:
+                    # A full or missing disk must not take the writer thread down
+                    self.errors += len(records)
+            if stop:
+                return
+
+    def _write(self, records: List[Dict[str, Any]]):
+        data = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in records)
+        if self._path is None or not os.path.exists(self._path) or os.path.getsize(self._path) >= self.max_bytes:
+            self._rotate()
+        with open(self._path, "ab") as fh:
+            fh.write(gzip.compress(data.encode("utf-8"), compresslevel=6))
+
+    def _rotate(self):
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime(now)) + f".{int(now * 1000) % 1000:03d}"
+        self._path = os.path.join(self.directory, f"traces-{stamp}-{os.getpid()}.jsonl.gz")
+        # Other live workers are still appending to their files: only prune ours and those of exited processes
+        files = [p for p in trace_files(self.directory) if not _written_by_other(p)]
+        files.sort(key=lambda p: (_mtime(p), p))
+        for path in files[:max(0, len(files) - self.max_files + 1)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def close(self, timeout: float = 5.0):
+        """Write out queued records and stop the writer thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+def _written_by_other(path: str) -> bool:
+    """Whether ``path`` belongs to another process that is still running."""
+    try:
+        pid = int(os.path.basename(path).split(".")[-3].rsplit("-", 1)[1])
+    except (IndexError, ValueError):
+        return False
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def trace_files(path: str) -> List[str]:
+    """Trace files under ``path`` (a directory, file or glob), oldest name first."""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "traces-*.jsonl.gz")))
+    return sorted(glob.glob(path))
+
+
+def read_traces(path: str) -> Iterator[Dict[str, Any]]:
+    """Records from the trace files under ``path``; a file cut off mid-write yields what is complete."""
+    for name in trace_files(path):
+        opener = gzip.open if name.endswith(".gz") else open
+        try:
+            with opener(name, "rt", encoding="utf-8") as fh:
+                for line in fh:
+                    if line.strip():
+                        yield json.loads(line)
+        except (EOFError, OSError, ValueError):
+            continue
+
+
+trace_sink = TraceSink(
+    settings.trace_dir,
+    settings.trace_enabled,
+    settings.trace_sample_rate,
+    settings.trace_max_file_bytes,
+    settings.trace_max_files,
+    settings.trace_queue_size,
+)
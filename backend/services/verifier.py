@@ -1,4 +1,4 @@
-from typing import List, Tuple
+from typing import Dict, FrozenSet, List, NamedTuple, Tuple
 import re
 
 from ..models import Fact
@@ -8,25 +8,58 @@ def _normalize(text: str) -> str:
     return re.sub(r"\s+", " ", text.lower()).strip()
 
 
+_IGNORED_TERMS = frozenset({"the", "and", "with", "from", "that", "only", "this", "informational", "medical", "advice"})
+_TERM_RE = re.compile(r"[a-zA-Z][a-zA-Z\-]{2,}")
+
+
+class FactMatcher(NamedTuple):
+    """Precomputed lookup structure for one fact."""
+
+    signature: Tuple[str, str, str, str]
+    text: str
+    tokens: FrozenSet[str]
+
+
+_matchers: Dict[str, FactMatcher] = {}
+
+
+def _build_matcher(signature: Tuple[str, str, str, str]) -> FactMatcher:
+    normalized = [_normalize(field) for field in signature]
+    # normalized text never holds a newline, so one substring test covers every chunk
+    text = "\n".join(normalized)
+    return FactMatcher(signature=signature, text=text, tokens=frozenset(_TERM_RE.findall(text)))
+
+
+def get_matcher(f: Fact) -> FactMatcher:
+    # Cached per fact ID; rebuilt only if the fact's content changed
+    signature = (f.symptom, f.cause, f.treatment, f.precaution)
+    m = _matchers.get(f.id)
+    if m is None or m.signature != signature:
+        m = _build_matcher(signature)
+        _matchers[f.id] = m
+    return m
+
+
+def index_facts(facts: List[Fact]):
+    """Precompute matchers at index time so verification never normalizes fact text."""
+    for f in facts:
+        get_matcher(f)
+
+
 def verify_answer(answer: str, fact_ids: List[str], facts_subset: List[Fact]) -> Tuple[bool, str]:
     # Simple rule-based verifier: ensure only content in provided facts is referenced
-    # Collect allowed tokens from facts
-    allowed_chunks = []
-    for f in facts_subset:
-        for field in (f.symptom, f.cause, f.treatment, f.precaution):
-            allowed_chunks.extend([c.strip() for c in field.split(",")])
-            allowed_chunks.append(field)
+    matchers = [get_matcher(f) for f in facts_subset]
+    allowed_tokens = frozenset().union(*(m.tokens for m in matchers))
+    allowed_text = "\n".join(m.text for m in matchers)
 
     normalized_answer = _normalize(answer)
     # If the answer contains any word sequences not in allowed facts, flag it
     # Simple heuristic: check mentions of key medical nouns by presence in allowed chunks
     suspicious = []
-    key_terms = re.findall(r"[a-zA-Z][a-zA-Z\-]{2,}", normalized_answer)
-    for t in set(key_terms):
-        if len(t) < 4:
+    for t in set(_TERM_RE.findall(normalized_answer)):
+        if len(t) < 4 or t in _IGNORED_TERMS or t in allowed_tokens:
             continue
-        present = any(t in _normalize(chunk) for chunk in allowed_chunks)
-        if not present and t not in {"the", "and", "with", "from", "that", "only", "this", "informational", "medical", "advice"}:
+        if t not in allowed_text:
             suspicious.append(t)
 
     if suspicious:
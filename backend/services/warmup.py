@@ -0,0 +1,52 @@
+import time
+import threading
+from typing import Any, Dict, Optional
+
+from .embeddings import embed_query_array, model_loaded, warm_up
+from .retrieval import _collection_input
+
+
+class WarmUp:
+    """Tracks whether the vector path (embedding model plus index pages) is hot."""
+
+    def __init__(self):
+        self.state = "cold"  # cold -> warming -> ready | failed
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        # Without a (successful) warm-up the first vector request loads the model and flips readiness
+        return self.state == "ready" or (self.state in ("cold", "failed") and model_loaded())
+
+    @property
+    def warming(self) -> bool:
+        # A failed warm-up does not divert vector requests: each one retries the model load and fails visibly
+        return self.state == "warming"
+
+    def run(self, collection=None):
+        self.state = "warming"
+        started = time.perf_counter()
+        try:
+            warm_up()
+            if collection is not None and collection.count():
+                collection.query(query_embeddings=_collection_input(collection, embed_query_array("warm-up")), n_results=1)
+        except Exception as exc:
+            self.state, self.error = "failed", f"{type(exc).__name__}: {exc}"
+            return
+        self.seconds = time.perf_counter() - started
+        self.state = "ready"
+
+    def start(self, collection=None) -> threading.Thread:
+        if self._thread is None or not self._thread.is_alive():
+            self.state = "warming"
+            self._thread = threading.Thread(target=self.run, args=(collection,), name="embedding-warmup", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "model_loaded": model_loaded(), "warmup_seconds": self.seconds, "error": self.error}
+
+
+warmup = WarmUp()
@@ -5,14 +5,124 @@ from dotenv import load_dotenv
 load_dotenv(dotenv_path=os.path.join(os.getcwd(), ".env", ".env"), override=True)
 
 
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+# Root for the facts file and every on-disk index artifact
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
+
 @dataclass
 class Settings:
     scaledown_api_url: str = os.getenv("SCALEDOWN_API_URL", "")
     scaledown_api_key: str = os.getenv("SCALEDOWN_API_KEY", "")
     scaledown_compress_url: str = os.getenv("SCALEDOWN_COMPRESS_URL", "https://api.scaledown.xyz/compress/raw/")
+    # Per-call deadline, concurrency cap and connection pool for ScaleDown compression
+    scaledown_timeout_seconds: float = float(os.getenv("SCALEDOWN_TIMEOUT_SECONDS", "5"))
+    scaledown_max_concurrency: int = int(os.getenv("SCALEDOWN_MAX_CONCURRENCY", "32"))
+    scaledown_pool_size: int = int(os.getenv("SCALEDOWN_POOL_SIZE", "64"))
+    # Skip compression for breaker_reset_seconds after this many consecutive failures
+    breaker_failure_threshold: int = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    breaker_reset_seconds: float = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+    embedding_workers: int = int(os.getenv("EMBEDDING_WORKERS", "4"))
+    # "eager": sync the index and load the model before serving. "snapshot": serve the
+    # index built by compression/preprocess.py as-is and warm the model in the background
+    startup_mode: str = os.getenv("STARTUP_MODE", "eager")
+    warmup_enabled: bool = _env_bool("WARMUP_ENABLED", "true")
     embedding_model: str = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
-    persist_dir: str = os.path.join("data", "chroma")
-    facts_path: str = os.path.join("data", "medical_facts.json")
+    # "auto" (sentence-transformers if installed), "sentence-transformers" or "hashing"
+    embedding_backend: str = os.getenv("EMBEDDING_BACKEND", "auto")
+    # Hashed feature count for the hashing backend; the sparse index makes query cost independent of it
+    hashing_n_features: int = int(os.getenv("HASHING_N_FEATURES", "512"))
+    persist_dir: str = os.path.join(DATA_DIR, "chroma")
+    facts_path: str = os.getenv("FACTS_PATH", os.path.join(DATA_DIR, "medical_facts.json"))
+    # Old fact ID -> canonical ID for facts merged by compression/dedup.py
+    fact_aliases_path: str = os.getenv("FACT_ALIASES_PATH", os.path.join(DATA_DIR, "fact_aliases.json"))
+    # Answers computed offline for common questions (compression/precompute.py)
+    precomputed_answers_path: str = os.getenv("PRECOMPUTED_ANSWERS_PATH", os.path.join(DATA_DIR, "precomputed_answers.npz"))
+    # Cosine to the nearest precomputed question that reuses its answer; 0 allows exact matches only
+    precomputed_match_threshold: float = float(os.getenv("PRECOMPUTED_MATCH_THRESHOLD", "0.95"))
+    # Minimum seconds between checks of the facts file for changes
+    facts_reload_interval: float = float(os.getenv("FACTS_RELOAD_INTERVAL", "1"))
+    # Red-flag phrases by category (JSON object); reloaded when the file changes
+    red_flags_path: str = os.getenv("RED_FLAGS_PATH", os.path.join(DATA_DIR, "red_flags.json"))
+    red_flags_reload_interval: float = float(os.getenv("RED_FLAGS_RELOAD_INTERVAL", "1"))
+    simple_index_dir: str = os.path.join(DATA_DIR, "simple_index")
+    simple_index_legacy_path: str = os.path.join(DATA_DIR, "simple_index.json")
+    # Storage dtype for the memory-mapped embedding matrix: "float32" or "float16"
+    simple_index_dtype: str = os.getenv("SIMPLE_INDEX_DTYPE", "float32")
+    # "dense" matrix, "sparse" (CSR rows plus a feature -> postings index) or "auto" (sparse for the hashing backend)
+    simple_index_storage: str = os.getenv("SIMPLE_INDEX_STORAGE", "auto")
+    # Facts are split across this many collections by ID hash; queries fan out to all (or a requested subset)
+    index_shards: int = max(1, int(os.getenv("INDEX_SHARDS", "1")))
+    # Threads searching shards in parallel (0 = one per shard)
+    shard_search_workers: int = int(os.getenv("SHARD_SEARCH_WORKERS", "0"))
+    # Minimum seconds between checks for a newly published index generation
+    index_reload_interval: float = float(os.getenv("INDEX_RELOAD_INTERVAL", "1"))
+    # Worker processes forked by backend/serve.py; they share the mapped index and preloaded model
+    workers: int = int(os.getenv("WORKERS", "2"))
+    # Search engine for the simple index: "exact" (brute force) or "ivf" (approximate)
+    vector_index: str = os.getenv("VECTOR_INDEX", "exact")
+    ivf_nlist: int = int(os.getenv("IVF_NLIST", "0"))  # 0 = sqrt(rows)
+    ivf_nprobe: int = int(os.getenv("IVF_NPROBE", "8"))
+    ivf_min_rows: int = int(os.getenv("IVF_MIN_ROWS", "10000"))
+    # Compressed copy of the simple index scanned at query time: "none", "int8" (per-vector
+    # scale) or "pq" (product quantization, PQ_SUBVECTORS bytes per vector)
+    vector_quantization: str = os.getenv("VECTOR_QUANTIZATION", "none")
+    pq_subvectors: int = int(os.getenv("PQ_SUBVECTORS", "48"))
+    # Quantized candidates re-scored on the float vectors; 0 returns quantized scores as-is
+    rerank_candidates: int = int(os.getenv("RERANK_CANDIDATES", "100"))
+    # Tokens of fact fragments packed into the prompt, best-ranked facts first
+    context_token_budget: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "256"))
+    # Token counter for the budget and tokens_used: "auto" (tiktoken if installed), "tiktoken" or "regex"
+    context_tokenizer: str = os.getenv("CONTEXT_TOKENIZER", "auto")
+    tiktoken_encoding: str = os.getenv("TIKTOKEN_ENCODING", "cl100k_base")
+    # BM25 index over fact fields, rebuilt alongside the vector index
+    lexical_index_dir: str = os.path.join(DATA_DIR, "lexical_index")
+    bm25_k1: float = float(os.getenv("BM25_K1", "1.2"))
+    bm25_b: float = float(os.getenv("BM25_B", "0.75"))
+    # Default retrieval for /ask: "vector", "hybrid" (BM25 + vector, reciprocal-rank fusion) or "lexical"
+    retrieval_mode: str = os.getenv("RETRIEVAL_MODE", "vector")
+    # Candidates taken from each retriever before fusion, and the RRF rank constant
+    hybrid_candidates: int = int(os.getenv("HYBRID_CANDIDATES", "20"))
+    rrf_k: int = int(os.getenv("RRF_K", "60"))
+    # Bumped whenever the index is rewritten; part of every cache key
+    index_version_path: str = os.path.join(DATA_DIR, "index_version")
+    # Per-fact content hashes and source fingerprint of the last indexing run
+    index_manifest_path: str = os.path.join(DATA_DIR, "index_manifest.json")
+    cache_enabled: bool = _env_bool("CACHE_ENABLED", "true")
+    cache_max_entries: int = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    cache_ttl_seconds: float = float(os.getenv("CACHE_TTL_SECONDS", "3600"))
+    embedding_cache_max_entries: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+    # Cosine threshold for the semantic answer cache; 0 disables it
+    semantic_cache_threshold: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0"))
+    semantic_cache_max_entries: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2048"))
+    # Bulk ingestion: facts per embedding batch and embedding processes (0 = one per CPU)
+    ingest_batch_size: int = int(os.getenv("INGEST_BATCH_SIZE", "512"))
+    ingest_workers: int = int(os.getenv("INGEST_WORKERS", "0"))
+    # Stage histograms and counters behind /metrics; per-request timings work either way
+    metrics_enabled: bool = _env_bool("METRICS_ENABLED", "true")
+    max_batch_size: int = int(os.getenv("MAX_BATCH_SIZE", "64"))
+    # Admission control for /ask: concurrent pipeline executions (0 = unbounded), requests
+    # allowed to wait for one, and seconds they may wait before getting a fallback answer
+    ask_max_inflight: int = int(os.getenv("ASK_MAX_INFLIGHT", "32"))
+    ask_max_queue: int = int(os.getenv("ASK_MAX_QUEUE", "256"))
+    ask_queue_timeout: float = float(os.getenv("ASK_QUEUE_TIMEOUT", "2"))
+    # Concurrent identical /ask requests share one computation
+    ask_coalesce: bool = _env_bool("ASK_COALESCE", "true")
+    # Per-request trace records (query, fact IDs, scores, verdict, stage timings) for benchmarks/replay.py
+    trace_enabled: bool = _env_bool("TRACE_ENABLED", "false")
+    trace_dir: str = os.getenv("TRACE_DIR", os.path.join(DATA_DIR, "traces"))
+    # Share of requests traced
+    trace_sample_rate: float = float(os.getenv("TRACE_SAMPLE_RATE", "1"))
+    # Compressed size at which a trace file is rotated, and how many files are kept
+    trace_max_file_bytes: int = int(os.getenv("TRACE_MAX_FILE_BYTES", str(64 * 1024 * 1024)))
+    trace_max_files: int = int(os.getenv("TRACE_MAX_FILES", "20"))
+    # Records waiting for the writer thread; more are dropped (and counted)
+    trace_queue_size: int = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))
+    # HNSW search breadth for the Chroma backend (applied when the collection is created)
+    hnsw_ef_search: int = int(os.getenv("HNSW_EF_SEARCH", "64"))
 
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""Recall@k and latency of the IVF index against exact brute-force search.
+
+Usage:
+    python -m benchmarks.ann_recall --rows 200000 --dim 384 --nprobe 1,4,8,16,32
+    python -m benchmarks.ann_recall --index-dir data/simple_index
+"""
+import argparse
+import time
+
+import numpy as np
+
+from backend.services.ann import IVFIndex
+from backend.services.store import SimpleCollection
+from .common import percentiles, random_unit_vectors, save_results
+
+
+def exact_topk(emb: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    sims = queries @ emb.T
+    top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    return top
+
+
+def recall_at_k(approx: list, exact: np.ndarray) -> float:
+    hits = sum(len(set(a.tolist()) & set(e.tolist())) for a, e in zip(approx, exact))
+    return hits / float(exact.size)
+
+
+def run(emb: np.ndarray, queries: np.ndarray, k: int, nlist: int, nprobes: list) -> dict:
+    t0 = time.perf_counter()
+    index = IVFIndex.train(emb, nlist=nlist)
+    train_s = time.perf_counter() - t0
+
+    exact_ms = []
+    for q in queries:
+        t = time.perf_counter()
+        exact_topk(emb, q[None, :], k)
+        exact_ms.append((time.perf_counter() - t) * 1000)
+    truth = exact_topk(emb, queries, k)
+
+    sweep = []
+    for nprobe in nprobes:
+        found, lat = [], []
+        for q in queries:
+            t = time.perf_counter()
+            rows, _ = index.search(emb, q[None, :], k, nprobe=nprobe)[0]
+            lat.append((time.perf_counter() - t) * 1000)
+            found.append(rows)
+        sweep.append({"nprobe": nprobe, "recall": recall_at_k(found, truth), "latency_ms": percentiles(lat)})
+        print(f"nprobe={nprobe:<4} recall@{k}={sweep[-1]['recall']:.4f} p50={sweep[-1]['latency_ms']['p50']:.3f}ms")
+    print(f"exact p50={percentiles(exact_ms)['p50']:.3f}ms  (nlist={index.nlist}, train {train_s:.1f}s)")
+    return {
+        "rows": int(emb.shape[0]),
+        "dim": int(emb.shape[1]),
+        "k": k,
+        "nlist": index.nlist,
+        "train_seconds": train_s,
+        "exact_latency_ms": percentiles(exact_ms),
+        "ivf": sweep,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--nlist", type=int, default=0, help="0 = sqrt(rows)")
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32")
+    parser.add_argument("--index-dir", default="", help="evaluate on an existing simple index instead of synthetic data")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    if args.index_dir:
+        col = SimpleCollection(args.index_dir, vector_index="exact", storage="dense")
+        if col._gen.storage == "sparse":
+            raise SystemExit(f"{args.index_dir} uses sparse storage; IVF only indexes dense rows (rebuild with SIMPLE_INDEX_STORAGE=dense)")
+        emb = col._emb
+        if emb is None:
+            raise SystemExit(f"No index found at {args.index_dir}")
+    else:
+        emb = random_unit_vectors(args.rows, args.dim)
+    # Perturbed copies of stored rows stand in for real queries
+    picks = np.asarray(emb[rng.choice(emb.shape[0], size=min(args.queries, emb.shape[0]), replace=False)], dtype=np.float32)
+    queries = picks + 0.1 * rng.standard_normal(picks.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True) + 1e-9
+
+    nprobes = [int(x) for x in args.nprobe.split(",") if x]
+    results = run(emb, queries, args.k, args.nlist, nprobes)
+    print(f"Saved {save_results('ann_recall', results)}")
+
+
+if __name__ == "__main__":
+    main()
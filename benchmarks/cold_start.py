@@ -0,0 +1,99 @@
+"""Cold-start benchmark: import time, time to first answer and time to ready.
+
+Usage:
+    python -m benchmarks.cold_start --data-dir /tmp/cold --facts /tmp/facts_100k.jsonl --runs 3
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import subprocess
+from typing import Dict, List
+
+from .common import percentiles, save_results
+
+
+def _env(args, **extra) -> Dict[str, str]:
+    env = dict(os.environ, DATA_DIR=args.data_dir, **extra)
+    if args.facts:
+        env["FACTS_PATH"] = args.facts
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_seconds(args) -> float:
+    code = "import time; t = time.perf_counter(); import backend.app; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], env=_env(args), check=True, capture_output=True, text=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def launch(args, mode: str) -> Dict[str, float]:
+    import httpx
+
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app:app", "--port", str(port), "--log-level", "warning"],
+        env=_env(args, STARTUP_MODE=mode),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    result: Dict[str, float] = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            deadline = started + args.timeout
+            while time.perf_counter() < deadline and ("first_answer_s" not in result or "ready_s" not in result):
+                try:
+                    if "first_answer_s" not in result and client.post("/ask", json={"query": args.query}).status_code == 200:
+                        result["first_answer_s"] = time.perf_counter() - started
+                    if "ready_s" not in result and client.get("/ready").status_code == 200:
+                        result["ready_s"] = time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", required=True, help="DATA_DIR holding (or receiving) the index snapshot")
+    parser.add_argument("--facts", default="", help="facts file (default: DATA_DIR/medical_facts.json)")
+    parser.add_argument("--modes", default="eager,snapshot")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--query", default="What helps with a sore throat?")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--skip-build", action="store_true", help="reuse the snapshot already in --data-dir")
+    args = parser.parse_args()
+
+    if not args.skip_build:
+        cmd = [sys.executable, "-m", "compression.preprocess"] + (["--input", args.facts] if args.facts else [])
+        subprocess.run(cmd, env=_env(args), check=True)
+
+    imports = [import_seconds(args) for _ in range(args.runs)]
+    results = {"import_ms": percentiles([s * 1000 for s in imports]), "modes": {}}
+    print(f"import backend.app: p50={results['import_ms']['p50']:.0f}ms")
+    for mode in args.modes.split(","):
+        runs: List[Dict[str, float]] = [launch(args, mode) for _ in range(args.runs)]
+        summary = {
+            key: percentiles([r[key] * 1000 for r in runs if key in r])
+            for key in ("first_answer_s", "ready_s")
+        }
+        results["modes"][mode] = {"runs": runs, "first_answer_ms": summary["first_answer_s"], "ready_ms": summary["ready_s"]}
+        print(
+            f"{mode:<9} first answer p50={summary['first_answer_s']['p50']:.0f}ms, "
+            f"ready p50={summary['ready_s']['p50']:.0f}ms ({sum(1 for r in runs if 'ready_s' in r)}/{len(runs)} runs ready)"
+        )
+    print(f"Saved {save_results('cold_start', results)}")
+
+
+if __name__ == "__main__":
+    main()
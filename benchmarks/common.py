@@ -0,0 +1,40 @@
+import os
+import json
+import time
+import platform
+from typing import Dict, List
+
+import numpy as np
+
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    if not samples_ms:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0}
+    arr = np.asarray(samples_ms, dtype=float)
+    return {
+        "p50": float(np.percentile(arr, 50)),
+        "p95": float(np.percentile(arr, 95)),
+        "p99": float(np.percentile(arr, 99)),
+        "mean": float(arr.mean()),
+    }
+
+
+def random_unit_vectors(n: int, dim: int, clusters: int = 64, noise: float = 0.35, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors: closer to real embedding distributions than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vecs = centers[rng.integers(0, clusters, size=n)] + noise * rng.standard_normal((n, dim)).astype(np.float32)
+    return vecs / (np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-9)
+
+
+def save_results(name: str, results: Dict) -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(RESULTS_DIR, f"{name}-{stamp}.json")
+    payload = {"benchmark": name, "timestamp": stamp, "python": platform.python_version(), "results": results}
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, indent=2)
+    return path
@@ -0,0 +1,56 @@
+"""Compare two saved benchmark results and flag latency regressions.
+
+Usage:
+    python -m benchmarks.compare benchmarks/results/stages-A.json benchmarks/results/stages-B.json
+"""
+import sys
+import json
+import argparse
+from typing import Dict, Iterator, Tuple
+
+
+LATENCY_KEYS = ("p50", "p95", "p99", "mean", "seconds")
+
+
+def _leaves(obj, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            yield from _leaves(value, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        yield prefix, float(obj)
+
+
+def compare(base: Dict, head: Dict, threshold: float) -> int:
+    base_leaves = dict(_leaves(base.get("results", base)))
+    regressions = 0
+    for path, new in _leaves(head.get("results", head)):
+        old = base_leaves.get(path)
+        if old is None or old == 0:
+            continue
+        change = (new - old) / abs(old)
+        is_latency = path.rsplit(".", 1)[-1].endswith(LATENCY_KEYS)
+        flag = ""
+        if is_latency and change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{path:<70} {old:>12.4f} -> {new:>12.4f} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative latency increase that counts as a regression")
+    args = parser.parse_args()
+    with open(args.base, "r", encoding="utf-8") as fh:
+        base = json.load(fh)
+    with open(args.head, "r", encoding="utf-8") as fh:
+        head = json.load(fh)
+    regressions = compare(base, head, args.threshold)
+    print(f"{regressions} latency regression(s) above {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Allocations and latency: list-based vs array-native embedding paths.
+
+Usage:
+    python -m benchmarks.embedding_alloc --rows 20000 --repeat 200
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+
+from backend.services.embeddings import embed_array, embed_query_array, embed_texts
+from backend.services.store import SimpleCollection
+from .common import percentiles, save_results
+
+
+WORDS = (
+    "cough fever sore throat headache nausea rash fatigue dizziness chest pain back joint "
+    "hydration rest fluids saline gargle ice compress stretching sleep consult seek care"
+).split()
+
+
+def _docs(n: int):
+    return [" ".join(WORDS[(i * 7 + j * 3) % len(WORDS)] for j in range(12)) for i in range(n)]
+
+
+def measure(fn, repeat: int) -> dict:
+    fn()  # warm-up
+    lat = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        lat.append((time.perf_counter() - t) * 1000)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    fn()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    diff = after.compare_to(before, "lineno")
+    blocks = sum(max(d.count_diff, 0) for d in diff)
+    return {"latency_ms": percentiles(lat), "peak_bytes": peak, "new_blocks": blocks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=256, help="documents per indexing batch")
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    docs = _docs(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        col = SimpleCollection(tmp, vector_index="exact", storage="dense")
+        col.upsert([f"D{i}" for i in range(len(docs))], embed_array(docs, dense=True), [{}] * len(docs), docs)
+        query = "sore throat and mild fever"
+        batch = docs[: args.batch]
+        results = {
+            "query_list": measure(lambda: col.query([embed_texts([query])[0]], n_results=4), args.repeat),
+            "query_array": measure(lambda: col.query(embed_query_array(query), n_results=4), args.repeat),
+            "embed_batch_list": measure(lambda: embed_texts(batch), max(1, args.repeat // 10)),
+            "embed_batch_array": measure(lambda: embed_array(batch, dense=True), max(1, args.repeat // 10)),
+        }
+    for name, r in results.items():
+        print(f"{name:<18} p50={r['latency_ms']['p50']:.3f}ms peak={r['peak_bytes'] / 1024:.0f}KiB new_blocks={r['new_blocks']}")
+    print(f"Saved {save_results('embedding_alloc', {'rows': args.rows, 'batch': args.batch, **results})}")
+
+
+if __name__ == "__main__":
+    main()
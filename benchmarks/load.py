@@ -0,0 +1,131 @@
+"""End-to-end load driver for backend.app:app.
+
+Usage:
+    python -m benchmarks.load --data-dir /tmp/bench-data --facts /tmp/facts_100k.jsonl --requests 2000 --concurrency 16
+    python -m benchmarks.load --url http://localhost:8000 --pid 12345 --requests 5000
+"""
+import os
+import time
+import asyncio
+import argparse
+from typing import Dict, List, Optional
+
+from .common import percentiles, save_results
+from .synth import generate_queries
+
+
+def rss_bytes(pid: Optional[int] = None) -> int:
+    try:
+        with open(f"/proc/{pid or 'self'}/status", "r", encoding="utf-8") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return 0
+
+
+async def drive(client, queries: List[str], total: int, concurrency: int, batch: int, top_k: int) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            if batch > 1:
+                body = {"requests": [{"query": queries[(i * batch + j) % len(queries)], "top_k": top_k} for j in range(batch)]}
+                path = "/ask_batch"
+            else:
+                body = {"query": queries[i % len(queries)], "top_k": top_k}
+                path = "/ask"
+            t = time.perf_counter()
+            try:
+                r = await client.post(path, json=body)
+                if r.status_code != 200:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - t) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total,
+        "questions": total * max(batch, 1),
+        "errors": errors,
+        "elapsed_seconds": elapsed,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "questions_per_second": total * max(batch, 1) / elapsed if elapsed else 0.0,
+        "latency_ms": percentiles(latencies),
+    }
+
+
+async def run(args) -> Dict:
+    import httpx
+
+    queries = generate_queries(max(args.requests, 1000))
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as fh:
+            queries = [q.strip() for q in fh if q.strip()]
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            await drive(client, queries, min(args.warmup, args.requests), args.concurrency, args.batch, args.top_k)
+            result = await drive(client, queries, args.requests, args.concurrency, args.batch, args.top_k)
+        result["rss_bytes"] = rss_bytes(args.pid) if args.pid else None
+        return result
+
+    from backend.app import app
+
+    rss_before = rss_bytes()
+    t = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        startup_s = time.perf_counter() - t
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            await drive(client, queries, min(args.warmup, args.requests), args.concurrency, args.batch, args.top_k)
+            result = await drive(client, queries, args.requests, args.concurrency, args.batch, args.top_k)
+    result.update(startup_seconds=startup_s, rss_bytes=rss_bytes(), rss_before_app_bytes=rss_before)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="", help="drive a running server instead of the in-process app")
+    parser.add_argument("--pid", type=int, default=0, help="server PID for RSS sampling with --url")
+    parser.add_argument("--data-dir", default="", help="DATA_DIR for the in-process app")
+    parser.add_argument("--facts", default="", help="FACTS_PATH for the in-process app")
+    parser.add_argument("--queries", default="", help="file with one question per line (default: synthetic)")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=1, help=">1 uses /ask_batch with this many questions")
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--label", default="", help="tag stored with the results")
+    args = parser.parse_args()
+
+    # Must be set before backend.settings is imported
+    if args.data_dir:
+        os.environ["DATA_DIR"] = args.data_dir
+    if args.facts:
+        os.environ["FACTS_PATH"] = args.facts
+
+    result = asyncio.run(run(args))
+    result.update(label=args.label, concurrency=args.concurrency, batch=args.batch, target=args.url or "in-process")
+    lat = result["latency_ms"]
+    print(
+        f"{result['requests']} requests, {result['errors']} errors, {result['throughput_rps']:.1f} req/s, "
+        f"p50={lat['p50']:.2f}ms p95={lat['p95']:.2f}ms p99={lat['p99']:.2f}ms, "
+        f"rss={(result['rss_bytes'] or 0) / 2**20:.0f}MiB"
+    )
+    print(f"Saved {save_results('load', result)}")
+
+
+if __name__ == "__main__":
+    main()
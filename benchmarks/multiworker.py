@@ -0,0 +1,121 @@
+"""Per-worker memory as workers are added: backend.serve (pre-fork) vs uvicorn --workers.
+
+Usage:
+    python -m benchmarks.multiworker --data-dir /tmp/mw --facts /tmp/facts_100k.jsonl --workers 1,2,4
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+from typing import Dict, List
+
+from .common import save_results
+from .cold_start import _env, _free_port
+
+
+def _children(pid: int) -> List[int]:
+    out: List[int] = []
+    for tid in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{tid}/children", "r") as fh:
+            out.extend(int(c) for c in fh.read().split())
+    return out
+
+
+def _workers(pid: int) -> List[int]:
+    # uvicorn's multiprocessing start also forks a resource tracker; with one
+    # worker it serves from the main process
+    out = []
+    for child in _children(pid):
+        with open(f"/proc/{child}/cmdline", "rb") as fh:
+            if b"resource_tracker" not in fh.read():
+                out.append(child)
+    return out or [pid]
+
+
+def _memory_kib(pid: int) -> Dict[str, int]:
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as fh:
+        for line in fh:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:"):
+                fields[parts[0][:-1].lower()] = int(parts[1])
+    return fields
+
+
+def _command(launcher: str, port: int, workers: int) -> List[str]:
+    if launcher == "serve":
+        return [sys.executable, "-m", "backend.serve", "--port", str(port), "--workers", str(workers),
+                "--skip-index", "--log-level", "warning"]
+    return [sys.executable, "-m", "uvicorn", "backend.app:app", "--port", str(port), "--workers", str(workers),
+            "--log-level", "warning"]
+
+
+def measure(args, launcher: str, workers: int) -> Dict[str, float]:
+    import httpx
+
+    port = _free_port()
+    proc = subprocess.Popen(
+        _command(launcher, port, workers),
+        env=_env(args, STARTUP_MODE="snapshot"),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=10) as client:
+            deadline = time.perf_counter() + args.timeout
+            while time.perf_counter() < deadline:
+                try:
+                    if client.get("/ready").status_code == 200 and len(_workers(proc.pid)) >= workers:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.05)
+            else:
+                raise SystemExit(f"{launcher} with {workers} workers did not become ready")
+            for i in range(args.requests):
+                # New connection per request so the kernel spreads them across workers
+                httpx.post(f"http://127.0.0.1:{port}/ask", json={"query": f"{args.query} {i}"}, timeout=10)
+        mem = [_memory_kib(p) for p in _workers(proc.pid)]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return {
+        "workers": workers,
+        "rss_mib_per_worker": sum(m["rss"] for m in mem) / len(mem) / 1024,
+        "pss_mib_per_worker": sum(m["pss"] for m in mem) / len(mem) / 1024,
+        "pss_mib_total": sum(m["pss"] for m in mem) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", required=True, help="DATA_DIR holding (or receiving) the index snapshot")
+    parser.add_argument("--facts", default="", help="facts file (default: DATA_DIR/medical_facts.json)")
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--launchers", default="serve,uvicorn")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--query", default="What helps with a sore throat?")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--skip-build", action="store_true", help="reuse the snapshot already in --data-dir")
+    args = parser.parse_args()
+
+    if not args.skip_build:
+        cmd = [sys.executable, "-m", "compression.preprocess"] + (["--input", args.facts] if args.facts else [])
+        subprocess.run(cmd, env=_env(args), check=True)
+
+    results: Dict[str, List[Dict[str, float]]] = {}
+    for launcher in args.launchers.split(","):
+        results[launcher] = []
+        for n in (int(w) for w in args.workers.split(",")):
+            row = measure(args, launcher, n)
+            results[launcher].append(row)
+            print(
+                f"{launcher:<8} workers={n}: RSS/worker={row['rss_mib_per_worker']:.0f}MiB "
+                f"PSS/worker={row['pss_mib_per_worker']:.0f}MiB PSS total={row['pss_mib_total']:.0f}MiB"
+            )
+    print(f"Saved {save_results('multiworker', results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Memory, latency and recall of quantized simple-index search against exact float search.
+
+Usage:
+    python -m benchmarks.quantization --rows 200000 --dim 384 --pq-m 16,48 --rerank 0,100
+    python -m benchmarks.quantization --facts /tmp/facts_100k.jsonl
+"""
+import os
+import time
+import argparse
+import tempfile
+from typing import Dict, List
+
+import numpy as np
+
+from backend.settings import settings
+from backend.services.store import SimpleCollection
+from .common import percentiles, random_unit_vectors, save_results
+
+
+def load_vectors(args) -> np.ndarray:
+    if not args.facts:
+        return random_unit_vectors(args.rows, args.dim)
+    from backend.services.embeddings import embed_array
+    from backend.services.indexer import fact_document
+    from compression.preprocess import iter_facts
+
+    docs = [fact_document(f) for f in iter_facts(args.facts)]
+    return np.vstack([embed_array(docs[i:i + 4096], dense=True) for i in range(0, len(docs), 4096)])
+
+
+def build(path: str, vecs: np.ndarray) -> SimpleCollection:
+    col = SimpleCollection(path, vector_index="exact", quantization="none", storage="dense")
+    for start in range(0, len(vecs), 65536):
+        n = len(vecs[start:start + 65536])
+        col.upsert([f"F{i}" for i in range(start, start + n)], vecs[start:start + n], [{}] * n, [""] * n)
+    col.publish()
+    return col
+
+
+def run_mode(path: str, kind: str, queries: np.ndarray, truth: List[set], k: int, rerank: int) -> Dict[str, float]:
+    started = time.perf_counter()
+    SimpleCollection(path, vector_index="exact", quantization=kind, storage="dense").publish()
+    build_s = time.perf_counter() - started
+    reader = SimpleCollection(path, vector_index="exact", quantization=kind, storage="dense")
+    latencies, hits = [], 0
+    for q, expected in zip(queries, truth):
+        t = time.perf_counter()
+        res = reader.query(q[None, :], n_results=k, rerank=rerank)
+        latencies.append((time.perf_counter() - t) * 1000)
+        hits += len(expected & set(res["ids"][0]))
+    gen = reader._gen
+    scanned = gen.dim * gen.dtype.itemsize if gen.quant is None else (
+        gen.dim + 4 if gen.quant_kind == "int8" else gen.codebooks.shape[0]
+    )
+    return {
+        "build_s": build_s,
+        "recall": hits / float(k * len(queries)),
+        "latency_ms": percentiles(latencies),
+        "scanned_mib_per_million": scanned * 1e6 / 2**20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--facts", default="", help="embed this facts file instead of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pq-m", default="16,48", help="PQ sub-vector counts to try")
+    parser.add_argument("--rerank", default="0,100", help="re-rank candidate counts to try (0 = none)")
+    args = parser.parse_args()
+
+    vecs = load_vectors(args)
+    rng = np.random.default_rng(1)
+    # Perturbed copies of stored rows stand in for real queries
+    picks = vecs[rng.choice(len(vecs), size=min(args.queries, len(vecs)), replace=False)]
+    queries = picks + 0.1 * rng.standard_normal(picks.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True) + 1e-9
+
+    results: Dict[str, Dict] = {"rows": len(vecs), "dim": int(vecs.shape[1]), "k": args.k, "modes": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "simple_index")
+        exact = build(path, vecs)
+        truth = [set(ids) for ids in exact.query(queries, n_results=args.k)["ids"]]
+        runs = [("exact", "none", 0, 0)]
+        runs += [(f"int8 rerank={r}", "int8", 0, r) for r in (int(x) for x in args.rerank.split(","))]
+        runs += [
+            (f"pq m={m} rerank={r}", "pq", m, r)
+            for m in (int(x) for x in args.pq_m.split(","))
+            for r in (int(x) for x in args.rerank.split(","))
+        ]
+        for label, kind, m, rerank in runs:
+            if m:
+                settings.pq_subvectors = m
+            row = run_mode(path, kind, queries, truth, args.k, rerank)
+            results["modes"][label] = row
+            print(
+                f"{label:<22} recall@{args.k}={row['recall']:.3f} p50={row['latency_ms']['p50']:.2f}ms "
+                f"p95={row['latency_ms']['p95']:.2f}ms scanned={row['scanned_mib_per_million']:.0f}MiB/1M "
+                f"build={row['build_s']:.1f}s"
+            )
+    print(f"Saved {save_results('quantization', results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Replay captured /ask traces and report latency and result drift.
+
+Usage:
+    python -m benchmarks.replay --traces data/traces --speedup 4
+    python -m benchmarks.replay --traces data/traces --target service --data-dir /tmp/new-index
+    python -m benchmarks.replay --traces data/traces --baseline benchmarks/results/replay-OLD.json
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from .common import percentiles, save_results
+
+
+def load_trace(path: str, limit: int = 0) -> List[Dict]:
+    from backend.services.tracing import read_traces
+
+    records = []
+    for record in read_traces(path):
+        if record.get("query"):
+            records.append(record)
+            if limit and len(records) >= limit:
+                break
+    records.sort(key=lambda r: r.get("ts", 0.0))
+    return records
+
+
+def load_baseline(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)["results"]["requests"]
+
+
+def drift(baseline: List[Dict], current: List[Dict]) -> Dict[str, float]:
+    """Result drift between two runs over the same queries, paired by position."""
+    pairs = [
+        (b, c) for b, c in zip(baseline, current)
+        if b.get("fact_ids") is not None and c.get("fact_ids") is not None and b.get("query") == c.get("query")
+    ]
+    if not pairs:
+        return {"compared": 0}
+    changed = sum(b["fact_ids"] != c["fact_ids"] for b, c in pairs)
+    top1 = sum(b["fact_ids"][:1] != c["fact_ids"][:1] for b, c in pairs)
+    overlap = [len(set(b["fact_ids"]) & set(c["fact_ids"])) / len(b["fact_ids"]) for b, c in pairs if b["fact_ids"]]
+    verdicts = [(b["verified"], c["verified"]) for b, c in pairs if b.get("verified") is not None and c.get("verified") is not None]
+    return {
+        "compared": len(pairs),
+        "changed": changed / len(pairs),
+        "top1_changed": top1 / len(pairs),
+        "overlap": sum(overlap) / len(overlap) if overlap else 1.0,
+        "verified_flips": sum(b != c for b, c in verdicts),
+        "verified_before": sum(b for b, _ in verdicts) / len(verdicts) if verdicts else None,
+        "verified_after": sum(c for _, c in verdicts) / len(verdicts) if verdicts else None,
+    }
+
+
+async def replay(records: List[Dict], send, speedup: float, concurrency: int) -> Dict:
+    """Send every record through ``send(record) -> result dict``; pacing follows the captured timestamps."""
+    results: List[Optional[Dict]] = [None] * len(records)
+    lags: List[float] = []
+    gate = asyncio.Semaphore(max(1, concurrency))
+    origin = records[0].get("ts", 0.0) if records else 0.0
+    started = time.perf_counter()
+
+    async def one(i: int, record: Dict):
+        if speedup > 0:
+            due = (record.get("ts", origin) - origin) / speedup
+            delay = due - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        async with gate:
+            if speedup > 0:
+                lags.append(max(0.0, (time.perf_counter() - started - due) * 1000))
+            t = time.perf_counter()
+            try:
+                result = await send(record)
+            except Exception as exc:
+                result = {"error": type(exc).__name__}
+            result.update(query=record["query"], latency_ms=(time.perf_counter() - t) * 1000)
+            results[i] = result
+
+    await asyncio.gather(*[one(i, r) for i, r in enumerate(records)])
+    elapsed = time.perf_counter() - started
+    return {"elapsed_seconds": elapsed, "max_lag_ms": max(lags) if lags else 0.0, "requests": results}
+
+
+def app_sender(client):
+    async def send(record: Dict) -> Dict:
+        body = {"query": record["query"], "top_k": record.get("top_k", 4), "include_timings": True}
+        if record.get("retrieval_mode"):
+            body["retrieval_mode"] = record["retrieval_mode"]
+        if record.get("shards") is not None:
+            body["shards"] = record["shards"]
+        r = await client.post("/ask", json=body)
+        if r.status_code != 200:
+            return {"error": f"HTTP {r.status_code}"}
+        data = r.json()
+        return {
+            "fact_ids": [f["id"] for f in data["retrieved_facts"]],
+            "verified": data["verified"],
+            "timings": data.get("timings"),
+        }
+
+    return send
+
+
+def service_sender(concurrency: int):
+    from backend.services.retrieval import embed_query, resolve_mode, retrieve
+    from backend.services.store import get_or_create_collection
+
+    collection = get_or_create_collection()
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+
+    def run(record: Dict) -> Dict:
+        mode = resolve_mode(record.get("retrieval_mode") or record.get("mode"))
+        q_emb = embed_query(record["query"]) if mode != "lexical" else None
+        facts = retrieve(
+            collection, record["query"], top_k=record.get("top_k", 4), mode=mode, query_embedding=q_emb, shards=record.get("shards")
+        )
+        return {"fact_ids": [f.id for f in facts]}
+
+    async def send(record: Dict) -> Dict:
+        return await asyncio.get_running_loop().run_in_executor(pool, run, record)
+
+    return send
+
+
+async def run(args, records: List[Dict]) -> Dict:
+    import httpx
+
+    if args.target == "service":
+        return await replay(records, service_sender(args.concurrency), args.speedup, args.concurrency)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            return await replay(records, app_sender(client), args.speedup, args.concurrency)
+
+    from backend.app import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=60) as client:
+            return await replay(records, app_sender(client), args.speedup, args.concurrency)
+
+
+def stage_percentiles(requests: List[Dict]) -> Dict[str, Dict[str, float]]:
+    stages: Dict[str, List[float]] = {}
+    for r in requests:
+        for stage, ms in (r.get("timings") or {}).items():
+            stages.setdefault(stage, []).append(ms)
+    return {stage: percentiles(values) for stage, values in sorted(stages.items())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--traces", default="", help="trace directory, file or glob (default TRACE_DIR)")
+    parser.add_argument("--target", choices=("app", "service"), default="app")
+    parser.add_argument("--url", default="", help="with --target app: drive a running server instead of the in-process app")
+    parser.add_argument("--data-dir", default="", help="DATA_DIR for the in-process app or services")
+    parser.add_argument("--facts", default="", help="FACTS_PATH for the in-process app")
+    parser.add_argument("--speedup", type=float, default=0.0, help="replay N times faster than captured; 0 = as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight at most")
+    parser.add_argument("--limit", type=int, default=0, help="replay at most this many records")
+    parser.add_argument("--baseline", default="", help="saved replay result to measure drift against (default: the trace)")
+    parser.add_argument("--label", default="", help="tag stored with the results")
+    args = parser.parse_args()
+
+    # Must be set before backend.settings is imported
+    if args.data_dir:
+        os.environ["DATA_DIR"] = args.data_dir
+    if args.facts:
+        os.environ["FACTS_PATH"] = args.facts
+    from backend.settings import settings
+
+    records = load_trace(args.traces or settings.trace_dir, args.limit)
+    if not records:
+        raise SystemExit(f"No trace records under {args.traces or settings.trace_dir}")
+    baseline = load_baseline(args.baseline) if args.baseline else records
+
+    result = asyncio.run(run(args, records))
+    requests = result["requests"]
+    ok = [r for r in requests if "error" not in r]
+    result.update(
+        label=args.label,
+        target=args.url or args.target,
+        speedup=args.speedup,
+        concurrency=args.concurrency,
+        errors=len(requests) - len(ok),
+        throughput_rps=len(requests) / result["elapsed_seconds"] if result["elapsed_seconds"] else 0.0,
+        latency_ms=percentiles([r["latency_ms"] for r in ok]),
+        stage_latency_ms=stage_percentiles(ok),
+        drift=drift(baseline, requests),
+    )
+    if not args.baseline:
+        captured = [r["timings"]["total"] for r in records if (r.get("timings") or {}).get("total") is not None]
+        result["captured_latency_ms"] = percentiles(captured)
+    lat, d = result["latency_ms"], result["drift"]
+    print(
+        f"{len(requests)} requests, {result['errors']} errors, {result['throughput_rps']:.1f} req/s, "
+        f"p50={lat['p50']:.2f}ms p95={lat['p95']:.2f}ms p99={lat['p99']:.2f}ms"
+    )
+    if "captured_latency_ms" in result:
+        cap = result["captured_latency_ms"]
+        print(f"captured: p50={cap['p50']:.2f}ms p95={cap['p95']:.2f}ms p99={cap['p99']:.2f}ms")
+    if d["compared"]:
+        flips = f", {d['verified_flips']} verified flips" if d["verified_before"] is not None else ""
+        print(
+            f"drift over {d['compared']} queries: {d['changed']:.1%} changed, {d['top1_changed']:.1%} top-1 changed, "
+            f"overlap {d['overlap']:.3f}{flips}"
+        )
+    print(f"Saved {save_results('replay', result)}")
+
+
+if __name__ == "__main__":
+    main()
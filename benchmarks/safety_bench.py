@@ -0,0 +1,121 @@
+"""Emergency detection cost as the red-flag phrase set grows.
+
+Usage:
+    python -m benchmarks.safety_bench --sizes 10,100,1000,10000 --queries 2000
+    python -m benchmarks.safety_bench --check
+"""
+import re
+import time
+import random
+import argparse
+from typing import Dict, List
+
+from backend.services.safety import DEFAULT_RED_FLAGS, PhraseMatcher, red_flags
+from .common import percentiles, save_results
+from .synth import SYMPTOMS, generate_queries
+
+
+# The detector before the phrase trie: one substring search per pattern
+BASELINE_PATTERNS = [
+    r"chest pain",
+    r"shortness of breath",
+    r"severe bleeding",
+    r"stroke",
+    r"numbness on one side",
+    r"fainting",
+    r"unresponsive",
+    r"suicidal|self-harm",
+]
+
+RED_FLAG_QUERIES = [
+    "I have chest pain when climbing stairs",
+    "I have chest pains",
+    "Sharp chest pain radiating to my arm",
+    "sudden shortness of breath at night",
+    "shortness of breathing after a cold",
+    "what to do about severe bleeding from a cut",
+    "my dad had a stroke",
+    "my dad had strokes",
+    "signs of a mini-stroke",
+    "is heatstroke dangerous",
+    "symptoms of sunstroke in kids",
+    "numbness on one side of my face",
+    "fainting after standing up",
+    "my friend is unresponsive",
+    "feeling suicidal",
+    "suicidality in teenagers",
+    "thoughts of self-harm",
+    "self-harming behaviour",
+]
+
+
+def baseline_misses(matcher: PhraseMatcher, queries: List[str]) -> List[str]:
+    """Queries the original per-pattern detector flagged that ``matcher`` does not."""
+    compiled = [re.compile(p) for p in BASELINE_PATTERNS]
+    return [q for q in queries if any(p.search(q.lower()) for p in compiled) and not matcher.match(q)]
+
+
+_WORDS = sorted({w for s in SYMPTOMS for w in s.split()} | {"acute", "sudden", "severe", "crushing", "left", "arm", "jaw"})
+
+
+def synthetic_phrases(count: int, seed: int = 0) -> Dict[str, List[str]]:
+    rng = random.Random(seed)
+    phrases: Dict[str, List[str]] = {k: list(v) for k, v in DEFAULT_RED_FLAGS.items()}
+    for i in range(max(0, count - sum(len(v) for v in phrases.values()))):
+        phrase = " ".join(rng.sample(_WORDS, rng.randint(2, 4)))
+        phrases.setdefault(f"synthetic_{i % 50}", []).append(phrase)
+    return phrases
+
+
+def time_detector(fn, queries: List[str]) -> Dict[str, float]:
+    lat = []
+    for q in queries:
+        t = time.perf_counter()
+        fn(q)
+        lat.append((time.perf_counter() - t) * 1e6)
+    return percentiles(lat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000,10000")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--baseline-queries", type=int, default=100, help="queries for the (slow) per-pattern baseline")
+    parser.add_argument("--check", action="store_true", help="only check recall against the original detector")
+    args = parser.parse_args()
+
+    queries = generate_queries(args.queries)
+    red_flags.refresh(force=True)
+    misses = baseline_misses(red_flags.matcher, RED_FLAG_QUERIES + queries)
+    if misses:
+        raise SystemExit(f"{len(misses)} queries flagged by the original detector are no longer flagged: {misses}")
+    print(f"Recall check: all {len(RED_FLAG_QUERIES)} red-flag queries and {len(queries)} synthetic queries match the original detector")
+    if args.check:
+        return
+    results = {"queries": len(queries), "unit": "us", "sizes": {}}
+    for size in (int(s) for s in args.sizes.split(",")):
+        phrases = synthetic_phrases(size)
+        flat = [p for items in phrases.values() for p in items]
+
+        t = time.perf_counter()
+        matcher = PhraseMatcher(phrases)
+        build_s = time.perf_counter() - t
+
+        compiled = [re.compile(re.escape(p)) for p in flat]
+
+        def regex_scan(text: str) -> bool:
+            low = text.lower()
+            return any(pat.search(low) for pat in compiled)
+
+        trie = time_detector(matcher.match, queries)
+        scan = time_detector(regex_scan, queries[:args.baseline_queries])
+        results["sizes"][str(size)] = {"phrases": matcher.size, "build_seconds": build_s, "trie_us": trie, "regex_scan_us": scan}
+        print(
+            f"{matcher.size:>6} phrases: trie p50={trie['p50']:.1f}us p99={trie['p99']:.1f}us | "
+            f"per-pattern re.search p50={scan['p50']:.1f}us p99={scan['p99']:.1f}us (build {build_s * 1000:.1f}ms)"
+        )
+    print(f"Saved {save_results('safety', results)}")
+
+
+if __name__ == "__main__":
+    main()
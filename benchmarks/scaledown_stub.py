@@ -0,0 +1,42 @@
+"""Local stand-in for the ScaleDown compression endpoint.
+
+Run it and point the backend at it:
+    STUB_DELAY_MS=200 STUB_FAILURE_RATE=0.2 uvicorn benchmarks.scaledown_stub:app --port 8100
+    SCALEDOWN_COMPRESS_URL=http://localhost:8100/compress/raw/ SCALEDOWN_API_KEY=stub uvicorn backend.app:app
+"""
+import os
+import random
+import asyncio
+
+from fastapi import FastAPI, Header, HTTPException, Request
+
+app = FastAPI(title="ScaleDown stub")
+
+STATE = {
+    "delay_ms": float(os.getenv("STUB_DELAY_MS", "50")),
+    "failure_rate": float(os.getenv("STUB_FAILURE_RATE", "0")),
+    "calls": 0,
+}
+
+
+@app.post("/compress/raw/")
+async def compress(request: Request, x_api_key: str = Header(default="")):
+    STATE["calls"] += 1
+    if not x_api_key:
+        raise HTTPException(status_code=401, detail="Missing API key")
+    body = await request.json()
+    await asyncio.sleep(STATE["delay_ms"] / 1000.0)
+    if random.random() < STATE["failure_rate"]:
+        raise HTTPException(status_code=503, detail="Stub failure")
+    words = len(str(body.get("context", "")).split()) + len(str(body.get("prompt", "")).split())
+    return {"successful": True, "compressed_prompt_tokens": max(1, words // 2), "original_prompt_tokens": words}
+
+
+@app.post("/stub/config")
+async def configure(delay_ms: float = None, failure_rate: float = None):
+    # Adjust latency / failure rate at runtime to exercise deadlines and the circuit breaker
+    if delay_ms is not None:
+        STATE["delay_ms"] = delay_ms
+    if failure_rate is not None:
+        STATE["failure_rate"] = failure_rate
+    return STATE
@@ -0,0 +1,83 @@
+"""Query latency of a sharded store as the corpus grows with the shard count.
+
+Usage:
+    python -m benchmarks.shards --rows-per-shard 50000 --shards 1,2,4,8
+"""
+import os
+import time
+import argparse
+import tempfile
+from typing import Dict, List
+
+import numpy as np
+
+from backend.services.store import ShardedCollection, SimpleCollection, shard_of
+from .common import percentiles, random_unit_vectors, save_results
+
+
+def open_collection(path: str) -> SimpleCollection:
+    return SimpleCollection(path, vector_index="exact", quantization="none", storage="dense")
+
+
+def fill(col, ids: List[str], vecs: np.ndarray, batch: int = 20000):
+    for start in range(0, len(ids), batch):
+        n = len(ids[start:start + batch])
+        col.upsert(ids[start:start + n], vecs[start:start + n], [{}] * n, [""] * n)
+    col.publish()
+
+
+def time_queries(col, queries: np.ndarray, k: int):
+    col.query(queries[:1], n_results=k)
+    latencies, ids = [], []
+    for q in queries:
+        t = time.perf_counter()
+        res = col.query(q[None, :], n_results=k)
+        latencies.append((time.perf_counter() - t) * 1000)
+        ids.append(res["ids"][0])
+    return percentiles(latencies), ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows-per-shard", type=int, default=50000)
+    parser.add_argument("--shards", default="1,2,4,8", help="shard counts to try")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    counts = [int(x) for x in args.shards.split(",")]
+    queries = random_unit_vectors(args.queries, args.dim, seed=1)
+    results: Dict[str, Dict] = {"rows_per_shard": args.rows_per_shard, "dim": args.dim, "cpus": os.cpu_count(), "runs": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in counts:
+            total = n * args.rows_per_shard
+            vecs = random_unit_vectors(total, args.dim, seed=0)
+            ids = [f"F{i}" for i in range(total)]
+            owner = shard_of(ids, n)
+            shards = []
+            for s in range(n):
+                col = open_collection(os.path.join(tmp, f"{n}-shard-{s}"))
+                rows = np.flatnonzero(owner == s)
+                fill(col, [ids[r] for r in rows], vecs[rows])
+                shards.append(col)
+            flat = open_collection(os.path.join(tmp, f"{n}-flat"))
+            fill(flat, ids, vecs)
+            del vecs
+
+            row: Dict[str, Dict] = {"rows": total}
+            row["parallel"], par_ids = time_queries(ShardedCollection(shards, workers=n), queries, args.k)
+            row["sequential"], _ = time_queries(ShardedCollection(shards, workers=1), queries, args.k)
+            row["unsharded"], flat_ids = time_queries(flat, queries, args.k)
+            row["same_ids"] = float(np.mean([a == b for a, b in zip(par_ids, flat_ids)]))
+            results["runs"][str(n)] = row
+            print(
+                f"shards={n:<3} rows={total:<8} parallel p50={row['parallel']['p50']:.2f}ms p95={row['parallel']['p95']:.2f}ms  "
+                f"sequential p50={row['sequential']['p50']:.2f}ms  unsharded p50={row['unsharded']['p50']:.2f}ms  "
+                f"same ids={row['same_ids']:.3f}"
+            )
+    print(f"Saved {save_results('shards', results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Sparse (postings) against dense simple-index storage for the hashing backend.
+
+Usage:
+    python -m benchmarks.sparse_index --facts 100000 --n-features 512,4096,65536,262144
+"""
+import os
+import time
+import argparse
+import tempfile
+from typing import Dict, List
+
+import numpy as np
+
+from backend.settings import settings
+from backend.services import embeddings
+from backend.services.store import SimpleCollection
+from .common import percentiles, save_results
+from .synth import generate_facts, generate_queries
+
+
+def dir_mib(path: str) -> float:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 2**20
+
+
+def build(path: str, storage: str, docs: List[str]) -> Dict:
+    started = time.perf_counter()
+    col = SimpleCollection(path, vector_index="exact", quantization="none", storage=storage)
+    for start in range(0, len(docs), 16384):
+        batch = docs[start:start + 16384]
+        col.upsert([f"F{i}" for i in range(start, start + len(batch))], embeddings.embed_array(batch), [{}] * len(batch), [""] * len(batch))
+    col.publish()
+    return {"build_s": time.perf_counter() - started, "disk_mib": dir_mib(col._gen.path)}
+
+
+def run_queries(path: str, storage: str, queries, k: int):
+    reader = SimpleCollection(path, vector_index="exact", quantization="none", storage=storage)
+    reader.query(queries[0], n_results=k)
+    latencies, ids, scores = [], [], []
+    for i in range(queries.shape[0]):
+        t = time.perf_counter()
+        res = reader.query(queries[i], n_results=k)
+        latencies.append((time.perf_counter() - t) * 1000)
+        ids.append(set(res["ids"][0]))
+        scores.append(np.asarray(res["distances"][0]))
+    return percentiles(latencies), ids, scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--facts", type=int, default=100000, help="synthetic facts to index")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-features", default="512,4096,65536,262144", help="HASHING_N_FEATURES values to try")
+    parser.add_argument("--dense-max-mib", type=float, default=4096, help="skip dense stores larger than this")
+    args = parser.parse_args()
+
+    from backend.services.indexer import fact_document
+    from backend.models import Fact
+
+    docs = [fact_document(Fact(**f)) for f in generate_facts(args.facts)]
+    query_texts = generate_queries(args.queries)
+    results: Dict[str, Dict] = {"facts": len(docs), "queries": len(query_texts), "k": args.k, "runs": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_features in (int(x) for x in args.n_features.split(",")):
+            settings.hashing_n_features = n_features
+            embeddings._load_model.cache_clear()
+            queries = embeddings.embed_array(query_texts)
+            row: Dict[str, Dict] = {}
+            truth = None
+            storages = ["sparse"]
+            if len(docs) * n_features * 4 / 2**20 <= args.dense_max_mib:
+                storages.insert(0, "dense")
+            for storage in storages:
+                path = os.path.join(tmp, f"{storage}-{n_features}")
+                stats = build(path, storage, docs)
+                stats["latency_ms"], ids, scores = run_queries(path, storage, queries, args.k)
+                if truth is None:
+                    truth = ids, scores
+                else:
+                    stats["overlap"] = sum(len(a & b) for a, b in zip(truth[0], ids)) / float(sum(len(a) for a in truth[0]))
+                    stats["same_scores"] = float(np.mean([np.allclose(a, b, atol=1e-5) for a, b in zip(truth[1], scores)]))
+                row[storage] = stats
+                overlap = f" overlap={stats['overlap']:.3f} same scores={stats['same_scores']:.3f}" if "overlap" in stats else ""
+                print(
+                    f"n_features={n_features:<7} {storage:<6} p50={stats['latency_ms']['p50']:.2f}ms "
+                    f"p95={stats['latency_ms']['p95']:.2f}ms disk={stats['disk_mib']:.0f}MiB "
+                    f"build={stats['build_s']:.1f}s{overlap}"
+                )
+            results["runs"][str(n_features)] = row
+    print(f"Saved {save_results('sparse_index', results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Per-stage micro-benchmarks of the /ask pipeline.
+
+Usage:
+    python -m benchmarks.stages --count 10000 --queries 200
+    python -m benchmarks.stages --facts /tmp/facts_100k.jsonl --embedding hashing --store simple
+"""
+import argparse
+import tempfile
+import time
+import uuid
+from typing import Callable, Dict, List
+
+from backend.models import Fact
+from backend.settings import settings
+from backend.services import embeddings
+from backend.services.embeddings import embed_array, embed_query_array, to_dense
+from backend.services.indexer import fact_document, fact_metadata
+from backend.services.retrieval import semantic_search, _collection_input
+from backend.services.context_builder import build_minimal_context
+from backend.services.generator import generate_answer
+from backend.services.verifier import verify_answer, index_facts
+from backend.services.safety import apply_safety
+from backend.services.store import SimpleCollection, _CHROMA_AVAILABLE
+from compression.preprocess import iter_facts
+from .common import percentiles, save_results
+from .synth import generate_facts, generate_queries
+
+
+def use_embedding_backend(name: str) -> bool:
+    settings.embedding_backend = name
+    embeddings._load_model.cache_clear()
+    try:
+        embeddings._load_model()
+    except Exception:
+        return False
+    return True
+
+
+def make_store(kind: str, workdir: str):
+    if kind == "simple":
+        return SimpleCollection(f"{workdir}/simple-{uuid.uuid4().hex[:8]}", vector_index=settings.vector_index)
+    if kind == "chroma" and _CHROMA_AVAILABLE:
+        import chromadb  # type: ignore
+        return chromadb.Client().create_collection(
+            name=f"bench_{uuid.uuid4().hex[:8]}", metadata={"hnsw:space": "cosine"}
+        )
+    return None
+
+
+def load_store(store, facts: List[Fact], batch_size: int = 1024) -> float:
+    t = time.perf_counter()
+    for start in range(0, len(facts), batch_size):
+        chunk = facts[start:start + batch_size]
+        docs = [fact_document(f) for f in chunk]
+        embs = embed_array(docs, dense=True)
+        store.upsert(
+            ids=[f.id for f in chunk],
+            embeddings=embs if getattr(store, "accepts_arrays", False) else to_dense(embs).tolist(),
+            metadatas=[fact_metadata(f) for f in chunk],
+            documents=docs,
+        )
+    return time.perf_counter() - t
+
+
+def time_stage(fn: Callable, inputs: List) -> Dict[str, float]:
+    lat = []
+    for x in inputs:
+        t = time.perf_counter()
+        fn(x)
+        lat.append((time.perf_counter() - t) * 1000)
+    return percentiles(lat)
+
+
+def run_combo(store, facts: List[Fact], queries: List[str], top_k: int) -> Dict:
+    build_s = load_store(store, facts)
+    q_embs = [embed_query_array(q) for q in queries]
+    retrieved = [semantic_search(store, q, top_k=top_k, query_embedding=e) for q, e in zip(queries, q_embs)]
+    contexts = [build_minimal_context(r, q) for q, r in zip(queries, retrieved)]
+    answers = [generate_answer(q, c, r) for q, c, r in zip(queries, contexts, retrieved)]
+    items = list(zip(queries, q_embs, retrieved, contexts, answers))
+    return {
+        "rows": len(facts),
+        "index_build_seconds": build_s,
+        "stages_ms": {
+            "embed_query": time_stage(lambda it: embed_query_array(it[0]), items),
+            "vector_search": time_stage(
+                lambda it: store.query(query_embeddings=_collection_input(store, it[1]), n_results=top_k), items
+            ),
+            "semantic_search": time_stage(lambda it: semantic_search(store, it[0], top_k=top_k, query_embedding=it[1]), items),
+            "build_minimal_context": time_stage(lambda it: build_minimal_context(it[2], it[0]), items),
+            "generate_answer": time_stage(lambda it: generate_answer(it[0], it[3], it[2]), items),
+            "verify_answer": time_stage(lambda it: verify_answer(it[4]["answer"], it[4]["facts_used"], it[2]), items),
+            "apply_safety": time_stage(lambda it: apply_safety(it[0], it[4]["answer"]), items),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--facts", default="", help="JSON/JSONL facts file (default: synthesize --count facts)")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--embedding", default="sentence-transformers,hashing")
+    parser.add_argument("--store", default="simple,chroma")
+    args = parser.parse_args()
+
+    # Stage timings exclude the remote compression call
+    settings.scaledown_api_key = ""
+    if args.facts:
+        facts = list(iter_facts(args.facts))
+    else:
+        facts = [Fact(**f) for f in generate_facts(args.count)]
+    queries = generate_queries(args.queries)
+    index_facts(facts)
+
+    results = {"facts": args.facts or f"synthetic:{args.count}", "queries": len(queries), "runs": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        for backend in args.embedding.split(","):
+            if not use_embedding_backend(backend):
+                print(f"skip embedding backend {backend}: not available")
+                continue
+            for kind in args.store.split(","):
+                store = make_store(kind, workdir)
+                if store is None:
+                    print(f"skip store {kind}: not available")
+                    continue
+                name = f"{backend}/{kind}"
+                run = run_combo(store, facts, queries, args.top_k)
+                results["runs"][name] = run
+                print(f"{name}: built {run['rows']} rows in {run['index_build_seconds']:.1f}s")
+                for stage, pct in run["stages_ms"].items():
+                    print(f"  {stage:<22} p50={pct['p50']:.3f}ms p95={pct['p95']:.3f}ms p99={pct['p99']:.3f}ms")
+    print(f"Saved {save_results('stages', results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Synthetic fact corpora in the Fact schema, plus matching query sets.
+
+Usage:
+    python -m benchmarks.synth --count 100000 --out /tmp/facts_100k.jsonl
+    python -m benchmarks.synth --count 1000000 --out /tmp/facts_1m.json --queries 5000 --queries-out /tmp/queries.txt
+"""
+import json
+import random
+import argparse
+from typing import Dict, Iterator, List
+
+
+SEVERITY = ["Mild", "Moderate", "Persistent", "Recurring", "Sudden", "Intermittent", "Chronic", "Occasional"]
+SYMPTOMS = [
+    "dry cough", "productive cough", "sore throat", "headache", "fever", "runny nose", "stuffy nose",
+    "nausea", "vomiting", "diarrhea", "constipation", "heartburn", "bloating", "abdominal cramps",
+    "back pain", "neck stiffness", "joint pain", "muscle aches", "itchy rash", "hives", "dry skin",
+    "fatigue", "dizziness", "insomnia", "ear pain", "eye redness", "itchy eyes", "toothache",
+    "sinus pressure", "hoarse voice", "leg cramps", "swollen ankles", "sunburn", "minor burn",
+    "small cut", "bruising", "nosebleed", "hiccups", "motion sickness", "jet lag",
+]
+CONTEXTS = ["after exercise", "in the morning", "at night", "after meals", "during travel",
+            "in cold weather", "after screen use", "during allergy season", "after a long day", ""]
+CAUSES = [
+    "Common viral infection", "Seasonal allergies", "Dehydration", "Muscle strain", "Poor sleep",
+    "Stress or tension", "Dietary triggers", "Dry indoor air", "Minor irritation", "Overuse",
+    "Post-viral inflammation", "Environmental irritants", "Acid reflux", "Prolonged posture",
+    "Sun exposure", "Minor injury", "Eye strain", "Sinus congestion", "Low fluid intake",
+]
+TREATMENTS = [
+    "Rest", "Hydration", "Warm fluids", "Cool compress", "Warm compress", "Gentle stretching",
+    "Saline rinse", "Humidifier use", "Over-the-counter pain relievers if suitable", "Antihistamines if suitable",
+    "Small frequent meals", "Elevate the affected area", "Moisturizer", "Aloe vera gel",
+    "Regular sleep schedule", "Screen breaks", "Honey in warm water", "Light activity",
+]
+PRECAUTIONS = [
+    "Seek care if symptoms last more than {n} days",
+    "Seek urgent care if breathing becomes difficult",
+    "Consult a professional if fever exceeds 39°C",
+    "Seek care if pain is severe or worsening",
+    "Seek care if you notice blood",
+    "Consult a professional if symptoms recur frequently",
+    "Seek care if swelling spreads or skin turns red and warm",
+    "Seek urgent care if you faint or feel confused",
+]
+QUESTION_TEMPLATES = [
+    "What could cause {s}?",
+    "How do I treat {s}?",
+    "What helps with {s}?",
+    "When should I see a doctor for {s}?",
+    "{S} {c}, what should I do?",
+    "Is {s} serious?",
+]
+
+
+def _join(rng: random.Random, pool: List[str], lo: int, hi: int) -> str:
+    return ", ".join(rng.sample(pool, rng.randint(lo, hi)))
+
+
+def _near_duplicate(rng: random.Random, fact: Dict[str, str]) -> Dict[str, str]:
+    # What merging sources produces: reordered lists, changed case, a dropped item, stray punctuation
+    out = dict(fact)
+    items = out["treatment"].split(", ")
+    rng.shuffle(items)
+    if len(items) > 2 and rng.random() < 0.5:
+        items.pop()
+    out["treatment"] = ", ".join(items)
+    if rng.random() < 0.5:
+        out["symptom"] = out["symptom"].lower()
+    if rng.random() < 0.5:
+        out["precaution"] += "."
+    return out
+
+
+def generate_facts(count: int, seed: int = 0, near_duplicates: float = 0.0) -> Iterator[Dict[str, str]]:
+    """``near_duplicates`` is the fraction of facts that are perturbed copies of earlier ones."""
+    rng = random.Random(seed)
+    width = max(3, len(str(count)))
+    recent: List[Dict[str, str]] = []
+    for i in range(count):
+        if recent and rng.random() < near_duplicates:
+            yield {**_near_duplicate(rng, rng.choice(recent)), "id": f"FACT_{i + 1:0{width}d}"}
+            continue
+        context = rng.choice(CONTEXTS)
+        symptom = f"{rng.choice(SEVERITY)} {rng.choice(SYMPTOMS)}" + (f" {context}" if context else "")
+        precaution = rng.choice(PRECAUTIONS).format(n=rng.choice([2, 3, 5, 7, 10, 14]))
+        fact = {
+            "id": f"FACT_{i + 1:0{width}d}",
+            "symptom": symptom,
+            "cause": _join(rng, CAUSES, 1, 2),
+            "treatment": _join(rng, TREATMENTS, 2, 4),
+            "precaution": precaution,
+        }
+        if near_duplicates:
+            # Copies come from a sliding window, as they would from overlapping sources
+            recent = (recent + [fact])[-1000:]
+        yield fact
+
+
+def generate_queries(count: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(count):
+        s = rng.choice(SYMPTOMS)
+        tpl = rng.choice(QUESTION_TEMPLATES)
+        out.append(tpl.format(s=s, S=s.capitalize(), c=rng.choice(CONTEXTS) or "today").strip())
+    return out
+
+
+def write_facts(path: str, count: int, seed: int = 0, near_duplicates: float = 0.0):
+    """Write ``count`` facts as JSONL (``.jsonl``) or a JSON array, one record at a time."""
+    with open(path, "w", encoding="utf-8") as fh:
+        if path.endswith(".jsonl"):
+            for fact in generate_facts(count, seed, near_duplicates):
+                fh.write(json.dumps(fact, ensure_ascii=False) + "\n")
+            return
+        fh.write("[\n")
+        for i, fact in enumerate(generate_facts(count, seed, near_duplicates)):
+            fh.write(("," if i else "") + json.dumps(fact, ensure_ascii=False) + "\n")
+        fh.write("]\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--out", required=True, help=".json (array) or .jsonl")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--near-duplicates", type=float, default=0.0, help="fraction of perturbed copies of earlier facts")
+    parser.add_argument("--queries", type=int, default=0, help="also write this many synthetic questions")
+    parser.add_argument("--queries-out", default="", help="one question per line")
+    args = parser.parse_args()
+
+    write_facts(args.out, args.count, seed=args.seed, near_duplicates=args.near_duplicates)
+    print(f"Wrote {args.count} facts to {args.out}")
+    if args.queries:
+        path = args.queries_out or args.out.rsplit(".", 1)[0] + ".queries.txt"
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write("\n".join(generate_queries(args.queries, seed=args.seed + 1)) + "\n")
+        print(f"Wrote {args.queries} queries to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""Near-duplicate fact clustering for merged fact sources.
+
+Usage:
+    python -m compression.dedup --input merged.jsonl --output data/medical_facts.json
+    python -m compression.dedup --input merged.jsonl --output /tmp/dedup.jsonl --cosine 0
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from backend.models import Fact
+from backend.settings import settings
+from backend.services.indexer import embed_documents, fact_document
+from compression.preprocess import iter_fact_records, normalize_fact
+
+
+_WORD_RE = re.compile(r"\w+")
+# Facts per signature batch: bounds the (shingles x 1) uint64 scratch arrays
+_BATCH = 8192
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+class _Vocabulary:
+    """Stable 64-bit word hashes (Python's hash() is salted per process), memoized."""
+
+    def __init__(self):
+        self._hashes: Dict[str, int] = {}
+
+    def __call__(self, word: str) -> int:
+        h = self._hashes.get(word)
+        if h is None:
+            h = self._hashes[word] = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+        return h
+
+
+def _iter_all(path: str) -> Iterator[Fact]:
+    # Unlike iter_facts, exact duplicates are kept: they must become aliases too
+    for item in iter_fact_records(path):
+        yield normalize_fact(Fact(**item))
+
+
+def _fact_text(f: Fact) -> str:
+    return f"{f.symptom} {f.cause} {f.treatment} {f.precaution}".lower()
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 64, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hash family: h(x) = (a * x + b) >> 32 with odd a
+        self.a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+        self.vocab = _Vocabulary()
+
+    @property
+    def num_perm(self) -> int:
+        return len(self.a)
+
+    def signatures(self, facts: List[Fact]) -> np.ndarray:
+        """(len(facts) x num_perm) uint32 MinHash signatures."""
+        words, starts = [], []
+        for f in facts:
+            starts.append(len(words))
+            words.extend(self.vocab(w) for w in _WORD_RE.findall(_fact_text(f)) or [""])
+        uni = np.array(words, dtype=np.uint64)
+        starts = np.array(starts, dtype=np.int64)
+        # Bigram i pairs word i with word i + 1; the last word of each fact pairs with
+        # a sentinel, so every fact has as many bigrams as words
+        nxt = np.empty_like(uni)
+        nxt[:-1] = uni[1:]
+        nxt[starts[1:] - 1] = 0
+        nxt[-1] = 0
+        shingles = np.empty(2 * len(uni), dtype=np.uint64)
+        shingles[0::2] = uni
+        shingles[1::2] = uni * _MIX + nxt
+        starts *= 2
+        sig = np.empty((len(facts), self.num_perm), dtype=np.uint32)
+        for j in range(self.num_perm):
+            hashed = (shingles * self.a[j] + self.b[j]) >> np.uint64(32)
+            sig[:, j] = np.minimum.reduceat(hashed, starts)
+        return sig
+
+
+def _batched(items, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _estimated_jaccard(sig: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+    out = np.empty(len(pairs), dtype=np.float32)
+    for start in range(0, len(pairs), 1 << 18):
+        chunk = pairs[start:start + (1 << 18)]
+        out[start:start + len(chunk)] = (sig[chunk[:, 0]] == sig[chunk[:, 1]]).mean(axis=1)
+    return out
+
+
+def lsh_pairs(sig: np.ndarray, bands: int, jaccard: float, seed: int = 0):
+    """Unique pairs (i < j) sharing an LSH band with estimated Jaccard >= ``jaccard``, plus candidates examined."""
+    n, num_perm = sig.shape
+    rows = num_perm // bands
+    rng = np.random.default_rng(seed)
+    found, examined = [], 0
+    for band in range(bands):
+        block = sig[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        key = block[:, 0]
+        for r in range(1, rows):
+            key = key * _MIX ^ block[:, r]
+        # pair bucket neighbours in random order only: s - 1 candidates per bucket, not s^2 / 2
+        order = np.lexsort((rng.permutation(n), key))
+        same = key[order[1:]] == key[order[:-1]]
+        pairs = np.stack([order[:-1][same], order[1:][same]], axis=1)
+        examined += len(pairs)
+        found.append(pairs[_estimated_jaccard(sig, pairs) >= jaccard])
+    pairs = np.concatenate(found) if found else np.zeros((0, 2), dtype=np.int64)
+    pairs.sort(axis=1)
+    codes = np.unique(pairs[:, 0].astype(np.int64) * n + pairs[:, 1])
+    return np.stack([codes // n, codes % n], axis=1), examined
+
+
+def _union_find(n: int, pairs: np.ndarray) -> np.ndarray:
+    parent = list(range(n))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j in pairs.tolist():
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    return np.array([find(i) for i in range(n)], dtype=np.int64)
+
+
+def _embed_rows(path: str, rows: np.ndarray, batch_size: int):
+    """Embeddings of the facts at stream positions ``rows`` (sorted), in that order."""
+    wanted = np.zeros(rows[-1] + 1 if len(rows) else 0, dtype=bool)
+    wanted[rows] = True
+    docs = (fact_document(f) for i, f in enumerate(_iter_all(path)) if i < len(wanted) and wanted[i])
+    parts = [embed_documents(batch) for batch in _batched(docs, batch_size)]
+    if parts and hasattr(parts[0], "tocsr"):
+        import scipy.sparse as sp  # type: ignore
+
+        return sp.vstack(parts, format="csr")
+    parts = [np.asarray(p, dtype=np.float16) for p in parts]
+    return np.vstack(parts) if parts else np.zeros((0, 0), dtype=np.float16)
+
+
+def _row_cosines(embs, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Rows are L2-normalized, so the row-wise dot product is the cosine
+    if hasattr(embs, "tocsr"):
+        return np.asarray(embs[a].multiply(embs[b]).sum(axis=1), dtype=np.float32).ravel()
+    return np.einsum("ij,ij->i", embs[a].astype(np.float32), embs[b].astype(np.float32))
+
+
+def _write_facts(path: str, facts: Iterator[Fact]):
+    """Write a JSON array or JSONL file (by extension) atomically, one record at a time."""
+    tmp = path + ".tmp"
+    jsonl = path.endswith(".jsonl")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        if not jsonl:
+            fh.write("[\n")
+        for i, f in enumerate(facts):
+            line = f.model_dump_json()
+            fh.write(line + "\n" if jsonl else ("," if i else "") + line + "\n")
+        if not jsonl:
+            fh.write("]\n")
+    os.replace(tmp, path)
+
+
+def load_aliases(path: str) -> Dict[str, str]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    return {str(k): str(v) for k, v in data.items()} if isinstance(data, dict) else {}
+
+
+def _save_aliases(path: str, aliases: Dict[str, str]):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(aliases, fh, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def default_output(path: str) -> str:
+    """Where canonical facts go when no output is given: ``facts.json`` -> ``facts.dedup.json``."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.dedup{ext}"
+
+
+def dedup_file(
+    path: str,
+    output: str,
+    aliases_path: Optional[str] = None,
+    jaccard: float = 0.7,
+    cosine: float = 0.95,
+    num_perm: int = 64,
+    bands: int = 16,
+    batch_size: Optional[int] = None,
+    progress: bool = True,
+) -> Dict[str, float]:
+    """Cluster near-duplicate facts in ``path``, write the canonical facts to ``output``
+    and merge the new aliases into ``aliases_path``. ``cosine=0`` skips embedding."""
+    aliases_path = aliases_path or settings.fact_aliases_path
+    batch_size = batch_size or settings.ingest_batch_size
+    started = time.perf_counter()
+    hasher = MinHasher(num_perm)
+
+    # Pass 1: IDs, text lengths and signatures
+    ids: List[str] = []
+    lengths: List[int] = []
+    sigs = []
+    for batch in _batched(_iter_all(path), _BATCH):
+        ids.extend(f.id for f in batch)
+        lengths.extend(len(fact_document(f)) for f in batch)
+        sigs.append(hasher.signatures(batch))
+        if progress:
+            print(f"\rsigned {len(ids)} facts", end="", file=sys.stderr, flush=True)
+    if progress and ids:
+        print(file=sys.stderr)
+    n = len(ids)
+    sig = np.concatenate(sigs) if sigs else np.zeros((0, num_perm), dtype=np.uint32)
+
+    pairs, candidates = lsh_pairs(sig, bands, jaccard)
+
+    # Pass 2: embed only facts that still have a candidate partner
+    embedded = 0
+    if cosine > 0 and len(pairs):
+        rows = np.unique(pairs)
+        embs = _embed_rows(path, rows, batch_size)
+        embedded = len(rows)
+        a, b = np.searchsorted(rows, pairs[:, 0]), np.searchsorted(rows, pairs[:, 1])
+        sims = np.concatenate([
+            _row_cosines(embs, a[i:i + 65536], b[i:i + 65536])
+            for i in range(0, len(pairs), 65536)
+        ])
+        pairs = pairs[sims >= cosine]
+
+    root = _union_find(n, pairs)
+    # Canonical member per cluster: longest text, then earliest position
+    order = np.lexsort((np.arange(n), -np.asarray(lengths, dtype=np.int64), root))
+    first = np.ones(n, dtype=bool)
+    first[1:] = root[order[1:]] != root[order[:-1]]
+    canonical_of_root = np.empty(n, dtype=np.int64)
+    canonical_of_root[root[order[first]]] = order[first]
+    canonical = canonical_of_root[root]
+    is_canonical = canonical == np.arange(n)
+
+    # Pass 3: canonical facts, in input order
+    _write_facts(output, (f for i, f in enumerate(_iter_all(path)) if i < n and is_canonical[i]))
+
+    new = {ids[i]: ids[c] for i, c in enumerate(canonical.tolist()) if c != i and ids[i] != ids[c]}
+    kept_ids = {ids[i] for i in np.flatnonzero(is_canonical).tolist()}
+    aliases = {}
+    # Earlier aliases may point at facts merged away just now: follow them to the new canonical
+    for alias, target in {**load_aliases(aliases_path), **new}.items():
+        target = new.get(target, target)
+        if alias not in kept_ids and alias != target:
+            aliases[alias] = target
+    _save_aliases(aliases_path, aliases)
+
+    kept_facts = int(is_canonical.sum())
+    sizes = np.bincount(root, minlength=n)
+    return {
+        "facts": n,
+        "canonical": kept_facts,
+        "merged": n - kept_facts,
+        "clusters": int((sizes > 1).sum()),
+        "ratio": n / kept_facts if kept_facts else 1.0,
+        "candidate_pairs": candidates,
+        "verified_pairs": int(len(pairs)),
+        "embedded": embedded,
+        "aliases": len(aliases),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def format_stats(stats: Dict[str, float]) -> str:
+    return (
+        f"Deduplicated {stats['facts']} facts into {stats['canonical']} "
+        f"({stats['ratio']:.2f}x, {stats['merged']} merged into {stats['clusters']} clusters) "
+        f"in {stats['seconds']:.1f}s; {stats['candidate_pairs']} LSH candidates, "
+        f"{stats['verified_pairs']} verified, {stats['embedded']} facts embedded; {stats['aliases']} aliases"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=settings.facts_path, help="JSON array or JSONL facts file")
+    parser.add_argument("--output", default="", help="canonical facts (.json or .jsonl); default INPUT.dedup.EXT, may equal --input")
+    parser.add_argument("--aliases", default=settings.fact_aliases_path, help="alias map merged with any existing one")
+    parser.add_argument("--jaccard", type=float, default=0.7, help="minimum MinHash-estimated Jaccard similarity")
+    parser.add_argument("--cosine", type=float, default=0.95, help="minimum embedding cosine (0 = text only)")
+    parser.add_argument("--num-perm", type=int, default=64)
+    parser.add_argument("--bands", type=int, default=16, help="LSH bands; must divide --num-perm")
+    args = parser.parse_args()
+
+    if args.num_perm % args.bands:
+        raise SystemExit("--bands must divide --num-perm")
+    if not os.path.exists(args.input):
+        raise SystemExit(f"Missing facts file at {args.input}")
+    stats = dedup_file(
+        args.input, args.output or default_output(args.input), aliases_path=args.aliases,
+        jaccard=args.jaccard, cosine=args.cosine, num_perm=args.num_perm, bands=args.bands,
+    )
+    print(format_stats(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Precompute /ask answers for the most common questions.
+
+Usage:
+    python -m compression.precompute --questions logs/queries.jsonl --top 5000
+    python -m compression.preprocess --precompute logs/queries.jsonl
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from backend.models import AskResponse
+from backend.settings import settings
+from backend.services.cache import normalize_query
+from backend.services.context_builder import build_minimal_context
+from backend.services.embeddings import embed_array
+from backend.services.generator import generate_answer
+from backend.services.precomputed import write_table
+from backend.services.retrieval import resolve_mode, retrieve_batch_scored
+from backend.services.safety import apply_safety, detect_emergency
+from backend.services.store import get_index_version, get_or_create_collection
+from backend.services.verifier import verify_answer
+
+
+def iter_questions(path: str) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    line = str(json.loads(line).get("query") or "").strip()
+                except ValueError:
+                    continue
+            if line:
+                yield line
+
+
+def top_questions(path: str, top: int) -> List[Tuple[str, str]]:
+    """(normalized key, most frequent raw form) for the ``top`` most frequent questions."""
+    counts: Counter = Counter()
+    forms: Dict[str, Counter] = {}
+    for q in iter_questions(path):
+        key = normalize_query(q)
+        counts[key] += 1
+        forms.setdefault(key, Counter())[q] += 1
+    return [(key, forms[key].most_common(1)[0][0]) for key, _ in counts.most_common(top)]
+
+
+def answer_offline(query: str, facts, scores=None) -> Optional[AskResponse]:
+    # The /ask pipeline after retrieval; questions without facts stay live (their answer is generic anyway)
+    if not facts:
+        return None
+    context = build_minimal_context(facts, query, scores=scores)
+    gen = generate_answer(query, context, facts)
+    verified, answer = verify_answer(gen["answer"], gen["facts_used"], facts)
+    answer, flags = apply_safety(query, answer)
+    return AskResponse(
+        answer=answer,
+        facts_used=gen["facts_used"],
+        retrieved_facts=facts,
+        verified=verified and not flags.get("override", False),
+        tokens_used=gen.get("tokens_used", {"prompt": 0, "completion": 0}),
+    )
+
+
+def precompute_answers(
+    questions_path: str,
+    output: Optional[str] = None,
+    top: int = 5000,
+    top_k: int = 4,
+    mode: Optional[str] = None,
+    batch_size: int = 256,
+    progress: bool = True,
+) -> Dict[str, float]:
+    output = output or settings.precomputed_answers_path
+    mode = resolve_mode(mode)
+    started = time.perf_counter()
+    questions = top_questions(questions_path, top)
+    collection = get_or_create_collection()
+    keys, responses, emergency, blocks = [], [], [], []
+    for start in range(0, len(questions), batch_size):
+        batch = questions[start:start + batch_size]
+        texts = [q for _, q in batch]
+        # Lexical requests never embed their query, so a lexical table has no vectors to match on
+        embs = embed_array(texts) if mode != "lexical" else None
+        rows = [embs[i:i + 1] for i in range(len(texts))] if embs is not None else [None] * len(texts)
+        retrieved = retrieve_batch_scored(collection, texts, [top_k] * len(texts), [mode] * len(texts), rows)
+        kept = []
+        for n, ((key, text), (facts, scores)) in enumerate(zip(batch, retrieved)):
+            resp = answer_offline(text, facts, scores)
+            if resp is None:
+                continue
+            keys.append(key)
+            responses.append(resp)
+            emergency.append(detect_emergency(text))
+            kept.append(n)
+        if embs is not None and kept:
+            blocks.append(embs[kept])
+        if progress:
+            print(f"\rprecomputed {len(responses)} of {start + len(batch)} questions", end="", file=sys.stderr, flush=True)
+    if progress and questions:
+        print(file=sys.stderr)
+    matrix = _stack(blocks) if blocks else None
+    meta = {"index_version": get_index_version(), "top_k": top_k, "mode": mode, "questions": questions_path}
+    write_table(output, keys, responses, emergency, matrix, meta)
+    return {
+        "questions": len(questions),
+        "answers": len(responses),
+        "index_version": meta["index_version"],
+        "bytes": os.path.getsize(output),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def _stack(blocks):
+    if hasattr(blocks[0], "tocsr"):
+        import scipy.sparse as sp  # type: ignore
+
+        return sp.vstack(blocks, format="csr")
+    return np.vstack(blocks)
+
+
+def format_stats(stats: Dict[str, float]) -> str:
+    return (
+        f"Precomputed {stats['answers']} answers for the top {stats['questions']} questions "
+        f"(index version {stats['index_version']}, {stats['bytes'] / 1024:.0f} KiB) in {stats['seconds']:.1f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", required=True, help="query log (JSONL with 'query') or one question per line")
+    parser.add_argument("--output", default=settings.precomputed_answers_path)
+    parser.add_argument("--top", type=int, default=5000, help="most frequent normalized questions to precompute")
+    parser.add_argument("--top-k", type=int, default=4, help="top_k the answers are computed (and served) for")
+    parser.add_argument("--mode", default=None, help="retrieval mode (default RETRIEVAL_MODE)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.questions):
+        raise SystemExit(f"Missing questions file at {args.questions}")
+    print(format_stats(precompute_answers(args.questions, args.output, top=args.top, top_k=args.top_k, mode=args.mode)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,28 @@
 import os
+import sys
 import json
-from typing import List
+import time
+import hashlib
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
 from backend.models import Fact
 from backend.services.store import get_or_create_collection
-from backend.services.embeddings import embed_texts
+from backend.services.lexical import BM25Builder, build_lexical_index, lexical_index_current, reset_lexical_index
+from backend.services.indexer import (
+    IncrementalIndexer,
+    embed_documents,
+    fact_document,
+    init_embedding_worker,
+    is_current,
+    load_manifest,
+    publish_collection,
+    source_fingerprint,
+    sync_index,
+)
 from backend.settings import settings
 
 
@@ -34,35 +52,189 @@ def load_facts(path: str) -> List[Fact]:
     return uniq
 
 
-def build_index(facts: List[Fact]):
+def iter_fact_records(path: str, chunk_size: int = 1 << 20) -> Iterator[Dict[str, Any]]:
+    """Yield raw fact dicts from a JSON array or a JSONL file without loading it whole."""
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        return
+
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as fh:
+        buf, pos, eof, started = "", 0, False, False
+        while True:
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n,":
+                    pos += 1
+                if pos < len(buf) or eof:
+                    break
+                more = fh.read(chunk_size)
+                buf, pos, eof = buf[pos:] + more, 0, not more
+            if pos >= len(buf):
+                return
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"Expected a JSON array in {path}")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Object spans the buffer boundary: read more and retry
+                more = fh.read(chunk_size)
+                buf, pos, eof = buf[pos:] + more, 0, not more
+                continue
+            yield obj
+            pos = end
+
+
+def iter_facts(path: str) -> Iterator[Fact]:
+    """Streaming counterpart of load_facts: normalized, exact duplicates removed."""
+    seen = set()
+    for item in iter_fact_records(path):
+        f = normalize_fact(Fact(**item))
+        key = "\x1f".join((f.symptom.lower(), f.cause.lower(), f.treatment.lower(), f.precaution.lower()))
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=12).digest()
+        if digest not in seen:
+            seen.add(digest)
+            yield f
+
+
+def _batched(items: Iterable[Fact], size: int) -> Iterator[List[Fact]]:
+    batch: List[Fact] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_index_streaming(
+    path: str,
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    checkpoint_every: int = 20,
+    source: Optional[Dict] = None,
+    progress: bool = True,
+) -> Dict[str, int]:
+    """Stream facts from ``path`` and embed changed ones in batches across a process pool."""
+    batch_size = batch_size or settings.ingest_batch_size
+    workers = workers if workers is not None else settings.ingest_workers
+    workers = workers or os.cpu_count() or 1
     collection = get_or_create_collection()
-    ids = [f.id for f in facts]
-    docs = [
-        f"Symptom: {f.symptom}\nCause: {f.cause}\nTreatment: {f.treatment}\nPrecaution: {f.precaution}"
-        for f in facts
-    ]
-    metas = [
-        {
-            "symptom": f.symptom,
-            "cause": f.cause,
-            "treatment": f.treatment,
-            "precaution": f.precaution,
-        }
-        for f in facts
-    ]
-    embs = embed_texts(docs)
-    # Upsert will overwrite existing IDs; skip unconditional delete for compatibility
-    collection.upsert(ids=ids, embeddings=embs, metadatas=metas, documents=docs)
+    indexer = IncrementalIndexer(collection, load_manifest())
+    lexical = BM25Builder()
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_embedding_worker,
+        )
+    pending: deque = deque()
+    stats = {"read": 0, "embedded": 0, "chunks": 0}
+    started = time.perf_counter()
+
+    def drain(limit: int):
+        while len(pending) > limit:
+            changed, fut = pending.popleft()
+            indexer.write(changed, fut.result() if pool else embed_documents([fact_document(f) for f in changed]))
+            stats["embedded"] += len(changed)
+            stats["chunks"] += 1
+            if stats["chunks"] % checkpoint_every == 0:
+                indexer.checkpoint({"facts_read": stats["read"], "facts_embedded": stats["embedded"]})
+            if progress:
+                rate = stats["read"] / max(time.perf_counter() - started, 1e-9)
+                print(
+                    f"\rread {stats['read']} facts, embedded {stats['embedded']} ({rate:,.0f} facts/s)",
+                    end="", file=sys.stderr, flush=True,
+                )
+
+    try:
+        for batch in _batched(iter_facts(path), batch_size):
+            stats["read"] += len(batch)
+            lexical.add(batch)
+            changed = indexer.plan(batch)
+            if changed:
+                fut = pool.submit(embed_documents, [fact_document(f) for f in changed]) if pool else None
+                pending.append((changed, fut))
+            drain(2 * workers if pool else 0)
+        drain(0)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if progress and stats["read"]:
+            print(file=sys.stderr)
+    result = indexer.finish(source)
+    lexical.build().save(settings.lexical_index_dir, result["version"])
+    reset_lexical_index()
+    return result
+
+
+def build_index(facts: List[Fact], source: Optional[Dict] = None) -> Dict[str, int]:
+    collection = get_or_create_collection()
+    # Only new or changed facts are embedded; removed IDs are deleted
+    return sync_index(collection, facts, source=source)
 
 
 def main():
-    os.makedirs(os.path.dirname(settings.facts_path), exist_ok=True)
-    if not os.path.exists(settings.facts_path):
-        raise SystemExit(f"Missing facts file at {settings.facts_path}")
-    facts = load_facts(settings.facts_path)
-    build_index(facts)
-    print(f"Indexed {len(facts)} facts into Chroma at {settings.persist_dir}")
+    parser = argparse.ArgumentParser(description="Incrementally (re)build the fact index.")
+    parser.add_argument("--input", default=settings.facts_path, help="JSON array or JSONL facts file")
+    parser.add_argument("--batch-size", type=int, default=settings.ingest_batch_size)
+    parser.add_argument("--workers", type=int, default=settings.ingest_workers, help="embedding processes (0 = one per CPU)")
+    parser.add_argument("--checkpoint-every", type=int, default=20, help="chunks between manifest checkpoints")
+    parser.add_argument("--dedup", action="store_true", help="merge near-duplicate facts (compression/dedup.py) before indexing")
+    parser.add_argument("--output", default="", help="with --dedup: canonical facts file to write and index (default INPUT.dedup.EXT)")
+    parser.add_argument("--precompute", metavar="QUESTIONS", help="query log or question list to precompute answers for (compression/precompute.py)")
+    parser.add_argument("--precompute-top", type=int, default=5000, help="with --precompute: most frequent questions to keep")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        raise SystemExit(f"Missing facts file at {args.input}")
+    if args.dedup:
+        from compression.dedup import dedup_file, default_output, format_stats
+
+        output = args.output or default_output(args.input)
+        print(format_stats(dedup_file(args.input, output, batch_size=args.batch_size)))
+        args.input = output
+    source = source_fingerprint(args.input)
+    collection = get_or_create_collection()
+    if is_current(collection, source):
+        # Rebuilds quantized codes if VECTOR_QUANTIZATION changed since the last run
+        publish_collection(collection)
+        if not lexical_index_current():
+            build_lexical_index(iter_facts(args.input))
+            print("Rebuilt the BM25 index")
+        print("Index is up to date")
+    else:
+        stats = build_index_streaming(
+            args.input,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            checkpoint_every=args.checkpoint_every,
+            source=source,
+        )
+        print(
+            f"Indexed {stats['added'] + stats['updated'] + stats['unchanged']} facts (added {stats['added']}, "
+            f"updated {stats['updated']}, removed {stats['removed']}, unchanged {stats['unchanged']}); "
+            f"index version {stats['version']}"
+        )
+    if args.precompute:
+        # Answers are stamped with the index version, so they are recomputed after every rebuild
+        from compression.precompute import precompute_answers, format_stats
+
+        print(format_stats(precompute_answers(args.precompute, top=args.precompute_top)))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
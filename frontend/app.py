@@ -1,4 +1,5 @@
 import os
+import json
 import requests
 import streamlit as st
 
@@ -15,37 +16,72 @@ with st.form("ask_form"):
     )
     submitted = st.form_submit_button("Ask")
 
+def sse_events(resp):
+    """(event, data) pairs from a text/event-stream response."""
+    event, data = "message", []
+    for line in resp.iter_lines(decode_unicode=True):
+        if line:
+            field, _, value = line.partition(":")
+            if field == "event":
+                event = value.strip()
+            elif field == "data":
+                data.append(value.lstrip())
+        elif data:
+            yield event, json.loads("\n".join(data))
+            event, data = "message", []
+
+
+def render_facts(facts):
+    for f in facts:
+        with st.expander(f"{f['id']} · {f['symptom']}"):
+            st.markdown(f"- Symptom: {f['symptom']}")
+            st.markdown(f"- Cause: {f['cause']}")
+            st.markdown(f"- Treatment: {f['treatment']}")
+            st.markdown(f"- Precaution: {f['precaution']}")
+
+
 if submitted:
     if not query.strip():
         st.warning("Please enter a question.")
     else:
-        with st.spinner("Retrieving and generating..."):
-            try:
-                resp = requests.post(f"{BACKEND_URL}/ask", json={"query": query}, timeout=60)
-                resp.raise_for_status()
-                data = resp.json()
-            except Exception as e:
-                st.error(f"Error contacting backend: {e}")
-                st.stop()
-
+        # Sections are laid out up front and filled in as their events arrive
+        banner_box = st.empty()
         st.subheader("Answer")
-        st.write(data.get("answer", ""))
-
+        answer_box = st.empty()
+        answer_box.info("Retrieving facts...")
         st.subheader("Verification")
-        st.write("Verified" if data.get("verified") else "Rewritten to ensure factual consistency")
-
+        verification_box = st.empty()
         st.subheader("Retrieved Facts (Compressed)")
-        facts = data.get("retrieved_facts", [])
-        for f in facts:
-            with st.expander(f"{f['id']} · {f['symptom']}"):
-                st.markdown(f"- Symptom: {f['symptom']}")
-                st.markdown(f"- Cause: {f['cause']}")
-                st.markdown(f"- Treatment: {f['treatment']}")
-                st.markdown(f"- Precaution: {f['precaution']}")
-
+        facts_box = st.container()
         st.subheader("Token / Size Hints")
-        tokens = data.get("tokens_used", {})
-        st.write(tokens)
+        tokens_box = st.empty()
+
+        answer = ""
+        try:
+            with requests.post(f"{BACKEND_URL}/ask/stream", json={"query": query}, stream=True, timeout=60) as resp:
+                resp.raise_for_status()
+                for event, data in sse_events(resp):
+                    if event == "facts":
+                        with facts_box:
+                            render_facts(data["retrieved_facts"])
+                        answer_box.info("Generating answer...")
+                    elif event == "answer":
+                        answer += data["delta"]
+                        answer_box.write(answer)
+                    elif event == "verification":
+                        verification_box.write("Verified" if data["verified"] else "Rewritten to ensure factual consistency")
+                    elif event == "safety":
+                        # Final text: the rewrite (if any), emergency banner and disclaimer applied
+                        answer_box.write(data["answer"])
+                        if data["emergency"]:
+                            banner_box.error("Your question mentions potential emergency symptoms. Seek immediate medical care.")
+                    elif event == "done":
+                        tokens_box.write(data.get("tokens_used", {}))
+                    elif event == "error":
+                        st.error(f"Backend error: {data.get('detail')}")
+        except Exception as e:
+            st.error(f"Error contacting backend: {e}")
+            st.stop()
 
 st.markdown("---")
 st.caption("If symptoms are urgent (e.g., chest pain, breathing difficulty), seek emergency care.")
\ No newline at end of file